@@ -0,0 +1,89 @@
+"""
+Compare the record format with the previous pickled document format.
+
+Usage: python benchmarks/document_format.py [--items 10000] [--points 50] [--repeat 3]
+"""
+import argparse
+import os
+import pickle
+import tempfile
+from file_codecs import best_time
+from scenes import create_app, create_scene
+from src.framework.deserializer import SceneDeserializer
+from src.framework.serializer import SceneSerializer
+from src.framework.managers.journal import DocumentJournal
+from src.framework.managers.save_worker import write_snapshot
+
+
+def pickle_format(filename, serializer):
+    def save():
+        serializer.scene.change_tracker.clear_records()
+
+        with open(filename, 'wb') as f:
+            pickle.dump(serializer.serialize_items(), f)
+
+    def read():
+        with open(filename, 'rb') as f:
+            return pickle.load(f)
+
+    return save, read
+
+
+def record_format(filename, serializer, codec):
+    def save():
+        serializer.scene.change_tracker.clear_records()
+        write_snapshot(filename, serializer.serialize_items(), codec=codec)
+
+    def read():
+        with open(filename, 'rb') as f:
+            return DocumentJournal.read(f)[0]
+
+    return save, read
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the .mp record format against pickle')
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--points', type=int, default=50, help='points per drawn path')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    scene = create_scene(args.items, args.points)
+    serializer = SceneSerializer(scene)
+    deserializer = SceneDeserializer(scene)
+
+    print(f'{args.items} items, {args.points} points per path')
+    print(f'{"format":<16}{"size (KB)":>12}{"save (ms)":>12}{"read (ms)":>12}{"load (ms)":>12}'
+          f'{"read / pickle":>16}{"load / pickle":>16}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        formats = {
+            'pickle': os.path.join(directory, 'pickle.mp'),
+            'records': os.path.join(directory, 'records.mp'),
+            'records + zlib': os.path.join(directory, 'zlib.mp'),
+        }
+
+        for name, filename in formats.items():
+            if name == 'pickle':
+                save, read = pickle_format(filename, serializer)
+
+            else:
+                save, read = record_format(filename, serializer, 'zlib' if 'zlib' in name else 'none')
+
+            save_time = best_time(save, args.repeat)
+            read_time = best_time(read, args.repeat)
+
+            # Read plus building the items, what opening a document costs
+            load_time = best_time(lambda: deserializer.deserialize_records(read()), args.repeat)
+
+            if name == 'pickle':
+                pickle_times = read_time, load_time
+
+            print(f'{name:<16}{os.path.getsize(filename) / 1024:>12.1f}{save_time * 1000:>12.1f}'
+                  f'{read_time * 1000:>12.1f}{load_time * 1000:>12.1f}'
+                  f'{read_time / pickle_times[0]:>16.2f}{load_time / pickle_times[1]:>16.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare the .mp compression codecs on synthetic scenes.
+
+Usage: python benchmarks/file_codecs.py [--items 1000 5000] [--points 50] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+from scenes import create_app, create_scene
+from src.framework.deserializer import SceneDeserializer
+from src.framework.serializer import SceneSerializer
+from src.framework.managers.compression import CODECS
+from src.framework.managers.journal import DocumentJournal
+from src.framework.managers.save_worker import write_snapshot
+
+
+def best_time(func, repeat):
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def benchmark(scene, codec, level, repeat):
+    serializer = SceneSerializer(scene)
+    deserializer = SceneDeserializer(scene)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, f'{codec}.mp')
+
+        def save():
+            # Full saves, not the records cached by the previous run
+            scene.change_tracker.clear_records()
+            write_snapshot(filename, serializer.serialize_items(), codec=codec, level=level)
+
+        def load():
+            with open(filename, 'rb') as f:
+                items_data, offsets = DocumentJournal.read(f)
+
+            deserializer.deserialize_records(items_data)
+
+        save_time = best_time(save, repeat)
+        load_time = best_time(load, repeat)
+
+        return os.path.getsize(filename), save_time, load_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark .mp compression codecs')
+    parser.add_argument('--items', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--points', type=int, default=50, help='points per drawn path')
+    parser.add_argument('--level', type=int, default=None, help='compression level (codec default if omitted)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+
+    for items in args.items:
+        scene = create_scene(items, args.points)
+        print(f'\n{items} items, {args.points} points per path')
+        print(f'{"codec":<8}{"size (KB)":>12}{"ratio":>8}{"save (ms)":>12}{"load (ms)":>12}')
+
+        baseline = None
+
+        for codec in CODECS:
+            size, save_time, load_time = benchmark(scene, codec, args.level, args.repeat)
+            baseline = baseline or size
+
+            print(f'{codec:<8}{size / 1024:>12.1f}{baseline / size:>8.2f}'
+                  f'{save_time * 1000:>12.1f}{load_time * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure what a save costs once the serialized records of clean items are cached,
+and the block compression with and without the thread pool.
+
+Usage: python benchmarks/incremental_save.py [--items 10000] [--points 50] [--edits 10 100] [--repeat 3]
+"""
+import argparse
+import random
+from file_codecs import best_time
+from scenes import create_app, create_scene
+from src.framework.serializer import SceneSerializer
+from src.framework.managers import container
+from src.framework.managers.container import DocumentContainer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark saves with cached item records')
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--points', type=int, default=50, help='points per drawn path')
+    parser.add_argument('--edits', type=int, nargs='+', default=[10, 100], help='items moved before each save')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    scene = create_scene(args.items, args.points)
+    serializer = SceneSerializer(scene)
+    items = [item for item in scene.items() if serializer.is_serializable(item)]
+    rng = random.Random(0)
+
+    def full():
+        scene.change_tracker.clear_records()
+        serializer.serialize_items()
+
+    def edited(count):
+        def save():
+            for item in rng.sample(items, count):
+                item.moveBy(1, 0)
+                scene.change_tracker.mark_dirty([item])
+
+            serializer.serialize_items()
+
+        return save
+
+    print(f'{args.items} items, {args.points} points per path')
+    print(f'{"snapshot (GUI thread)":<28}{"time (ms)":>12}')
+    print(f'{"every item":<28}{best_time(full, args.repeat) * 1000:>12.1f}')
+
+    for count in args.edits:
+        print(f'{f"{count} items edited":<28}{best_time(edited(count), args.repeat) * 1000:>12.1f}')
+
+    snapshot = serializer.serialize_items()
+    threads = container.COMPRESS_THREADS
+
+    print(f'\n{"encode (save worker)":<28}{"time (ms)":>12}')
+
+    for codec in ('zlib', 'lzma'):
+        for count in (1, threads):
+            container.COMPRESS_THREADS = count
+            encode_time = best_time(lambda: DocumentContainer.encode(snapshot, codec=codec), args.repeat)
+
+            print(f'{f"{codec}, {count} thread(s)":<28}{encode_time * 1000:>12.1f}')
+
+    container.COMPRESS_THREADS = threads
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Compare exporting every canvas to one multi-page PDF (a single printer session) against
+writing a single-page PDF per canvas.
+
+Usage: python benchmarks/pdf_export.py [--items 3000] [--canvases 4 16] [--repeat 3]
+"""
+import argparse
+import tempfile
+from file_codecs import best_time
+from scenes import create_app, create_scene
+from src.framework.graphics_framework import *
+from src.framework.managers.export_manager import write_pdf, write_pdf_pages
+
+
+def add_canvases(scene, count):
+    # create_scene lays out 4 canvases in a row, add rows below them
+    for i in range(4, count):
+        canvas = CanvasItem(QRectF(0, 0, 1000, 700), f'Canvas {i + 1}')
+        canvas.setPos((i % 4) * 1200, (i // 4) * 900)
+        scene.addItem(canvas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark multi-page PDF export')
+    parser.add_argument('--items', type=int, default=3000)
+    parser.add_argument('--canvases', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+
+    print(f'{args.items} items')
+    print(f'{"canvases":<12}{"one PDF (s)":>14}{"a PDF each (s)":>16}{"one PDF (KB)":>14}{"a PDF each (KB)":>17}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.canvases:
+            scene = create_scene(args.items)
+            add_canvases(scene, count)
+            rects = sorted((item.sceneBoundingRect() for item in scene.items() if isinstance(item, CanvasItem)),
+                           key=lambda rect: (rect.y(), rect.x()))
+            filenames = [os.path.join(directory, f'canvas_{i}.pdf') for i in range(len(rects))]
+
+            def single_pass():
+                write_pdf_pages(scene, rects, os.path.join(directory, 'all.pdf'))
+
+            def per_canvas():
+                for rect, filename in zip(rects, filenames):
+                    write_pdf(scene, rect, filename)
+
+            single_time = best_time(single_pass, args.repeat)
+            per_canvas_time = best_time(per_canvas, args.repeat)
+            single_size = os.path.getsize(os.path.join(directory, 'all.pdf'))
+            per_canvas_size = sum(os.path.getsize(filename) for filename in filenames)
+
+            print(f'{len(rects):<12}{single_time:>14.2f}{per_canvas_time:>16.2f}'
+                  f'{single_size / 1024:>14.0f}{per_canvas_size / 1024:>17.0f}')
+
+
+if __name__ == '__main__':
+    main()
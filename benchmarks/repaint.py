@@ -0,0 +1,82 @@
+"""
+Measure how many items a command repaints: the items it invalidates and the items the view paints
+afterwards, read from the scene's repaint counter, against a full scene update.
+
+Usage: python benchmarks/repaint.py [--items 1000 5000] [--commands 50]
+"""
+import argparse
+import random
+import time
+from scenes import create_app, create_scene
+from src.framework.graphics_framework import *
+from src.framework.undo_commands import ItemMovedUndoCommand
+
+
+def settle(app):
+    # Deliver the pending paint events
+    for _ in range(3):
+        app.processEvents()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark repainting after commands')
+    parser.add_argument('--items', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--commands', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    rng = random.Random(0)
+
+    print(f'{"items":<8}{"update":<14}{"invalidated":>13}{"painted":>10}{"ms":>8}')
+
+    for count in args.items:
+        window = QMainWindow()
+        window.resize(1400, 900)
+        scene = create_scene(count)
+        scene.setParentWindow(window)
+        view = CustomGraphicsView(scene, window)
+        view.setScene(scene)
+        window.setCentralWidget(view)
+        window.show()
+        view.fitInView(QRectF(0, 0, 1200, 800))
+        settle(app)
+
+        visible = [item for item in view.items(view.viewport().rect()) if item.parentItem() is None and
+                   not isinstance(item, CanvasItem)]
+        counter = scene.repaint_counter
+        counter.enabled = True
+
+        def run(update):
+            counter.clear()
+            start = time.perf_counter()
+
+            for _ in range(args.commands):
+                item = rng.choice(visible)
+                update(ItemMovedUndoCommand({item: item.pos()}, {item: item.pos() + QPointF(rng.uniform(-5, 5), 0)}))
+                settle(app)
+
+            elapsed = (time.perf_counter() - start) * 1000 / args.commands
+            events = list(counter.events)
+
+            return (sum(event['invalidated'] for event in events) / len(events),
+                    sum(event['painted'] for event in events) / len(events), elapsed)
+
+        def full_update(command):
+            # What every command used to do
+            scene.undo_stack.push(command)
+            QGraphicsScene.update(scene)
+
+            for item in scene.items():
+                item.update()
+
+            counter.invalidated('full', len(scene.items()))
+
+        for name, update in (('targeted', scene.addCommand), ('full scene', full_update)):
+            invalidated, painted, elapsed = run(update)
+            print(f'{count:<8}{name:<14}{invalidated:>13.1f}{painted:>10.1f}{elapsed:>8.2f}')
+
+        window.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import math
+import os
+import random
+import sys
+
+# Run from anywhere, the app loads its data files relative to the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from src.framework.graphics_framework import *
+
+
+def create_app():
+    return QApplication.instance() or QApplication(sys.argv)
+
+
+def create_scene(items=1000, points=50, seed=0):
+    """Build a synthetic course: canvases, course element svgs, drawn paths, text and images"""
+    rng = random.Random(seed)
+    scene = CustomGraphicsScene(QUndoStack())
+
+    for i in range(4):
+        canvas = CanvasItem(QRectF(0, 0, 1000, 700), f'Canvas {i + 1}')
+        canvas.setPos(i * 1200, 0)
+        scene.addItem(canvas)
+
+    svgs = [os.path.join('course elements', f) for f in sorted(os.listdir('course elements')) if f.endswith('.svg')]
+    pixmap = QPixmap(128, 128)
+    pixmap.fill(QColor('#2ea7e0'))
+
+    for i in range(items):
+        kind = i % 10
+
+        if kind < 4:
+            filename = svgs[i % len(svgs)]
+            item = CustomSvgItem.from_file(filename)
+
+        elif kind < 8:
+            path = QPainterPath()
+            path.moveTo(0, 0)
+
+            for k in range(points):
+                path.lineTo(k * 3.7, math.sin(k / 7 + i) * 40 + rng.uniform(-2, 2))
+
+            item = CustomPathItem(path)
+            item.setPen(QPen(QColor(rng.choice(['red', 'black', '#00ff00'])), rng.choice([1, 3, 5])))
+
+        elif kind < 9:
+            item = CustomTextItem(f'Feature {i}')
+
+        else:
+            item = CustomPixmapItem(pixmap)
+
+        item.setPos(rng.uniform(0, 4800), rng.uniform(0, 700))
+        scene.addItem(item)
+
+    return scene
@@ -7,12 +7,13 @@ from mp_software_stylesheets.styles import MPRUNCSS
 from src.framework.items import *
 from src.framework.graphics_framework import CustomGraphicsView, CustomGraphicsScene, CustomViewport
 from src.framework.data_repairer import FileDataRepairer
+from src.framework.managers.document_preview import PreviewCache, describe_preview
 from src.framework.three_dimensional_viewer.three_dimensional_viewer import SceneTo3DUserInterface
 from src.framework.course_element_builder.course_element_builder import CourseElementBuilder
 from src.gui.app_screens import AboutWin, VersionWin, DisclaimerWin, SettingsWin
 from src.gui.icloud_integrator import iCloudIntegratorWin
 from src.gui.panels import PropertiesPanel, CharactersPanel, LibrariesPanel, ScenePanel, \
-    CanvasEditorPanel
+    CanvasEditorPanel, ExportJobsPanel
 from src.scripts.app_internal import *
 from src.scripts.get_version import get_latest_version
 
@@ -36,6 +37,9 @@ class MPRUN(mprun.gui.base_window):
         # Actions
         self.actions = {}
 
+        # Previews of the recent files, read from the files' header blocks
+        self.preview_cache = PreviewCache()
+
         # Create UI
         self.create_ui()
         self.show()
@@ -93,6 +97,13 @@ class MPRUN(mprun.gui.base_window):
             except Exception:
                 pass
 
+        # Let any background save finish writing before the app exits
+        self.canvas.manager.wait_for_save()
+
+        if event.isAccepted():
+            # Closed properly, there is nothing to recover next time
+            self.canvas.manager.autosave.stop()
+
         data = self.read_settings()
 
         for _data in data:
@@ -200,10 +211,14 @@ class MPRUN(mprun.gui.base_window):
         open_action.triggered.connect(lambda: self.canvas.manager.load(self))
 
         self.open_recent_menu = mprun.gui.menu('Open Recent')
+        self.open_recent_menu.setToolTipsVisible(True)
 
         open_template_action = QAction('Open Template', self)
         open_template_action.triggered.connect(self.canvas.template_manager.load_template)
 
+        import_canvas_action = QAction('Import Canvas From File...', self)
+        import_canvas_action.triggered.connect(self.canvas.manager.import_canvas)
+
         save_action = QAction(QIcon(self.style().standardIcon(self.style().SP_DialogSaveButton)), 'Save', self)
         save_action.setShortcut(QKeySequence('Ctrl+S'))
         save_action.triggered.connect(self.canvas.manager.save)
@@ -223,12 +238,21 @@ class MPRUN(mprun.gui.base_window):
         export_action.setShortcut(QKeySequence('Ctrl+E'))
         export_action.triggered.connect(self.canvas.exportManager.normalExport)
 
+        export_all_action = QAction('Export All Canvases...', self)
+        export_all_action.setShortcut(QKeySequence('Ctrl+Shift+E'))
+        export_all_action.triggered.connect(self.canvas.exportManager.exportAll)
+
+        export_all_pdf_action = QAction('Export All Canvases As PDF...', self)
+        export_all_pdf_action.triggered.connect(self.canvas.exportManager.exportAllAsPDF)
+
         export_to_icloud_action = QAction(QIcon('mprun_assets/assets/ui/menu/url.svg'), 'Export To &iCloud...', self)
         export_to_icloud_action.triggered.connect(self.send_to_icloud)
 
         export_menu = mprun.gui.menu('Export', self)
         export_menu.setIcon(QIcon('mprun_assets/assets/ui/menu/output.svg'))
         export_menu.addAction(export_action)
+        export_menu.addAction(export_all_action)
+        export_menu.addAction(export_all_pdf_action)
         export_menu.addAction(export_to_icloud_action)
 
         repair_file_action = QAction(QIcon(self.style().standardIcon(self.style().SP_FileDialogToParent)),
@@ -243,6 +267,7 @@ class MPRUN(mprun.gui.base_window):
         self.file_menu.addAction(open_action)
         self.file_menu.addMenu(self.open_recent_menu)
         self.file_menu.addAction(open_template_action)
+        self.file_menu.addAction(import_canvas_action)
         self.file_menu.addSeparator()
         self.file_menu.addAction(save_action)
         self.file_menu.addAction(saveas_action)
@@ -650,11 +675,16 @@ class MPRUN(mprun.gui.base_window):
         self.scene_tab = ScenePanel(self.canvas, self)
         self.scene_tab.setFixedWidth(DEFAULT_PANEL_WIDTH)
 
+        # Exports Tab
+        self.exports_tab = ExportJobsPanel(self.canvas, self)
+        self.exports_tab.setFixedWidth(DEFAULT_PANEL_WIDTH)
+
         # Add tabs
         self.toolbox.addItem(self.properties_tab, 'Properties')
         self.toolbox.addItem(self.characters_tab, 'Characters')
         self.toolbox.addItem(self.canvas_tab, 'Canvas')
         self.toolbox.addItem(self.scene_tab, 'Scene')
+        self.toolbox.addItem(self.exports_tab, 'Exports')
         self.toolbox.addSpacer()
 
         # Add to actions dict
@@ -1754,15 +1784,32 @@ class MPRUN(mprun.gui.base_window):
                 max_recent_files = d['recent_file_display_limit']
 
             for recent_file in recent_files[:max_recent_files]:  # Slice the list
-                action = QAction(os.path.basename(recent_file), self)
-                action.setToolTip(os.path.abspath(recent_file))
-                action_tooltip = action.toolTip()
-                action.triggered.connect(lambda checked, path=action_tooltip: self.open_recent(path))
-
-                self.open_recent_menu.addAction(action)
+                self.open_recent_menu.addAction(self.create_recent_file_action(recent_file))
 
         self.write_recent_file(data)
 
+    def create_recent_file_action(self, recent_file: str) -> QAction:
+        path = os.path.abspath(recent_file)
+
+        action = QAction(os.path.basename(recent_file), self)
+        action.setData(path)
+        action.setToolTip(path)
+        action.triggered.connect(lambda checked, path=path: self.open_recent(path))
+
+        # Files saved with a preview get a thumbnail and a summary, without being opened
+        preview = self.preview_cache.get(path)
+
+        if preview is not None:
+            tooltip = f'<b>{path}</b><br>{describe_preview(preview)}'
+
+            if preview['thumbnail_file'] is not None:
+                action.setIcon(QIcon(preview['thumbnail_file']))
+                tooltip += f'<br><img src="{preview["thumbnail_file"]}">'
+
+            action.setToolTip(tooltip)
+
+        return action
+
     def update_recent_file_data(self, file: str):
         data = self.read_recent_files()
 
@@ -1788,14 +1835,9 @@ class MPRUN(mprun.gui.base_window):
 
             for recent_file in recent_files[:max_recent_files]:
                 if os.path.exists(recent_file):
-                    if os.path.abspath(recent_file) not in (action.toolTip() for action in
+                    if os.path.abspath(recent_file) not in (action.data() for action in
                                                             self.open_recent_menu.actions()):
-                        action = QAction(os.path.basename(recent_file), self)
-                        action.setToolTip(os.path.abspath(recent_file))
-                        action_tooltip = action.toolTip()
-                        action.triggered.connect(lambda checked, path=action_tooltip: self.open_recent(path))
-
-                        self.open_recent_menu.addAction(action)
+                        self.open_recent_menu.addAction(self.create_recent_file_action(recent_file))
 
     def toggle_control_toolbar(self, action: QAction) -> None:
         if action.isChecked():
@@ -1953,6 +1995,10 @@ def main() -> None:
     window.open_settings_data()
     window.open_recent_file_data()
 
+    # Offer the unsaved changes of a session that crashed, then start taking recovery snapshots
+    window.canvas.manager.autosave.offer_recovery()
+    window.canvas.manager.autosave.start()
+
     if len(sys.argv) > 1:
         file_path = sys.argv[1]
         window.open_recent(file_path)
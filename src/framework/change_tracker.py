@@ -0,0 +1,64 @@
+from PyQt5.QtWidgets import QGraphicsItem
+
+
+class ChangeTracker:
+    """
+    Collects the items touched by undo commands, so saves can
+    work on the changed items only instead of the whole scene.
+
+    It also keeps the serialized record of every clean item from the last save,
+    which is dropped as soon as the item changes (see SceneSerializer.serialize_cached).
+    """
+
+    def __init__(self):
+        self.dirty_items = set()
+        self.records = {}
+
+    def track_command(self, command):
+        self.mark_dirty(self.command_items(command))
+
+    def mark_dirty(self, items):
+        for item in items:
+            item = item.topLevelItem()
+
+            self.dirty_items.add(item)
+            self.records.pop(item, None)
+
+    def forget_record(self, item):
+        # Changes made outside undo commands (itemChange), the next save serializes the item again
+        self.records.pop(item.topLevelItem(), None)
+
+    def cached_record(self, item):
+        return self.records.get(item)
+
+    def store_record(self, item, entry):
+        self.records[item] = entry
+
+    def clear_records(self):
+        self.records.clear()
+
+    def take_dirty_items(self):
+        items = self.dirty_items
+        self.dirty_items = set()
+
+        return items
+
+    def restore_dirty_items(self, items):
+        self.dirty_items.update(items)
+
+    def clear(self):
+        self.dirty_items.clear()
+        self.records.clear()
+
+    def command_items(self, command):
+        # Commands keep the items they change as attributes (item, items, {item: pos}...)
+        items = []
+
+        for value in vars(command).values():
+            if isinstance(value, QGraphicsItem):
+                items.append(value)
+
+            elif isinstance(value, (list, tuple, set, dict)):
+                items.extend(v for v in value if isinstance(v, QGraphicsItem))
+
+        return items
@@ -1,12 +1,42 @@
+import hashlib
 from src.scripts.imports import *
 from src.framework.items import *
+from src.framework.managers.container import ContainerWriter, DocumentContainer
+from src.framework.managers.journal import DocumentJournal
+from src.framework.managers.library_index import LibraryIndex
+from src.framework.managers.record_format import read_frame
+from src.framework.managers.save_worker import atomic_write
 from src.scripts.app_internal import copyright_message
 
+# Fields an item record can't be rebuilt without
+REQUIRED_FIELDS = {
+    'CanvasItem': ('rect', 'name', 'x', 'y'),
+    'CustomTextItem': ('attr', 'text', 'font'),
+    'CustomPathItem': ('attr', 'elements', 'pen', 'brush'),
+    'LeaderLineItem': ('attr', 'elements', 'pen', 'brush', 'textattr'),
+    'CustomSvgItem': ('attr',),
+    'CustomPixmapItem': ('attr',),
+}
+
+# Record fields holding a key into the style tables
+STYLE_FIELDS = (('pen', 'pen'), ('brush', 'brush'), ('font', 'font'), ('textfont', 'font'))
+
+ASSET_TYPES = ('CustomSvgItem', 'CustomPixmapItem')
+
 
 class FileDataRepairer:
+    """
+    Validates a .mp file record by record (every record carries a checksum) and writes back the
+    intact items, streaming one block at a time. Images and svgs whose data is damaged or missing
+    are re-linked to files with the same name in the library folders.
+    """
+
     def __init__(self, parent: QMainWindow, filename=None):
         self.parent = parent
         self.filename = None
+        self.problems = []
+        self.library = None
+        self.default_styles = None
 
         if filename is None:
             file, _ = QFileDialog.getOpenFileName(parent, 'Choose File', '', 'MPRUN files (*.mp)')
@@ -21,37 +51,237 @@ class FileDataRepairer:
     def repair(self):
         if self.filename is not None:
             try:
-                with open(self.filename, 'rb') as f:
-                    data = self.repair_file(pickle.load(f))
+                salvaged = self.repair_file(self.filename)
+
+            except Exception as e:
+                QMessageBox.critical(self.parent, 'Repair File', f'The file could not be repaired: {e}')
+                return
+
+            message_box = QMessageBox(self.parent)
+            message_box.setWindowTitle('Process Complete')
+            message_box.setIcon(QMessageBox.Information)
+
+            if self.problems:
+                message_box.setText(f'File repair completed, {salvaged} items were salvaged and '
+                                    f'{len(self.problems)} problems were found.')
+                message_box.setDetailedText('\n'.join(self.problems))
+
+            else:
+                message_box.setText('File repair completed successfully, no problems were found.')
+
+            message_box.exec_()
+
+    def library_paths(self):
+        paths = []
+
+        for data in self.parent.read_settings():
+            paths = data.get('library_paths', [])
+
+        return paths + [os.path.abspath('course elements')]
+
+    def repair_file(self, filename):
+        """Rewrite filename in the current format with every intact item, returns how many were kept"""
+        self.problems = []
+        self.library = LibraryIndex(self.library_paths())
+        codec, level = self.parent.canvas.manager.compression_settings()
+
+        # The source is only closed after the repaired copy is complete, then the copy replaces it
+        with atomic_write(filename) as out:
+            writer = ContainerWriter(out, codec, level)
+
+            with open(filename, 'rb') as f:
+                if DocumentContainer.is_container(f):
+                    with DocumentContainer(f) as container:
+                        return self.repair_container(f, container, writer)
+
+                # Pickled documents can only be read as a whole
+                items_data, offsets = DocumentJournal.read(f)
+                blobs = items_data[0].get('blobs', {})
+
+                return self.write_repaired(items_data[0], items_data[1:], blobs.get, writer)
+
+    def repair_container(self, f, container, writer):
+        try:
+            metadata = container.read_metadata_record()
+
+        except Exception as e:
+            self.problems.append(f'Document settings are damaged, using defaults ({e})')
+            metadata = {}
+
+        journal_records, removes, journal_blobs, journal_styles = self.read_journal(f, container)
+
+        for kind, table in journal_styles.items():
+            metadata.setdefault('styles', {}).setdefault(kind, {}).update(table)
+
+        def read_blob(key):
+            if key in journal_blobs:
+                return journal_blobs[key]
+
+            if key not in container.index['blobs']:
+                return None
+
+            try:
+                return container.read_range(container.index['blobs'][key])
+
+            except Exception:
+                return None
+
+        def replaced(record):
+            # Base records that a later save removed or changed
+            return record.get('uid') in removes or record.get('uid') in journal_records
+
+        def records():
+            for number in range(len(container.index['blocks'])):
+                block_entries = container.block_entries(number)
+                block, error = container.salvage_block(number)
+
+                for entry, record in zip(block_entries, block):
+                    if record is None:
+                        self.problems.append(f'{self.describe(entry)}: record is damaged'
+                                             f'{"" if error is None else f" ({error})"}')
+
+                    elif not replaced(record):
+                        yield record
+
+            yield from journal_records.values()
+
+        return self.write_repaired(metadata, records(), read_blob, writer)
 
-                with open(self.filename, 'wb') as nf:
-                    pickle.dump(data, nf)
+    def read_journal(self, f, container):
+        """Replay the changes appended after the base snapshot, up to the first damaged entry"""
+        records = {}
+        removes = set()
+        blobs = {}
+        styles = {}
+
+        f.seek(container.base_end)
+
+        while True:
+            try:
+                entry = read_frame(f)
+
+            except EOFError:
+                break
 
             except Exception as e:
-                print(f"Error loading file: {e}")
+                self.problems.append(f'Changes from an interrupted save could not be recovered ({e})')
+                break
+
+            blobs.update(entry['blobs'])
+
+            for kind, table in entry.get('styles', {}).items():
+                styles.setdefault(kind, {}).update(table)
+
+            for uid in entry['removes']:
+                records.pop(uid, None)
+                removes.add(uid)
+
+            for record in entry['items']:
+                records[record['uid']] = record
+
+        return records, removes, blobs, styles
+
+    def write_repaired(self, metadata, records, read_blob, writer):
+        if 'mpversion' not in metadata:
+            self.problems.append('Document version is missing')
+            metadata['mpversion'] = self.parent.canvas.mpversion
+
+        metadata.pop('blobs', None)
+        styles = metadata.setdefault('styles', {})
+        count = 0
+
+        for record in records:
+            if self.repair_record(record, styles, read_blob, writer):
+                writer.add_record(record)
+                count += 1
+
+        metadata['item_count'] = count
+
+        writer.add_metadata(metadata)
+        writer.finish()
+
+        return count
+
+    def repair_record(self, record, styles, read_blob, writer):
+        """Check a decoded record and fix what can be fixed, returns False if the item has to be dropped"""
+        if record.get('type') not in REQUIRED_FIELDS:
+            self.problems.append(f'{self.describe(record)}: unknown item type')
+            return False
 
-            QMessageBox.information(self.parent, 'Process Complete', 'File repair completed successfully.')
+        missing = [field for field in REQUIRED_FIELDS[record['type']] if field not in record]
+
+        if missing:
+            self.problems.append(f'{self.describe(record)}: missing {", ".join(missing)}')
+            return False
+
+        for field, kind in STYLE_FIELDS:
+            if isinstance(record.get(field), str) and record[field] not in styles.get(kind, {}):
+                self.problems.append(f'{self.describe(record)}: {field} style is missing, using the default')
+                record[field] = self.default_style(kind)
+
+        if record['type'] in ASSET_TYPES:
+            return self.repair_asset(record, read_blob, writer)
+
+        return True
+
+    def repair_asset(self, record, read_blob, writer):
+        filename = record.get('filename')
+
+        if filename and not os.path.exists(filename):
+            relinked = self.library.find(filename)
+
+            if relinked is not None:
+                self.problems.append(f'{self.describe(record)}: re-linked {filename} to {relinked}')
+                record['filename'] = relinked
+
+        key = record.get('blob')
+
+        if key is None:
+            # Older records keep their data inline
+            if 'raw_svg_data' in record or 'data' in record:
+                return True
+
+        elif writer.has_blob(key):
+            return True
 
-    def repair_file(self, serialized_data):
-        is_valid, message = self.validate_serialized_data(serialized_data)
-        if not is_valid:
-            print(f'File is corrupted: {message}')
-            self.repair_data(serialized_data)  # attempt to repair
         else:
-            print('File is valid.')
-        return serialized_data
+            data = read_blob(key)
+
+            if data is not None and hashlib.sha256(data).hexdigest() == key:
+                writer.add_blob(key, data)
+                return True
+
+        data = self.read_asset_file(record.get('filename'))
+
+        if data is None:
+            self.problems.append(f'{self.describe(record)}: image data is missing and '
+                                 f'{filename or "its file"} could not be found in the library')
+            return False
+
+        record['blob'] = hashlib.sha256(data).hexdigest()
+        writer.add_blob(record['blob'], data)
+        self.problems.append(f'{self.describe(record)}: image data restored from {record["filename"]}')
+
+        return True
+
+    def read_asset_file(self, filename):
+        if not filename or not os.path.exists(filename):
+            return None
 
-    def repair_data(self, data):
-        """If we update file serialization, we will add repair methods here to fix any errors"""
-        pass
+        with open(filename, 'rb') as f:
+            return f.read()
 
-    def validate_serialized_data(self, data):
-        required_fields = ['mpversion', 'item_count']
-        for field in required_fields:
-            if field not in data:
-                return False, f'Missing field: {field}'
+    def default_style(self, kind):
+        if self.default_styles is None:
+            serializer = self.parent.canvas.manager.serializer
+            self.default_styles = {
+                'pen': serializer.serialize_pen(QPen(QColor('black'), 1)),
+                'brush': serializer.serialize_brush(QBrush()),
+                'font': serializer.serialize_font(QFont()),
+            }
 
-        if data['item_count'] != len(data) - 1:  # account for metadata
-            return False, 'Item count mismatch'
+        return self.default_styles[kind]
 
-        return True, 'Data is valid'
+    @staticmethod
+    def describe(record):
+        return f'{record.get("type", "Unknown item")} {record.get("uid") or ""}'.strip()
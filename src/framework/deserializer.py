@@ -1,20 +1,73 @@
 from src.scripts.imports import *
 from src.framework.items import *
+from src.framework.path_codec import PathCodec
+from src.framework.managers.asset_decoder import decode_assets
 
 
 class SceneDeserializer:
     def __init__(self, scene):
         self.scene = scene
 
+        # Blob table from the file, the objects decoded from it, and the assets decoded ahead on a thread pool
+        self.blobs = {}
+        self.blob_cache = {}
+        self.decoded_assets = {}
+
+        # Style tables from the file, and one pen/brush/font built per entry
+        self.styles = {}
+        self.style_cache = {}
+
+        # Seconds spent decoding the assets of the last document
+        self.timings = {'decode': 0.0}
+
     def deserialize_items(self, items_data):
         # Handle metadata
         metadata = items_data.pop(0)
+        self.deserialize_metadata(metadata)
+        self.decoded_assets, self.timings['decode'] = decode_assets(self.blobs, items_data)
+
+        for item_data in items_data:
+            self.add_item(item_data)
+
+        self.finish()
+
+    def deserialize_records(self, items_data):
+        # Build the items without adding them to the scene (used by imports)
+        self.load_tables(items_data)
+        items = [self.deserialize_item(item_data) for item_data in items_data[1:]]
+        self.clear_tables()
+
+        return [item for item in items if item is not None]
+
+    def load_tables(self, items_data):
+        # Blob and style tables of the records, without the checks of deserialize_metadata
+        self.blobs = items_data[0].get('blobs', {})
+        self.blob_cache = {}
+        self.styles = items_data[0].get('styles', {})
+        self.style_cache = {}
+        self.decoded_assets, self.timings['decode'] = decode_assets(self.blobs, items_data[1:])
+
+    def clear_tables(self):
+        # Decoded blobs are owned by the items now
+        self.blobs = {}
+        self.blob_cache = {}
+        self.decoded_assets = {}
+        self.styles = {}
+        self.style_cache = {}
+
+    def deserialize_metadata(self, metadata, warn_large=True):
+        self.blobs = metadata.get('blobs', {})
+        self.blob_cache = {}
+        self.decoded_assets = {}
+        self.styles = metadata.get('styles', {})
+        self.style_cache = {}
+
         if metadata.get('mpversion', 'unknown') != self.scene.mpversion:
             QMessageBox.warning(self.scene.parentWindow, 'Open File', 'You are attempting to open a file saved in an '
                                                                       'different version of MPRUN, this may cause '
                                                                       'errors.')
 
-        if metadata.get('item_count', 'unknown') >= 500:
+        if warn_large and metadata.get('item_count', 'unknown') >= 500:
             QMessageBox.warning(self.scene.parentWindow, 'Open File', 'You are attempting to open a file with a large '
                                                                       'amount of items, this can cause your computer '
                                                                       'to slow down.')
@@ -24,30 +77,52 @@ class SceneDeserializer:
                                                                           ' platform, replacing fonts and styles with '
                                                                           'ones that match your platform.')
 
-        for item_data in items_data:
-            item = None
-            if item_data['type'] == 'CanvasItem':
-                item = self.deserialize_canvas(item_data)
-            elif item_data['type'] == 'CustomTextItem':
-                item = self.deserialize_custom_text_item(item_data)
-            elif item_data['type'] == 'CustomPathItem':
-                item = self.deserialize_custom_path_item(item_data)
-            elif item_data['type'] == 'LeaderLineItem':
-                item = self.deserialize_leader_line_item(item_data)
-            elif item_data['type'] == 'CustomSvgItem':
-                item = self.deserialize_custom_svg_item(item_data)
-            elif item_data['type'] == 'CustomPixmapItem':
-                item = self.deserialize_custom_pixmap_item(item_data)
-
-            if item is not None:
-                self.scene.addItem(item)
+    def deserialize_item(self, item_data):
+        item = None
+        if item_data['type'] == 'CanvasItem':
+            item = self.deserialize_canvas(item_data)
+        elif item_data['type'] == 'CustomTextItem':
+            item = self.deserialize_custom_text_item(item_data)
+        elif item_data['type'] == 'CustomPathItem':
+            item = self.deserialize_custom_path_item(item_data)
+        elif item_data['type'] == 'LeaderLineItem':
+            item = self.deserialize_leader_line_item(item_data)
+        elif item_data['type'] == 'CustomSvgItem':
+            item = self.deserialize_custom_svg_item(item_data)
+        elif item_data['type'] == 'CustomPixmapItem':
+            item = self.deserialize_custom_pixmap_item(item_data)
+
+        if item is not None:
+            item.mp_uid = item_data.get('uid')
+
+        return item
+
+    def add_item(self, item_data):
+        item = self.deserialize_item(item_data)
+
+        if item is not None:
+            self.scene.addItem(item)
+
+        return item
 
+    def finish(self):
+        self.clear_tables()
         self.scene.parentWindow.use_exit_add_canvas()
 
     def deserialize_color(self, color):
         return QColor(color['red'], color['green'], color['blue'], color['alpha'])
 
+    def deserialize_style(self, kind, key, build):
+        if (kind, key) not in self.style_cache:
+            self.style_cache[(kind, key)] = build(self.styles[kind][key])
+
+        return self.style_cache[(kind, key)]
+
     def deserialize_pen(self, data):
+        # Interned styles are referenced by key, older files store them inline
+        if isinstance(data, str):
+            return self.deserialize_style('pen', data, self.deserialize_pen)
+
         pen = QPen()
         pen.setWidth(data['width'])
         pen.setColor(self.deserialize_color(data['color']))
@@ -80,12 +155,18 @@ class SceneDeserializer:
         return pen
 
     def deserialize_brush(self, data):
+        if isinstance(data, str):
+            return self.deserialize_style('brush', data, self.deserialize_brush)
+
         brush = QBrush()
         brush.setColor(self.deserialize_color(data['color']))
         brush.setStyle(data['style'])
         return brush
 
     def deserialize_font(self, data):
+        if isinstance(data, str):
+            return self.deserialize_style('font', data, self.deserialize_font)
+
         font = QFont()
         font.setFamily(data['family'])
         font.setPixelSize(data['pointsize'])
@@ -106,15 +187,29 @@ class SceneDeserializer:
             raise ValueError(f"Unknown alignment value: {data}")
 
     def deserialize_transform(self, data):
-        transform = QTransform(
-            data['m11'], data['m12'], data['m13'],
-            data['m21'], data['m22'], data['m23'],
-            data['m31'], data['m32'], data['m33']
-        )
-        return transform
+        if data is None:
+            return QTransform()
+
+        # Older files store the matrix as a dict
+        if isinstance(data, dict):
+            data = [data['m11'], data['m12'], data['m13'],
+                    data['m21'], data['m22'], data['m23'],
+                    data['m31'], data['m32'], data['m33']]
+
+        return QTransform(*data)
+
+    def deserialize_path(self, data):
+        # Already decoded by the document loader thread
+        if isinstance(data, QPainterPath):
+            return data
+
+        return PathCodec.decode(data)
 
     def deserialize_point(self, data):
-        return QPointF(data['x'], data['y'])
+        if isinstance(data, dict):
+            return QPointF(data['x'], data['y'])
+
+        return QPointF(*data)
 
     def deserialize_canvas(self, data):
         rect = QRectF(*data['rect'])
@@ -135,19 +230,7 @@ class SceneDeserializer:
         return text_item
 
     def deserialize_custom_path_item(self, data):
-        sub_path = QPainterPath()
-        for element in data['elements']:
-            if element['type'] == 'moveTo':
-                sub_path.moveTo(element['x'], element['y'])
-            elif element['type'] == 'lineTo':
-                sub_path.lineTo(element['x'], element['y'])
-            elif element['type'] == 'curveTo':
-                sub_path.cubicTo(element['x'],
-                                 element['y'],
-                                 element['x'],
-                                 element['y'],
-                                 element['x'],
-                                 element['y'])
+        sub_path = self.deserialize_path(data['elements'])
 
         path_item = CustomPathItem(sub_path)
         path_item.setPen(self.deserialize_pen(data['pen']))
@@ -164,19 +247,7 @@ class SceneDeserializer:
         return path_item
 
     def deserialize_leader_line_item(self, data):
-        sub_path = QPainterPath()
-        for element in data['elements']:
-            if element['type'] == 'moveTo':
-                sub_path.moveTo(element['x'], element['y'])
-            elif element['type'] == 'lineTo':
-                sub_path.lineTo(element['x'], element['y'])
-            elif element['type'] == 'curveTo':
-                sub_path.cubicTo(element['x'],
-                                 element['y'],
-                                 element['x'],
-                                 element['y'],
-                                 element['x'],
-                                 element['y'])
+        sub_path = self.deserialize_path(data['elements'])
 
         path_item = LeaderLineItem(sub_path, data['text'])
         path_item.setPen(self.deserialize_pen(data['pen']))
@@ -197,7 +268,12 @@ class SceneDeserializer:
         try:
             svg_item = CustomSvgItem()
             svg_item.store_filename(data['filename'])
-            svg_item.loadFromData(data['raw_svg_data'])
+
+            if 'blob' in data:
+                svg_item.loadFromData(*self.deserialize_svg_blob(data['blob']))
+
+            else:
+                svg_item.loadFromData(data['raw_svg_data'])
 
             self.process_attributes(svg_item, data['attr'])
 
@@ -207,30 +283,84 @@ class SceneDeserializer:
             print(e)
 
     def deserialize_custom_pixmap_item(self, data):
-        pixmap = QPixmap(data['filename'])
-        pixmap_item = CustomPixmapItem(pixmap)
+        pixmap_item = CustomPixmapItem()
         pixmap_item.store_filename(data['filename'])
-        pixmap_item.loadFromData(data['data'])
 
-        self.process_attributes(pixmap_item, data['attr'])
+        if 'blob' in data:
+            pixmap_item.loadFromData(self.blobs[data['blob']], self.deserialize_pixmap_blob(data['blob']), data['blob'])
+
+        elif data.get('data'):
+            # Older files store the image inline
+            pixmap_item.loadFromData(data['data'])
+
+        else:
+            pixmap_item.setPixmap(QPixmap(data['filename']))
 
-        pixmap = pixmap_item.pixmap()
-        buffer = QBuffer()
-        buffer.open(QIODevice.WriteOnly)
-        pixmap.save(buffer, "PNG")
-        pixmap_data = buffer.data().data()
-        pixmap_item.loadFromData(pixmap_data)
+        self.process_attributes(pixmap_item, data['attr'])
 
         return pixmap_item
 
+    def deserialize_svg_blob(self, key):
+        # Every item using the same source shares one renderer
+        if key not in self.blob_cache:
+            if key in self.decoded_assets:
+                self.blob_cache[key] = self.decoded_assets.pop(key)
+
+            else:
+                svg_data = self.blobs[key].decode('utf-8')
+                self.blob_cache[key] = (svg_data, QSvgRenderer(QByteArray(self.blobs[key])))
+
+        return self.blob_cache[key]
+
+    def deserialize_pixmap_blob(self, key):
+        # Each image is decoded once, items using it share the pixmap
+        if key not in self.blob_cache:
+            if key in self.decoded_assets:
+                pixmap = QPixmap.fromImage(self.decoded_assets.pop(key))
+
+            else:
+                pixmap = QPixmap()
+                pixmap.loadFromData(self.blobs[key])
+
+            self.blob_cache[key] = pixmap
+
+        return self.blob_cache[key]
+
     def process_attributes(self, item, data):
-        for _data in data:
-            item.setTransformOriginPoint(self.deserialize_point(_data['transformorigin']))
-            item.setRotation(_data['rotation'])
-            item.setTransform(self.deserialize_transform(_data['transform']))
-            item.setScale(_data['scale'])
-            item.setPos(_data['x'], _data['y'])
-            item.setToolTip(_data['name'])
-            item.setZValue(_data['zval'])
-            item.setOpacity(_data['opacity'])
-            item.setVisible(_data['visible'])
+        rotation, transform, scale, origin, x, y, name, zval, opacity, visible = self.item_attributes(data)
+
+        # New items already have the default values, skip them to avoid the itemChange round trips
+        if origin != [0.0, 0.0]:
+            item.setTransformOriginPoint(self.deserialize_point(origin))
+
+        if rotation:
+            item.setRotation(rotation)
+
+        if transform is not None:
+            item.setTransform(self.deserialize_transform(transform))
+
+        if scale != 1.0:
+            item.setScale(scale)
+
+        item.setPos(x, y)
+        item.setToolTip(name)
+
+        if zval:
+            item.setZValue(zval)
+
+        if opacity != 1.0:
+            item.setOpacity(opacity)
+
+        if not visible:
+            item.setVisible(False)
+
+    @staticmethod
+    def item_attributes(data):
+        # Older files store a list holding one dict of attributes
+        if data and isinstance(data[0], dict):
+            data = data[0]
+
+            return [data['rotation'], data['transform'], data['scale'], data['transformorigin'], data['x'],
+                    data['y'], data['name'], data['zval'], data['opacity'], data['visible']]
+
+        return data
@@ -1,6 +1,8 @@
 import os.path
 import mprun.gui
 from mprun.constants import *
+from src.framework.change_tracker import ChangeTracker
+from src.framework.repaint_counter import RepaintCounter
 from src.framework.managers.export_manager import ExportManager
 from src.framework.managers.file_manager import SceneFileManager
 from src.framework.managers.import_manager import ImportManager
@@ -134,8 +136,9 @@ y: {int(self.mapToScene(point).y())}''')
         self.on_add_canvas_trigger()
 
     def mouseMoveEvent(self, event):
-        if self.scene().selectedItems():
-            self.update()
+        # Only drags change the selected items, hover moves have nothing to repaint
+        if event.buttons() and self.scene().selectedItems():
+            self.canvas.invalidateItems(self.scene().selectedItems(), event='mouse move')
 
         if self.currentTool() == CustomGraphicsView.PathTool:
             self.pathDrawingTool.specialToolTip(event)
@@ -364,17 +367,35 @@ y: {int(self.mapToScene(point).y())}''')
         self.applyZoom()
 
     def update(self):
+        # Repaints what's visible, items repaint themselves when they change
         super().update()
+        self.viewport().update()
 
-        for item in self.scene().items():
-            item.update()
+    def paintEvent(self, event):
+        super().paintEvent(event)
 
-            if hasattr(item, 'resize_orb'):
-                item.resize_orb.updateOrb()
+        # Counting the painted items queries the scene index on every paint, only do it while measuring
+        if not self.canvas.repaint_counter.enabled:
+            return
+
+        # The items inside the repainted region
+        items = set()
+
+        for rect in event.region().rects():
+            items.update(self.items(rect, Qt.ItemSelectionMode.IntersectsItemBoundingRect))
+
+        self.canvas.repaint_counter.painted(len(items))
 
     def keyPressEvent(self, event):
         super().keyPressEvent(event)
-        self.update()
+
+        # Key presses change the selected items (nudges) or the one being edited
+        items = self.scene().selectedItems()
+
+        if self.scene().focusItem() is not None:
+            items.append(self.scene().focusItem())
+
+        self.canvas.invalidateItems(items, event='key press')
 
     def createTemporaryItem(self, url):
         """
@@ -382,17 +403,14 @@ y: {int(self.mapToScene(point).y())}''')
         """
         local_file = url.toLocalFile()
         if local_file.endswith('.svg'):
-            item = CustomSvgItem(local_file)
-            item.store_filename(os.path.abspath(local_file))
+            item = CustomSvgItem.from_file(os.path.abspath(local_file))
             item.setToolTip('Imported SVG')
         elif local_file.endswith(('.txt', '.csv')):
             with open(local_file, 'r') as f:
                 item = CustomTextItem(f.read())
                 item.setToolTip('Imported Text')
         else:
-            pixmap = QPixmap(local_file)
-            item = CustomPixmapItem(pixmap)
-            item.store_filename(os.path.abspath(local_file))
+            item = CustomPixmapItem.from_file(os.path.abspath(local_file))
             item.setToolTip('Imported Bitmap')
 
         # Set default attributes for the temporary item
@@ -507,6 +525,9 @@ class CustomGraphicsScene(QGraphicsScene):
         self.undo_stack = undoStack
         self.copy_stack = []
         self.modified = False
+        self.change_generation = 0
+        self.change_tracker = ChangeTracker()
+        self.repaint_counter = RepaintCounter()
         self.parentWindow = None
 
         width = 64000
@@ -543,52 +564,96 @@ class CustomGraphicsScene(QGraphicsScene):
             self.oldPositions = {}
 
     def clearSelection(self):
+        items = self.selectedItems()
         super().clearSelection()
-        self.update()
+        self.invalidateItems(items, event='clear selection')
 
     def update(self, rect=None):
-        super().update()
+        # Invalidates the views, items repaint themselves when they change (see invalidateItems)
+        if rect is None:
+            super().update()
+
+        else:
+            super().update(rect)
+
+    def itemRegion(self, item):
+        # The item and its children (leader line text, canvas name...) in scene coordinates
+        return item.mapRectToScene(item.boundingRect() | item.childrenBoundingRect())
+
+    def itemRegions(self, items):
+        return [self.itemRegion(item) for item in items if item.scene() is self]
+
+    def invalidateItems(self, items, old_regions=(), event='update'):
+        """
+        Repaint the items and the regions they covered before a change (old_regions, see
+        itemRegions) instead of the whole scene. Counted by the repaint counter under event.
+        """
+        count = 0
+
+        for rect in old_regions:
+            super().update(rect)
+
+        # Commands can keep an item more than once (old and new positions...)
+        for item in dict.fromkeys(items):
+            if item.scene() is not self:
+                # Removed by the change, its old region is enough
+                continue
 
-        for item in self.items():
             item.update()
+            super().update(self.itemRegion(item))
+            count += 1
+
+            if hasattr(item, 'resize_orb'):
+                item.resize_orb.updateOrb()
+
+            if isinstance(item.parentItem(), LeaderLineItem):
+                item.parentItem().updatePathEndPoint()
+
+        self.repaint_counter.invalidated(event, count)
 
     def onItemMoved(self, oldPositions, newPositions):
         self.addCommand(ItemMovedUndoCommand(oldPositions, newPositions))
 
     def undo(self):
         if self.undo_stack.canUndo():
+            items = self.change_tracker.command_items(self.undo_stack.command(self.undo_stack.index() - 1))
+            old_regions = self.itemRegions(items)
+
+            self.change_tracker.mark_dirty(items)
             self.undo_stack.undo()
+            self.invalidateItems(items, old_regions, 'undo')
             self.modified = True
+            self.change_generation += 1
             self.parentWindow.setWindowTitle(f'{os.path.basename(self.manager.filename)}* - MPRUN')
 
         self.parentWindow.properties_tab.updateTransformUi()
         self.parentWindow.update_appearance_ui()
-        self.views()[0].update()
-
-        for item in self.items():
-            if isinstance(item, CustomTextItem):
-                if isinstance(item.parentItem(), LeaderLineItem):
-                    item.parentItem().updatePathEndPoint()
 
     def redo(self):
         if self.undo_stack.canRedo():
+            items = self.change_tracker.command_items(self.undo_stack.command(self.undo_stack.index()))
+            old_regions = self.itemRegions(items)
+
             self.undo_stack.redo()
+            self.change_tracker.mark_dirty(items)
+            self.invalidateItems(items, old_regions, 'redo')
             self.modified = True
+            self.change_generation += 1
             self.parentWindow.setWindowTitle(f'{os.path.basename(self.manager.filename)}* - MPRUN')
 
         self.parentWindow.properties_tab.updateTransformUi()
         self.parentWindow.update_appearance_ui()
-        self.views()[0].update()
-
-        for item in self.items():
-            if isinstance(item, CustomTextItem):
-                if isinstance(item.parentItem(), LeaderLineItem):
-                    item.parentItem().updatePathEndPoint()
 
     def addCommand(self, command: QUndoCommand):
+        # Pushing the command runs it, only the items it changes are repainted
+        items = self.change_tracker.command_items(command)
+        old_regions = self.itemRegions(items)
+
         self.undo_stack.push(command)
-        self.primaryView().update()
+        self.change_tracker.mark_dirty(items)
+        self.invalidateItems(items, old_regions, 'command')
         self.setHasChanges(True)
+        self.change_generation += 1
         self.parentWindow.setWindowTitle(f'{os.path.basename(self.manager.filename)}* - MPRUN')
 
         if isinstance(command, AddItemCommand):
@@ -708,8 +773,6 @@ class CustomGraphicsScene(QGraphicsScene):
             else:
                 self.copy_stack.append(item.copy())
 
-        self.views()[0].update()
-
     def cut(self):
         self.copy_stack.clear()
 
@@ -724,7 +787,6 @@ class CustomGraphicsScene(QGraphicsScene):
                 cut_items.append(item)
 
         self.addCommand(RemoveItemCommand(self, cut_items))
-        self.views()[0].update()
 
     def paste(self):
         new_items = []
@@ -742,8 +804,6 @@ class CustomGraphicsScene(QGraphicsScene):
                 if isinstance(item, CanvasItem):
                     self.parentWindow.use_add_canvas()
 
-        self.views()[0].update()
-
     def duplicate(self):
         new_items = []
 
@@ -761,13 +821,14 @@ class CustomGraphicsScene(QGraphicsScene):
                 if isinstance(item, CanvasItem):
                     self.parentWindow.use_add_canvas()
 
-        self.views()[0].update()
-
     def hasChanges(self):
         return self.modified
 
     def setHasChanges(self, has: bool):
         self.modified = has
 
+    def changeGeneration(self):
+        return self.change_generation
+
     def primaryView(self) -> CustomGraphicsView:
         return self.views()[0]
\ No newline at end of file
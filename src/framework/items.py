@@ -1,12 +1,35 @@
+import hashlib
 import os
 from scipy.signal import savgol_filter
 from mprun.constants import *
 from src.scripts.imports import *
 from src.framework.undo_commands import *
+from src.framework.svg_cache import svg_sources
 
 if getattr(sys, 'frozen', False):
     os.chdir(sys._MEIPASS)
 
+# Changes that make the record saved for an item out of date
+RECORD_CHANGES = (
+    QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged,
+    QGraphicsItem.GraphicsItemChange.ItemTransformHasChanged,
+    QGraphicsItem.GraphicsItemChange.ItemRotationHasChanged,
+    QGraphicsItem.GraphicsItemChange.ItemScaleHasChanged,
+    QGraphicsItem.GraphicsItemChange.ItemTransformOriginPointHasChanged,
+    QGraphicsItem.GraphicsItemChange.ItemZValueHasChanged,
+    QGraphicsItem.GraphicsItemChange.ItemOpacityHasChanged,
+    QGraphicsItem.GraphicsItemChange.ItemVisibleHasChanged,
+    QGraphicsItem.GraphicsItemChange.ItemToolTipHasChanged,
+)
+
+
+def forget_record(item, change=None):
+    # Drop the record cached by the serializer, for changes made outside undo commands
+    scene = item.scene()
+
+    if (change is None or change in RECORD_CHANGES) and hasattr(scene, 'change_tracker'):
+        scene.change_tracker.forget_record(item)
+
 
 class ResizeOrb(QGraphicsEllipseItem):
     handleTopMiddle = 2
@@ -247,6 +270,23 @@ class CustomPathItem(QGraphicsPathItem):
 
         self.smooth = False
 
+    def itemChange(self, change, value):
+        forget_record(self, change)
+
+        return super().itemChange(change, value)
+
+    def setPath(self, path):
+        super().setPath(path)
+        forget_record(self)
+
+    def setPen(self, pen):
+        super().setPen(pen)
+        forget_record(self)
+
+    def setBrush(self, brush):
+        super().setBrush(brush)
+        forget_record(self)
+
     def duplicate(self):
         item = self.copy()
         item.moveBy(10, 10)
@@ -409,16 +449,62 @@ class CustomPathItem(QGraphicsPathItem):
 
 
 class CustomPixmapItem(QGraphicsPixmapItem):
-    def __init__(self, file):
-        super().__init__(file)
+    def __init__(self, file=None):
+        super().__init__(QPixmap() if file is None else file)
 
         self.filename = None
 
-    def loadFromData(self, data):
-        pixmap = QPixmap()
-        pixmap.loadFromData(data)
+        # The encoded image (PNG, JPEG, WEBP...) the pixmap was decoded from, saved as is
+        self.image_data = None
+        self.image_hash = None
+
+    def itemChange(self, change, value):
+        forget_record(self, change)
+
+        return super().itemChange(change, value)
+
+    @classmethod
+    def from_file(cls, file):
+        # Keep the file's bytes, so saving doesn't have to re-encode the image
+        item = cls()
+
+        with open(file, 'rb') as f:
+            item.loadFromData(f.read())
+
+        item.store_filename(file)
+
+        return item
+
+    def loadFromData(self, data, pixmap=None, key=None):
+        """Show encoded image data, pass the pixmap and hash when they are already known"""
+        if pixmap is None:
+            pixmap = QPixmap()
+            pixmap.loadFromData(data)
+
         self.setPixmap(pixmap)
 
+        self.image_data = bytes(data)
+        self.image_hash = key or hashlib.sha256(self.image_data).hexdigest()
+
+    def setPixmap(self, pixmap):
+        super().setPixmap(pixmap)
+
+        # The stored bytes don't match a new pixmap anymore
+        self.image_data = None
+        self.image_hash = None
+
+    def encoded_data(self):
+        """The encoded image and its hash, pixmaps without one are encoded to PNG once"""
+        if self.image_data is None:
+            buffer = QBuffer()
+            buffer.open(QIODevice.WriteOnly)
+            self.pixmap().save(buffer, 'PNG')
+
+            self.image_data = buffer.data().data()
+            self.image_hash = hashlib.sha256(self.image_data).hexdigest()
+
+        return self.image_data, self.image_hash
+
     def store_filename(self, file):
         self.filename = file
 
@@ -433,6 +519,8 @@ class CustomPixmapItem(QGraphicsPixmapItem):
 
     def copy(self):
         item = CustomPixmapItem(self.pixmap())
+        item.image_data = self.image_data
+        item.image_hash = self.image_hash
         item.setPos(self.pos())
         item.setTransformOriginPoint(self.transformOriginPoint())
         item.setScale(self.scale())
@@ -460,13 +548,33 @@ class CustomSvgItem(QGraphicsSvgItem):
 
         self.filename = ''
         self.svg_data = None
-        for f in file:
-            self.render = QSvgRenderer(f)
+        self.shared_renderer = None
+
+    @classmethod
+    def from_file(cls, file):
+        # Library elements are placed many times, every item shares the cached source and renderer
+        source = svg_sources.get(file)
 
-    def loadFromData(self, svg_data) -> None:
+        item = cls()
+        item.loadFromData(source.text, source.renderer)
+        item.store_filename(file)
+
+        return item
+
+    def itemChange(self, change, value):
+        forget_record(self, change)
+
+        return super().itemChange(change, value)
+
+    def loadFromData(self, svg_data, renderer=None) -> None:
         try:
             self.svg_data = svg_data
-            renderer = QSvgRenderer(QByteArray(svg_data.encode('utf-8')))
+
+            if renderer is None:
+                renderer = QSvgRenderer(QByteArray(svg_data.encode('utf-8')))
+
+            # A shared renderer isn't owned by the item, keep it alive as long as the item
+            self.shared_renderer = renderer
             self.setSharedRenderer(renderer)
             self.setElementId("")  # Optional: set specific SVG element ID if needed
         except Exception as e:
@@ -492,7 +600,7 @@ class CustomSvgItem(QGraphicsSvgItem):
         svg = self.source()
 
         if os.path.exists(svg):
-            item = CustomSvgItem(svg)
+            item = CustomSvgItem.from_file(svg)
             item.setPos(self.pos())
             item.setTransformOriginPoint(self.transformOriginPoint())
             item.setScale(self.scale())
@@ -531,6 +639,7 @@ class CustomTextItem(QGraphicsTextItem):
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
         self.setAcceptHoverEvents(True)
         self.installEventFilter(self)
+        self.document().contentsChanged.connect(self.forgetRecord)
 
         # Text editing
         self.locked = False
@@ -538,19 +647,32 @@ class CustomTextItem(QGraphicsTextItem):
         self.old_text = self.toPlainText()
         self.text_alignment = None
 
-        # Create the suggestion popup
-        self.suggestion_popup = QListWidget()
-        self.suggestion_popup.setToolTip('<i>Press the up-arrow key to accept suggestions</i>')
-        self.suggestion_popup.setObjectName('searchList')
-        self.suggestion_popup.setFixedWidth(250)
-        self.suggestion_popup.setFixedHeight(100)
-        self.suggestion_popup.setWindowFlags(WINDOW_TYPE_POPUP)
+        # The suggestion popup and trick list are only needed while editing, create them on first use
+        self._suggestion_popup = None
+        self._trick_types = None
+
+    @property
+    def suggestion_popup(self):
+        if self._suggestion_popup is None:
+            self._suggestion_popup = QListWidget()
+            self._suggestion_popup.setToolTip('<i>Press the up-arrow key to accept suggestions</i>')
+            self._suggestion_popup.setObjectName('searchList')
+            self._suggestion_popup.setFixedWidth(250)
+            self._suggestion_popup.setFixedHeight(100)
+            self._suggestion_popup.setWindowFlags(WINDOW_TYPE_POPUP)
+
+        return self._suggestion_popup
+
+    @property
+    def trick_types(self):
+        if self._trick_types is None:
+            self._trick_types = []
 
-        self.trick_types = []
+            with open('internal data/_tricks.txt', 'r') as f:
+                for line in f.readlines():
+                    self._trick_types.append(line.strip())
 
-        with open('internal data/_tricks.txt', 'r') as f:
-            for line in f.readlines():
-                self.trick_types.append(line.strip())
+        return self._trick_types
 
     def mouseDoubleClickEvent(self, event):
         if self.locked == False:
@@ -649,7 +771,25 @@ class CustomTextItem(QGraphicsTextItem):
 
         return super().eventFilter(obj, event)
 
+    def forgetRecord(self):
+        # Typed text is only committed to an undo command when editing ends
+        forget_record(self)
+
+    def setFont(self, font):
+        super().setFont(font)
+        forget_record(self)
+
+    def setTextWidth(self, width):
+        super().setTextWidth(width)
+        forget_record(self)
+
+    def setDefaultTextColor(self, color):
+        super().setDefaultTextColor(color)
+        forget_record(self)
+
     def itemChange(self, change, value):
+        forget_record(self, change)
+
         if isinstance(self.parentItem(), LeaderLineItem):
             self.parentItem().updatePathEndPoint()
 
@@ -781,6 +921,23 @@ class LeaderLineItem(QGraphicsPathItem):
         self.text_element.setParentItem(self)
         self.text_element.setToolTip("Text")
 
+    def itemChange(self, change, value):
+        forget_record(self, change)
+
+        return super().itemChange(change, value)
+
+    def setPath(self, path):
+        super().setPath(path)
+        forget_record(self)
+
+    def setPen(self, pen):
+        super().setPen(pen)
+        forget_record(self)
+
+    def setBrush(self, brush):
+        super().setBrush(brush)
+        forget_record(self)
+
     def shape(self):
         # Call the superclass's shape method to get the original path
         path = super().shape()
@@ -805,45 +962,16 @@ class LeaderLineItem(QGraphicsPathItem):
         painter.setPen(self.pen())
         painter.setBrush(self.brush())
 
-        # Get the bottom-left and bottom-right points of the text element's bounding rect
-        bottom_left = self.text_element.mapToParent(self.text_element.boundingRect().bottomLeft())
-        bottom_right = self.text_element.mapToParent(self.text_element.boundingRect().bottomRight())
-
         # Draw the line according to the text element's rotated position
-        painter.drawLine(bottom_left, bottom_right)
+        painter.drawLine(*self.underline())
 
         try:
             painter.setPen(self.pen())
             painter.setBrush(QBrush(QColor(self.pen().color().name())))
 
-            path = self.path()
-            if path.elementCount() > 1:
-                # Get the last two points of the path
-                last_element = path.elementAt(path.elementCount() - 1)
-                second_last_element = path.elementAt(path.elementCount() - 2)
-                last_point = QPointF(last_element.x, last_element.y)
-                second_last_point = QPointF(second_last_element.x, second_last_element.y)
-
-                # Calculate the angle of the line segment at the end of the path
-                dx = last_point.x() - second_last_point.x()
-                dy = last_point.y() - second_last_point.y()
-                angle = math.atan2(dy, dx)
-
-                # Calculate the new endpoint slightly beyond the last point
-                arrow_offset = 10  # Distance to extend the arrowhead beyond the last point
-                end_point = QPointF(last_point.x() + arrow_offset * math.cos(angle),
-                                    last_point.y() + arrow_offset * math.sin(angle))
-
-                # Define the arrowhead points
-                arrow_size = 12
-                p1 = QPointF(end_point.x() - arrow_size * math.cos(angle - math.pi / 6),
-                             end_point.y() - arrow_size * math.sin(angle - math.pi / 6))
-                p2 = QPointF(end_point.x() - arrow_size * math.cos(angle + math.pi / 6),
-                             end_point.y() - arrow_size * math.sin(angle + math.pi / 6))
-
-                # Create a polygon for the arrowhead
-                arrow_head = QPolygonF([end_point, p1, p2])
+            arrow_head = self.arrowHead()
 
+            if arrow_head is not None:
                 self.arrow_head = arrow_head
 
                 # Draw the arrowhead
@@ -852,6 +980,46 @@ class LeaderLineItem(QGraphicsPathItem):
         except Exception as e:
             print(e)
 
+    def underline(self):
+        # The bottom-left and bottom-right points of the text element's bounding rect
+        bottom_left = self.text_element.mapToParent(self.text_element.boundingRect().bottomLeft())
+        bottom_right = self.text_element.mapToParent(self.text_element.boundingRect().bottomRight())
+
+        return bottom_left, bottom_right
+
+    def arrowHead(self):
+        """The arrowhead at the end of the path, None for paths of a single point"""
+        path = self.path()
+
+        if path.elementCount() < 2:
+            return None
+
+        # Get the last two points of the path
+        last_element = path.elementAt(path.elementCount() - 1)
+        second_last_element = path.elementAt(path.elementCount() - 2)
+        last_point = QPointF(last_element.x, last_element.y)
+        second_last_point = QPointF(second_last_element.x, second_last_element.y)
+
+        # Calculate the angle of the line segment at the end of the path
+        dx = last_point.x() - second_last_point.x()
+        dy = last_point.y() - second_last_point.y()
+        angle = math.atan2(dy, dx)
+
+        # Calculate the new endpoint slightly beyond the last point
+        arrow_offset = 10  # Distance to extend the arrowhead beyond the last point
+        end_point = QPointF(last_point.x() + arrow_offset * math.cos(angle),
+                            last_point.y() + arrow_offset * math.sin(angle))
+
+        # Define the arrowhead points
+        arrow_size = 12
+        p1 = QPointF(end_point.x() - arrow_size * math.cos(angle - math.pi / 6),
+                     end_point.y() - arrow_size * math.sin(angle - math.pi / 6))
+        p2 = QPointF(end_point.x() - arrow_size * math.cos(angle + math.pi / 6),
+                     end_point.y() - arrow_size * math.sin(angle + math.pi / 6))
+
+        # Create a polygon for the arrowhead
+        return QPolygonF([end_point, p1, p2])
+
     def updatePathEndPoint(self):
         path = self.path()
         if path.elementCount() > 0:
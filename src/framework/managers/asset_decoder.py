@@ -0,0 +1,65 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QByteArray, QCoreApplication
+from PyQt5.QtGui import QImage
+from PyQt5.QtSvg import QSvgRenderer
+
+# Threads decoding the images and svgs of a document while it opens
+DECODE_THREADS = min(8, os.cpu_count() or 1)
+
+
+def decode_image(data):
+    # QImage (unlike QPixmap) can be made off the GUI thread
+    image = QImage()
+    image.loadFromData(data)
+
+    return image
+
+
+def decode_svg(data):
+    renderer = QSvgRenderer(QByteArray(data))
+
+    # The items using it live on the GUI thread
+    renderer.moveToThread(QCoreApplication.instance().thread())
+
+    return data.decode('utf-8'), renderer
+
+
+DECODERS = {
+    'CustomPixmapItem': decode_image,
+    'CustomSvgItem': decode_svg,
+}
+
+
+def decode_assets(blobs, records):
+    """
+    Decode the image and svg blobs used by records on a thread pool, each blob once.
+    Returns {blob key: QImage or (svg text, renderer)} and the time it took in seconds,
+    the items themselves still have to be built on the GUI thread (see SceneDeserializer).
+    """
+    start = time.perf_counter()
+    jobs = {}
+
+    for record in records:
+        key = record.get('blob')
+
+        if record['type'] in DECODERS and key in blobs and key not in jobs:
+            jobs[key] = (DECODERS[record['type']], blobs[key])
+
+    if not jobs:
+        return {}, 0.0
+
+    with ThreadPoolExecutor(max(1, min(DECODE_THREADS, len(jobs)))) as pool:
+        futures = {key: pool.submit(decode, data) for key, (decode, data) in jobs.items()}
+        assets = {}
+
+        for key, future in futures.items():
+            try:
+                assets[key] = future.result()
+
+            except Exception as e:
+                # Left for the deserializer to decode (and report) on its own
+                print(f'Could not decode asset {key}: {e}')
+
+    return assets, time.perf_counter() - start
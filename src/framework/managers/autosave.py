@@ -0,0 +1,213 @@
+import glob
+import json
+import os
+import time
+import uuid
+from PyQt5.QtCore import QObject, QTimer, QLockFile, QDateTime
+from PyQt5.QtWidgets import QMessageBox
+from src.framework.managers.save_worker import SaveWorker, write_snapshot, write_file_atomic
+
+RECOVERY_DIR = os.path.join('internal data', 'recovery')
+
+# Seconds between snapshots, unless the settings say otherwise (0 turns autosave off)
+DEFAULT_INTERVAL = 120
+
+# Share of the time the GUI thread may spend taking snapshots, the interval grows on large documents
+MAX_UI_SHARE = 0.01
+
+
+class AutosaveService(QObject):
+    """
+    Writes a recovery snapshot of the open document (untitled ones too) on a worker thread every
+    few minutes. The document file itself is never touched. Snapshots are skipped while the scene's
+    change generation matches the last snapshot, and removed once the document is saved.
+
+    Every session keeps its snapshot in the recovery directory next to a lock file. A snapshot
+    whose lock is stale was left by a session that crashed, and is offered for recovery on startup.
+    """
+
+    def __init__(self, manager, directory=RECOVERY_DIR):
+        super().__init__()
+        self.manager = manager
+        self.scene = manager.scene
+        self.directory = directory
+        self.session = uuid.uuid4().hex
+        self.lock = None
+        self.worker = None
+        self.interval = 0
+        self.saved_generation = None
+
+        # Milliseconds spent on the GUI thread by the last snapshots
+        self.snapshot_times = []
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.autosave)
+
+    def path(self, session, extension):
+        return os.path.join(self.directory, f'{session}.{extension}')
+
+    def interval_setting(self):
+        for data in self.scene.parentWindow.read_settings():
+            return data.get('autosave_interval', DEFAULT_INTERVAL)
+
+        return DEFAULT_INTERVAL
+
+    def start(self):
+        """Start (or restart after a settings change) the autosave timer"""
+        self.interval = self.interval_setting()
+
+        if self.interval <= 0:
+            self.timer.stop()
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        if self.lock is None:
+            self.lock = QLockFile(self.path(self.session, 'lock'))
+            self.lock.tryLock(0)
+
+        self.timer.start(self.interval * 1000)
+
+    def stop(self):
+        """Clean shutdown, the document was saved or discarded so the snapshot is not needed"""
+        self.timer.stop()
+
+        if self.worker is not None:
+            self.worker.wait()
+
+        self.discard()
+
+        if self.lock is not None:
+            self.lock.unlock()
+            self.lock = None
+
+    def autosave(self):
+        if self.manager.loading or (self.worker is not None and self.worker.isRunning()):
+            return
+
+        if not self.scene.hasChanges():
+            # Everything is in the document file
+            self.discard()
+            return
+
+        generation = self.scene.changeGeneration()
+
+        if generation == self.saved_generation:
+            return
+
+        # Items can only be read on the GUI thread, encoding and writing happen on the worker
+        start = time.perf_counter()
+        snapshot = self.manager.serializer.serialize_items()
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.snapshot_times = self.snapshot_times[-19:] + [elapsed]
+        self.timer.setInterval(max(self.interval * 1000, int(elapsed / MAX_UI_SHARE)))
+
+        codec, level = self.manager.compression_settings()
+
+        self.worker = SaveWorker(self.path(self.session, 'mp'), snapshot, codec=codec, level=level)
+        self.worker.saved.connect(lambda filename: self.snapshot_written(generation, elapsed))
+        self.worker.failed.connect(lambda filename, error: print(f'Autosave failed: {error}'))
+        self.worker.start()
+
+    def snapshot_written(self, generation, elapsed):
+        self.saved_generation = generation
+
+        manifest = {
+            'document': self.manager.filename,
+            'saved': time.time(),
+            'generation': generation,
+            'snapshot_ms': round(elapsed, 1),
+        }
+
+        write_file_atomic(self.path(self.session, 'json'), json.dumps(manifest, indent=4).encode('utf-8'))
+
+    def emergency_save(self):
+        """Synchronous snapshot for the crash handler, the app may be in a broken state"""
+        if self.manager.loading or not self.scene.hasChanges():
+            return
+
+        if self.worker is not None:
+            self.worker.wait()
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            write_snapshot(self.path(self.session, 'mp'), self.manager.serializer.serialize_items())
+            self.snapshot_written(self.scene.changeGeneration(), 0)
+
+        except Exception as e:
+            print(f'Emergency save failed: {e}')
+
+    def discard(self):
+        self.saved_generation = None
+
+        for extension in ('mp', 'json'):
+            if os.path.exists(self.path(self.session, extension)):
+                os.remove(self.path(self.session, extension))
+
+    def find_recoveries(self):
+        """Manifests of the snapshots left by sessions that did not close properly, newest first"""
+        recoveries = []
+
+        for filename in glob.glob(os.path.join(self.directory, '*.json')):
+            session = os.path.splitext(os.path.basename(filename))[0]
+
+            if session == self.session or not os.path.exists(self.path(session, 'mp')):
+                continue
+
+            # A lock we can take is stale, its session is gone
+            lock = QLockFile(self.path(session, 'lock'))
+
+            if not lock.tryLock(0):
+                continue
+
+            lock.unlock()
+
+            try:
+                with open(filename, 'r') as f:
+                    manifest = json.load(f)
+
+            except Exception:
+                continue
+
+            manifest['session'] = session
+            recoveries.append(manifest)
+
+        return sorted(recoveries, key=lambda manifest: manifest.get('saved', 0), reverse=True)
+
+    def remove_session(self, session):
+        for extension in ('mp', 'json', 'lock'):
+            if os.path.exists(self.path(session, extension)):
+                os.remove(self.path(session, extension))
+
+    def offer_recovery(self):
+        """Ask to reopen the newest snapshot of a crashed session, the older ones are removed"""
+        if not os.path.isdir(self.directory):
+            return
+
+        recoveries = self.find_recoveries()
+
+        if not recoveries:
+            return
+
+        newest = recoveries[0]
+        saved = QDateTime.fromSecsSinceEpoch(int(newest.get('saved', 0))).toString('MMM d, h:mm AP')
+
+        result = QMessageBox.question(self.scene.parentWindow,
+                                      'Recover Document',
+                                      f'MPRUN did not close properly. Do you want to recover the unsaved changes '
+                                      f'to {os.path.basename(newest["document"])} from {saved}?',
+                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+
+        if result == QMessageBox.Yes:
+            # The snapshot becomes this session's, so it stays recoverable until the document is saved
+            os.makedirs(self.directory, exist_ok=True)
+
+            for extension in ('mp', 'json'):
+                os.replace(self.path(newest['session'], extension), self.path(self.session, extension))
+
+            self.manager.open_recovery(self.path(self.session, 'mp'), newest['document'])
+
+        for manifest in recoveries:
+            self.remove_session(manifest['session'])
@@ -0,0 +1,180 @@
+"""
+Renders every canvas of .mp documents to image/PDF/SVG proofs without opening the MPRUN window.
+Documents are spread across a pool of processes, each running an offscreen Qt application.
+
+Usage: python -m src.framework.managers.batch_renderer [--formats png pdf] [--output-dir DIR]
+       [--processes N] [--transparent] files or folders...
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# The app loads its data files relative to the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+FORMATS = ('png', 'jpg', 'jpeg', 'tiff', 'webp', 'ico', 'svg', 'pdf')
+
+app = None
+
+
+def init_worker():
+    """Start an offscreen Qt application in the worker process"""
+    global app
+
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    os.chdir(ROOT)
+
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+
+
+def output_name(filename, canvas_name, extension):
+    canvas_name = re.sub(r'[^\w\- ]+', '_', canvas_name).strip() or 'Canvas'
+
+    return f'{os.path.splitext(os.path.basename(filename))[0]} - {canvas_name}.{extension}'
+
+
+def render_document(filename, output_dir, formats, transparent=False):
+    """Load one document into a windowless scene and render each canvas, returns the timings"""
+    from PyQt5.QtGui import QBrush, QColor
+    from PyQt5.QtWidgets import QUndoStack
+    from src.framework.graphics_framework import CustomGraphicsScene
+    from src.framework.deserializer import SceneDeserializer
+    from src.framework.items import CanvasItem
+    from src.framework.managers.export_manager import render_image, write_svg, write_pdf
+    from src.framework.managers.journal import DocumentJournal
+
+    result = {'file': filename, 'canvases': 0, 'outputs': [], 'load': 0.0, 'decode': 0.0, 'render': 0.0,
+              'error': None}
+
+    try:
+        start = time.perf_counter()
+
+        with open(filename, 'rb') as f:
+            items_data, offsets = DocumentJournal.read(f)
+
+        scene = CustomGraphicsScene(QUndoStack())
+
+        deserializer = SceneDeserializer(scene)
+
+        for item in deserializer.deserialize_records(items_data):
+            scene.addItem(item)
+
+        canvases = sorted((item for item in scene.items() if isinstance(item, CanvasItem)),
+                          key=lambda canvas: (canvas.sceneBoundingRect().y(), canvas.sceneBoundingRect().x()))
+
+        if transparent:
+            scene.setBackgroundBrush(QBrush(QColor(0, 0, 0, 0)))
+
+            for canvas in canvases:
+                canvas.setTransparentMode()
+
+        result['canvases'] = len(canvases)
+        result['load'] = time.perf_counter() - start
+        result['decode'] = deserializer.timings['decode']
+        start = time.perf_counter()
+
+        for canvas in canvases:
+            rect = canvas.sceneBoundingRect()
+            image = None
+
+            for extension in formats:
+                path = os.path.join(output_dir, output_name(filename, canvas.name(), extension))
+
+                if extension == 'svg':
+                    write_svg(scene, rect, path)
+
+                elif extension == 'pdf':
+                    write_pdf(scene, rect, path)
+
+                else:
+                    # Every bitmap format shares one render of the canvas
+                    image = image or render_image(scene, rect)
+
+                    if not image.save(path):
+                        raise IOError(f'Could not write {path}')
+
+                result['outputs'].append(path)
+
+        result['render'] = time.perf_counter() - start
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    return result
+
+
+def find_documents(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for file in sorted(files):
+                    if file.endswith('.mp'):
+                        yield os.path.abspath(os.path.join(root, file))
+
+        else:
+            yield os.path.abspath(path)
+
+
+def print_summary(results, elapsed):
+    print(f'\n{"file":<40}{"canvases":>10}{"load (ms)":>12}{"decode (ms)":>13}{"render (ms)":>13}  status')
+
+    for result in results:
+        status = 'ok' if result['error'] is None else f'failed: {result["error"]}'
+        print(f'{os.path.basename(result["file"])[:39]:<40}{result["canvases"]:>10}'
+              f'{result["load"] * 1000:>12.1f}{result["decode"] * 1000:>13.1f}'
+              f'{result["render"] * 1000:>13.1f}  {status}')
+
+    outputs = sum(len(result['outputs']) for result in results)
+    print(f'\n{len(results)} documents, {outputs} files written in {elapsed:.2f}s')
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Render the canvases of MPRUN documents without the window')
+    parser.add_argument('paths', nargs='+', help='.mp files or folders containing them')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['png'])
+    parser.add_argument('--output-dir', default=None, help='defaults to the folder of each document')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--transparent', action='store_true', help='no canvas background')
+    args = parser.parse_args(args)
+
+    documents = list(find_documents(args.paths))
+
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    results = []
+
+    # Qt doesn't survive a fork, every worker starts its own interpreter
+    context = multiprocessing.get_context('spawn')
+
+    with ProcessPoolExecutor(max(1, min(args.processes, len(documents) or 1)), mp_context=context,
+                             initializer=init_worker) as pool:
+        futures = [pool.submit(render_document, filename,
+                               os.path.abspath(args.output_dir or os.path.dirname(filename)),
+                               args.formats, args.transparent)
+                   for filename in documents]
+
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+
+            print(f'{"Rendered" if result["error"] is None else "Failed"} {result["file"]}')
+
+    results.sort(key=lambda result: documents.index(result['file']))
+    print_summary(results, time.perf_counter() - start)
+
+    return 1 if any(result['error'] is not None for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
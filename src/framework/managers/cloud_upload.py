@@ -0,0 +1,282 @@
+"""
+Uploads of exported canvases to cloud storage. Files are uploaded concurrently through a
+StorageBackend, and a local manifest of content hashes skips the files the destination already
+has, so sharing the same canvases again only sends the ones that changed.
+"""
+import abc
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import pyqtSignal
+from src.framework.managers.export_queue import ExportJob
+
+UPLOAD_MANIFEST = os.path.join('internal data', 'upload_manifest.json')
+
+# Transfers running at once, cloud services throttle clients opening many more
+UPLOAD_THREADS = 4
+
+# Attempts after a failed transfer, waiting RETRY_DELAY seconds, then twice as long every time
+UPLOAD_RETRIES = 3
+RETRY_DELAY = 1.0
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class StorageBackend(abc.ABC):
+    """A folder files are uploaded to, upload is called from several threads at once"""
+
+    @property
+    @abc.abstractmethod
+    def destination(self) -> str:
+        """Identifies the folder in the upload manifest"""
+
+    @abc.abstractmethod
+    def prepare(self):
+        """Create the folder if needed, once per batch. Returns the names of the files in it, None if unknown"""
+
+    @abc.abstractmethod
+    def upload(self, path, name, digest):
+        """Upload the file at path as name, raise on failure. digest is the sha256 of its contents"""
+
+
+class LocalDirectoryBackend(StorageBackend):
+    """
+    Uploads to a local directory, for shared or synced folders and as a stand in for cloud storage
+    when testing. A transfer that fails part way is resumed from where it stopped.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+
+    @property
+    def destination(self):
+        return f'file:{self.directory}'
+
+    def prepare(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+        return set(os.listdir(self.directory))
+
+    def upload(self, path, name, digest):
+        # The partial file is named after the contents, so only the same file is ever resumed
+        partial = os.path.join(self.directory, f'.{name}.{digest[:16]}.part')
+
+        with open(path, 'rb') as source, open(partial, 'ab') as target:
+            source.seek(target.tell())
+
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                target.write(chunk)
+
+        os.replace(partial, os.path.join(self.directory, name))
+
+
+class ICloudDriveBackend(StorageBackend):
+    """Uploads to a folder of iCloud Drive through a logged in pyicloud service"""
+
+    def __init__(self, api, parent='Downloads', folder='MPRUN'):
+        self.api = api
+        self.parent = parent
+        self.folder = folder
+        self.node = None
+
+    @property
+    def destination(self):
+        return f'icloud:{self.api.user.get("accountName", "")}/{self.parent}/{self.folder}'
+
+    def prepare(self):
+        self.api.drive.params['clientId'] = self.api.client_id
+        parent = self.api.drive[self.parent]
+
+        if self.folder not in parent.dir():
+            from pyicloud.services.drive import DriveNode
+
+            parent.mkdir(self.folder)
+
+            # pyicloud caches the children of a node, fetch the parent again to see the new folder
+            parent = DriveNode(self.api.drive, self.api.drive.get_node_data(parent.data['docwsid']))
+
+        self.node = parent[self.folder]
+
+        return set(self.node.dir())
+
+    def upload(self, path, name, digest):
+        # The uploaded file keeps the name of the local one
+        with open(path, 'rb') as f:
+            self.node.upload(f)
+
+
+class UploadManifest:
+    """The content hash of every file uploaded, by destination and name. Saved after every upload"""
+
+    def __init__(self, path=UPLOAD_MANIFEST):
+        self.path = path
+        self.lock = threading.Lock()
+
+        try:
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_current(self, destination, name, digest):
+        return self.entries.get(destination, {}).get(name) == digest
+
+    def record(self, destination, name, digest):
+        with self.lock:
+            self.entries.setdefault(destination, {})[name] = digest
+            self.save()
+
+    def save(self):
+        # Written to a temporary file first, an interrupted upload must not lose the entries before it
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temporary = f'{self.path}.tmp'
+
+        with open(temporary, 'w') as f:
+            json.dump(self.entries, f, indent=2)
+
+        os.replace(temporary, self.path)
+
+
+class UploadResult:
+    def __init__(self):
+        self.uploaded = []
+        self.skipped = []
+        self.failed = {}
+        self.cancelled = False
+
+
+class UploadPipeline:
+    """
+    Uploads a batch of files through a backend, UPLOAD_THREADS at a time. Files the manifest says the
+    destination already has are skipped, failed transfers are retried, and as every upload is recorded
+    as soon as it's done, running an interrupted batch again resumes it.
+    """
+
+    def __init__(self, backend: StorageBackend, manifest: UploadManifest, workers=UPLOAD_THREADS,
+                 retries=UPLOAD_RETRIES, retry_delay=RETRY_DELAY):
+        self.backend = backend
+        self.manifest = manifest
+        self.workers = workers
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.cancelled = threading.Event()
+
+    def run(self, paths, progress=None) -> UploadResult:
+        """Upload paths, progress(done, total) is called from the worker threads"""
+        result = UploadResult()
+        remote_names = self.backend.prepare()
+        done = 0
+        lock = threading.Lock()
+
+        def finished():
+            nonlocal done
+
+            with lock:
+                done += 1
+
+                if progress is not None:
+                    progress(done, len(paths))
+
+        def transfer(path):
+            name = os.path.basename(path)
+
+            try:
+                digest = file_digest(path)
+
+                if (self.manifest.is_current(self.backend.destination, name, digest) and
+                        (remote_names is None or name in remote_names)):
+                    result.skipped.append(path)
+
+                elif self.upload(path, name, digest):
+                    self.manifest.record(self.backend.destination, name, digest)
+                    result.uploaded.append(path)
+
+            except Exception as e:
+                result.failed[path] = str(e)
+
+            finished()
+
+        with ThreadPoolExecutor(max(1, min(self.workers, len(paths)))) as pool:
+            list(pool.map(transfer, paths))
+
+        result.cancelled = self.cancelled.is_set()
+
+        return result
+
+    def upload(self, path, name, digest):
+        """Upload with retries, False when cancelled"""
+        for attempt in range(self.retries + 1):
+            if self.cancelled.is_set():
+                return False
+
+            try:
+                self.backend.upload(path, name, digest)
+                return True
+
+            except Exception:
+                if attempt == self.retries:
+                    raise
+
+                # Wakes up early when cancelled
+                self.cancelled.wait(self.retry_delay * 2 ** attempt)
+
+    def cancel(self):
+        """Stop starting transfers, the ones in progress still finish"""
+        self.cancelled.set()
+
+
+class UploadJob(ExportJob):
+    """Runs an UploadPipeline on a background thread as a job of the export queue"""
+    completed = pyqtSignal(object)
+
+    def __init__(self, pipeline: UploadPipeline, paths, title='Upload Canvases', parent=None):
+        super().__init__(title, parent)
+        self.pipeline = pipeline
+        self.paths = list(paths)
+        self.result = None
+        self.thread = threading.Thread(target=self.upload, daemon=True)
+        self.completed.connect(self.upload_finished)
+
+    def run(self):
+        self.report_progress(0, len(self.paths))
+        self.thread.start()
+
+    def upload(self):
+        # Runs on the thread, the signals are delivered on the GUI thread
+        try:
+            result = self.pipeline.run(self.paths, self.report_progress)
+
+        except Exception as e:
+            # The backend couldn't be prepared (connection, permissions), nothing was uploaded
+            result = UploadResult()
+            result.failed = {path: str(e) for path in self.paths}
+
+        self.completed.emit(result)
+
+    def upload_finished(self, result):
+        self.result = result
+        self.written = result.uploaded + result.skipped
+        self.errors = [f'{os.path.basename(path)}: {error}' for path, error in result.failed.items()]
+        self.finish()
+
+    def stop(self):
+        self.pipeline.cancel()
+
+    def summary(self):
+        if self.result is None:
+            return super().summary()
+
+        return f'{len(self.result.uploaded)} uploaded, {len(self.result.skipped)} unchanged'
@@ -0,0 +1,65 @@
+import bz2
+import lzma
+import zlib
+
+
+class CompressionCodec:
+    """A stdlib compressor, identified in the file header by its id"""
+
+    def __init__(self, codec_id, name, default_level, compress, decompress, decompressor=None):
+        self.id = codec_id
+        self.name = name
+        self.default_level = default_level
+        self._compress = compress
+        self._decompress = decompress
+        self._decompressor = decompressor
+
+    def compress(self, data: bytes, level=None) -> bytes:
+        return self._compress(data, self.default_level if level is None else level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompress(data)
+
+    def decompress_prefix(self, data: bytes, chunk_size=64) -> bytes:
+        """Decompress damaged data as far as it goes, for repairs. The output up to the first error"""
+        if self._decompressor is None:
+            return bytes(data)
+
+        # Fed in small pieces, the output of the piece holding the damage is lost with the error
+        decompressor = self._decompressor()
+        output = []
+
+        try:
+            for start in range(0, len(data), chunk_size):
+                output.append(decompressor.decompress(data[start:start + chunk_size]))
+
+        except Exception:
+            pass
+
+        return b''.join(output)
+
+
+CODECS = {
+    'none': CompressionCodec(0, 'none', 0, lambda data, level: data, lambda data: data),
+    'zlib': CompressionCodec(1, 'zlib', 6, zlib.compress, zlib.decompress, zlib.decompressobj),
+    'lzma': CompressionCodec(2, 'lzma', 6, lambda data, level: lzma.compress(data, preset=level), lzma.decompress,
+                             lzma.LZMADecompressor),
+    'bz2': CompressionCodec(3, 'bz2', 9, bz2.compress, bz2.decompress, bz2.BZ2Decompressor),
+}
+
+DEFAULT_CODEC = 'zlib'
+
+
+def get_codec(name):
+    if name not in CODECS:
+        raise ValueError(f'Unknown compression codec: {name}')
+
+    return CODECS[name]
+
+
+def codec_from_id(codec_id):
+    for codec in CODECS.values():
+        if codec.id == codec_id:
+            return codec
+
+    raise ValueError(f'Unknown compression codec id: {codec_id}')
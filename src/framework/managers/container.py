@@ -0,0 +1,481 @@
+import collections
+import functools
+import io
+import mmap
+import os
+import struct
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from src.framework.managers.compression import get_codec, codec_from_id
+from src.framework.managers.record_format import RecordBlock, encode_frame, decode_frame, paused_gc
+
+MAGIC = b'MPRUNDOC'
+
+# Only this version is read, documents saved before containers are pickled item lists (see LegacyUnpickler)
+CONTAINER_VERSION = 6
+
+# Item records are grouped in blocks of this many records. A block is checksummed as a whole, its records
+# also carry their own checksum (in the index), only checked by repairs to find the damaged ones.
+# Blocks are compressed independently, so a damaged byte loses at most the records of one block
+BLOCK_RECORDS = 16
+
+# Record fields only stored in the index, they are put back into the records when they are read
+INDEXED_FIELDS = ('type', 'uid', 'bounds')
+
+# Columns of the item index: type and blob (numbers in the lists of names and keys, -1 for no blob),
+# block and slot, the range of the record's json in the block payload and the record's checksum
+ITEM_COLUMNS = {
+    'type': '<u2',
+    'blob': '<i4',
+    'block': '<u4',
+    'slot': '<u2',
+    'offset': '<u4',
+    'length': '<u4',
+    'crc': '<u4',
+}
+
+NO_BOUNDS = [float('nan')] * 4
+
+# Threads compressing blobs and blocks while the next block is encoded, and decompressing blocks while
+# the previous one is decoded (the stdlib codecs release the GIL)
+COMPRESS_THREADS = min(4, os.cpu_count() or 1)
+
+# magic, container version, compression codec id, index offset, index length, end of the base snapshot
+HEADER = struct.Struct('<8sHHQQQ')
+HEADER_SIZE = 64
+
+# Space reserved for the preview, its length (0 for no preview) is kept in the header padding
+PREVIEW_LENGTH = struct.Struct('<I')
+PREVIEW_LENGTH_OFFSET = HEADER.size
+PREVIEW_BLOCK_SIZE = 16 * 1024
+
+
+def rects_intersect(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+class ItemIndex:
+    """
+    The index entries of the item records, one row per record in file order, stored as packed
+    columns (see ITEM_COLUMNS) with the uids and scene bounds (NaN for none), so reading the
+    index of a large document doesn't build a dict per item.
+    """
+
+    def __init__(self):
+        self.types = {}
+        self.blob_keys = {}
+        self.uids = []
+        self.bounds = []
+        self.columns = {name: [] for name in ITEM_COLUMNS}
+
+        # Built on first use when reading
+        self.block_starts = None
+        self.type_names = None
+        self.bounds_lists = None
+
+    def __len__(self):
+        return len(self.uids)
+
+    def add(self, record, block, slot, crc):
+        blob = record.get('blob')
+
+        self.uids.append(record.get('uid'))
+        self.bounds.append(record.get('bounds') or NO_BOUNDS)
+
+        for name, value in (('type', self.types.setdefault(record['type'], len(self.types))),
+                            ('blob', -1 if blob is None else self.blob_keys.setdefault(blob, len(self.blob_keys))),
+                            ('block', block),
+                            ('slot', slot),
+                            ('crc', crc)):
+            self.columns[name].append(value)
+
+    def add_ranges(self, ranges):
+        # The ranges of the records of a block are known once the block is complete
+        for offset, length in ranges:
+            self.columns['offset'].append(offset)
+            self.columns['length'].append(length)
+
+    def encode(self):
+        data = {name: np.array(values, dtype=ITEM_COLUMNS[name]).tobytes() for name, values in self.columns.items()}
+        data['types'] = list(self.types)
+        data['blob_keys'] = list(self.blob_keys)
+        data['uids'] = self.uids
+        data['bounds'] = np.array(self.bounds, dtype='<f8').tobytes()
+
+        return data
+
+    @classmethod
+    def decode(cls, data):
+        index = cls()
+        index.types = data['types']
+        index.blob_keys = data['blob_keys']
+        index.uids = data['uids']
+        index.bounds = np.frombuffer(data['bounds'], dtype='<f8').reshape(-1, 4)
+        index.columns = {name: np.frombuffer(data[name], dtype=dtype) for name, dtype in ITEM_COLUMNS.items()}
+
+        return index
+
+    def block_rows(self, number):
+        if self.block_starts is None:
+            blocks = self.columns['block']
+            self.block_starts = np.searchsorted(blocks, np.arange(int(blocks[-1]) + 2 if len(blocks) else 1)).tolist()
+
+        return range(self.block_starts[number], self.block_starts[number + 1])
+
+    def location(self, row):
+        """Block, slot, json range and checksum of a record"""
+        return tuple(int(self.columns[name][row]) for name in ('block', 'slot', 'offset', 'length', 'crc'))
+
+    def rows_in_rect(self, rect):
+        x, y, w, h = rect
+        left, top, width, height = self.bounds.T
+
+        # Comparisons with NaN are false, records without bounds are always read
+        outside = (left >= x + w) | (x >= left + width) | (top >= y + h) | (y >= top + height)
+
+        return np.flatnonzero(~outside).tolist()
+
+    def blobs_of(self, rows):
+        blobs = self.columns['blob']
+
+        return {self.blob_keys[blobs[row]] for row in rows if blobs[row] >= 0}
+
+    def restore(self, records, rows):
+        """Put the indexed fields back into records"""
+        if self.type_names is None:
+            self.type_names = [self.types[number] for number in self.columns['type'].tolist()]
+            self.bounds_lists = [None if bounds[0] != bounds[0] else bounds for bounds in self.bounds.tolist()]
+
+        type_names, uids, bounds_lists = self.type_names, self.uids, self.bounds_lists
+
+        for record, row in zip(records, rows):
+            record['type'], record['uid'], record['bounds'] = type_names[row], uids[row], bounds_lists[row]
+
+    def entry(self, row):
+        """The indexed fields of a record, to describe it when it is damaged"""
+        record = {}
+        self.restore([record], [row])
+
+        return record
+
+
+class ContainerWriter:
+    """
+    Writes a container to a file object as the records come in, so a document can be written
+    (or repaired) without building the whole file in memory. The sections can be added in any
+    order, the index written by finish() locates them.
+    """
+
+    def __init__(self, f, codec='none', level=None, preview=None):
+        self.f = f
+        self.codec = get_codec(codec)
+        self.level = level
+        self.block = RecordBlock()
+        self.items = ItemIndex()
+        self.pool = None
+        self.pending = collections.deque()
+        self.index = {
+            'metadata': None,
+            'blobs': {},
+            'blocks': [],
+            'canvases': [],
+            'items': None,
+        }
+
+        if self.codec.name != 'none' and COMPRESS_THREADS > 1:
+            self.pool = ThreadPoolExecutor(COMPRESS_THREADS)
+
+        self.f.write(bytes(HEADER_SIZE))
+
+        if preview is not None:
+            self.f.write(bytes(PREVIEW_BLOCK_SIZE))
+            DocumentContainer.write_preview(self.f, preview)
+            self.f.seek(0, io.SEEK_END)
+
+    def add(self, data):
+        data = self.codec.compress(data, self.level)
+        offset = self.f.tell()
+        self.f.write(data)
+
+        return offset, len(data)
+
+    def add_async(self, data, store):
+        """Compress data on the pool, store(location) is called once it is written (in order)"""
+        if self.pool is None:
+            store(self.add(data))
+            return
+
+        self.pending.append((self.pool.submit(self.codec.compress, data, self.level), store))
+        self.write_pending(COMPRESS_THREADS * 2)
+
+    def write_pending(self, keep=0):
+        while len(self.pending) > keep:
+            future, store = self.pending.popleft()
+            data = future.result()
+            offset = self.f.tell()
+            self.f.write(data)
+            store((offset, len(data)))
+
+    def add_metadata(self, metadata):
+        self.index['metadata'] = self.add(encode_frame(metadata))
+
+    def add_blob(self, key, data):
+        if key not in self.index['blobs']:
+            self.index['blobs'][key] = None
+            self.add_async(data, functools.partial(self.index['blobs'].__setitem__, key))
+
+    def has_blob(self, key):
+        return key in self.index['blobs']
+
+    def add_record(self, record):
+        crc = self.block.add({key: value for key, value in record.items() if key not in INDEXED_FIELDS})
+        self.items.add(record, len(self.index['blocks']), len(self.block) - 1, crc)
+
+        if record['type'] == 'CanvasItem':
+            self.index['canvases'].append({
+                'uid': record.get('uid'),
+                'name': record['name'],
+                'rect': [record['x'], record['y'], record['rect'][2], record['rect'][3]],
+            })
+
+        if len(self.block) >= BLOCK_RECORDS:
+            self.flush_block()
+
+    def flush_block(self):
+        if len(self.block):
+            data, ranges = self.block.encode()
+            self.items.add_ranges(ranges)
+            self.index['blocks'].append(None)
+            self.add_async(data, functools.partial(self.index['blocks'].__setitem__, len(self.index['blocks']) - 1))
+            self.block = RecordBlock()
+
+    def finish(self):
+        self.flush_block()
+        self.write_pending()
+
+        if self.pool is not None:
+            self.pool.shutdown()
+
+        self.index['items'] = self.items.encode()
+        index_offset, index_length = self.add(encode_frame(self.index))
+        end = self.f.tell()
+
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, CONTAINER_VERSION, self.codec.id, index_offset, index_length, end))
+        self.f.seek(end)
+
+
+class DocumentContainer:
+    """
+    Indexed .mp container. A fixed size header points to an index of the metadata, blobs,
+    canvases and items (with their bounding boxes and byte ranges), so a single canvas or region
+    can be read through a memory map without decoding the rest of the document.
+    Blobs and blocks of item records are compressed with the codec named in the header.
+    Records are stored as json and binary attachments (see record_format), no code is run while reading.
+    A block is decoded with one json parse and checked with one checksum, salvage_block checks the
+    records of a damaged block one by one.
+    A small preview frame (counts, canvases, thumbnail) sits at a fixed offset after the header, so
+    it can be read with a couple of small reads and rewritten in place after a journal append.
+
+    Layout: header | preview | metadata record | blob data | item record blocks | index | journal entries
+    """
+
+    def __init__(self, f):
+        self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.version, codec_id, index_offset, index_length, self.base_end = HEADER.unpack_from(self.mm, 0)
+
+        if magic != MAGIC:
+            raise ValueError('Not an indexed MPRUN document')
+
+        if self.version != CONTAINER_VERSION:
+            raise ValueError(f'Unsupported container version {self.version}')
+
+        self.codec = codec_from_id(codec_id)
+        self.block_cache = {}
+        self.index = decode_frame(self.read_range((index_offset, index_length)))
+        self.items = ItemIndex.decode(self.index['items'])
+
+    def close(self):
+        self.block_cache.clear()
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def is_container(f):
+        position = f.tell()
+        magic = f.read(len(MAGIC))
+        f.seek(position)
+
+        return magic == MAGIC
+
+    @staticmethod
+    def read_preview(f):
+        """The encoded preview frame of a container file, None if it has none"""
+        f.seek(0)
+        header = f.read(HEADER_SIZE)
+
+        if len(header) < HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+            return None
+
+        length, = PREVIEW_LENGTH.unpack_from(header, PREVIEW_LENGTH_OFFSET)
+
+        if not 0 < length <= PREVIEW_BLOCK_SIZE:
+            return None
+
+        return f.read(length)
+
+    @staticmethod
+    def write_preview(f, data: bytes):
+        """Overwrite the preview of a file that has a preview block, returns False if it doesn't fit"""
+        if len(data) > PREVIEW_BLOCK_SIZE:
+            return False
+
+        f.seek(HEADER_SIZE)
+        f.write(data)
+        f.seek(PREVIEW_LENGTH_OFFSET)
+        f.write(PREVIEW_LENGTH.pack(len(data)))
+
+        return True
+
+    @staticmethod
+    def encode(items_data, codec='none', level=None, preview=None) -> bytes:
+        out = io.BytesIO()
+        writer = ContainerWriter(out, codec, level, preview)
+
+        metadata = dict(items_data[0])
+
+        for key, data in metadata.pop('blobs', {}).items():
+            writer.add_blob(key, data)
+
+        writer.add_metadata(metadata)
+
+        for record in items_data[1:]:
+            writer.add_record(record)
+
+        writer.finish()
+
+        return out.getvalue()
+
+    def read_range(self, location):
+        offset, length = location
+        return self.codec.decompress(self.mm[offset:offset + length])
+
+    def read_metadata(self, blob_keys=None):
+        metadata = self.read_metadata_record()
+        blobs = self.index['blobs']
+
+        metadata['blobs'] = {key: self.read_range(blobs[key])
+                             for key in (blobs if blob_keys is None else blob_keys) if key in blobs}
+
+        return metadata
+
+    def read_items(self, rows=None):
+        """Read the metadata and the given rows of the item index (all of them by default) as a items_data list"""
+        with paused_gc():
+            if rows is None:
+                metadata = self.read_metadata()
+                records = self.read_all_blocks()
+
+            else:
+                metadata = self.read_metadata(self.items.blobs_of(rows))
+                records = [self.read_record(row) for row in rows]
+
+        return [metadata] + records
+
+    def read_metadata_record(self):
+        return decode_frame(self.read_range(self.index['metadata']))
+
+    def read_block(self, number):
+        if number not in self.block_cache:
+            self.block_cache[number] = self.decode_block(number, self.read_range(self.index['blocks'][number]))
+
+        return self.block_cache[number]
+
+    def read_all_blocks(self):
+        """The records of every block, decompressed on a thread pool while the blocks before are decoded"""
+        locations = self.index['blocks']
+        records = []
+
+        if self.codec.name == 'none' or COMPRESS_THREADS < 2:
+            blocks = map(self.read_range, locations)
+
+        else:
+            pool = ThreadPoolExecutor(COMPRESS_THREADS)
+            blocks = pool.map(self.read_range, locations)
+            pool.shutdown(wait=False)
+
+        for number, data in enumerate(blocks):
+            records.extend(self.decode_block(number, data))
+
+        return records
+
+    def decode_block(self, number, data):
+        records = RecordBlock.decode(data)
+        self.items.restore(records, self.items.block_rows(number))
+
+        return records
+
+    def block_entries(self, number):
+        return [self.items.entry(row) for row in self.items.block_rows(number)]
+
+    def salvage_block(self, number):
+        """
+        Decode a block for repairs. Returns the records in slot order, None for the ones that are
+        damaged, and the error for the block if it is damaged. Only the records of a block that
+        fails its checksum are checked one by one.
+        """
+        rows = self.items.block_rows(number)
+        records = [None] * len(rows)
+
+        try:
+            offset, length = self.index['blocks'][number]
+            raw = self.mm[offset:offset + length]
+
+            try:
+                data = self.codec.decompress(raw)
+
+            except Exception as e:
+                # Keep the records before the damage, the record checksums reject what was decoded wrong
+                data = self.codec.decompress_prefix(raw)
+                error = e
+
+            else:
+                try:
+                    return self.decode_block(number, data), None
+
+                except Exception as e:
+                    error = e
+
+            # The index has where every record starts, damaged lengths don't lose the ones after them
+            for row in rows:
+                block, slot, offset, length, crc = self.items.location(row)
+
+                try:
+                    records[slot] = RecordBlock.salvage(data, offset, length, crc)
+                    self.items.restore([records[slot]], [row])
+
+                except Exception:
+                    pass
+
+        except Exception as e:
+            return records, e
+
+        return records, error
+
+    def read_record(self, row):
+        block, slot = self.items.location(row)[:2]
+
+        return self.read_block(block)[slot]
+
+    def canvases(self):
+        return self.index['canvases']
+
+    def entries_in_rect(self, rect):
+        """Rows of the item index of the records intersecting rect, and of the ones without bounds"""
+        return self.items.rows_in_rect(rect)
@@ -0,0 +1,79 @@
+"""
+Converts pickled .mp documents, saved before the record format, to the current format.
+
+Usage: python -m src.framework.managers.document_converter [--codec zlib] [--output-dir DIR] files or folders...
+"""
+import argparse
+import os
+import sys
+from src.framework.managers.compression import CODECS, DEFAULT_CODEC
+from src.framework.managers.container import DocumentContainer
+from src.framework.managers.journal import DocumentJournal
+from src.framework.managers.save_worker import write_snapshot
+
+
+def is_current_format(filename):
+    with open(filename, 'rb') as f:
+        if not DocumentContainer.is_container(f):
+            return False
+
+        # Containers of another version can't be opened, they fail to convert instead of being skipped
+        DocumentContainer(f).close()
+
+        return True
+
+
+def convert_document(filename, output=None, codec=DEFAULT_CODEC, level=None):
+    """Rewrite a document (and its journal) in the current format, returns False if there was nothing to do"""
+    if output is None and is_current_format(filename):
+        return False
+
+    with open(filename, 'rb') as f:
+        items_data, offsets = DocumentJournal.read(f)
+
+    write_snapshot(output or filename, items_data, codec=codec, level=level)
+
+    return True
+
+
+def find_documents(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for file in files:
+                    if file.endswith('.mp'):
+                        yield os.path.join(root, file)
+
+        else:
+            yield path
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Convert MPRUN documents to the current file format')
+    parser.add_argument('paths', nargs='+', help='.mp files or folders containing them')
+    parser.add_argument('--codec', choices=list(CODECS), default=DEFAULT_CODEC)
+    parser.add_argument('--level', type=int, default=None)
+    parser.add_argument('--output-dir', default=None, help='write converted copies here instead of in place')
+    args = parser.parse_args(args)
+
+    failed = 0
+
+    for filename in find_documents(args.paths):
+        output = None if args.output_dir is None else os.path.join(args.output_dir, os.path.basename(filename))
+
+        try:
+            if convert_document(filename, output, codec=args.codec, level=args.level):
+                print(f'Converted {filename}')
+
+            else:
+                print(f'Skipped {filename} (already current)')
+
+        except Exception as e:
+            failed += 1
+            print(f'Failed {filename}: {e}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
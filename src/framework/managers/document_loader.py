@@ -0,0 +1,127 @@
+import time
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, QRectF, pyqtSignal
+from PyQt5.QtWidgets import QProgressDialog
+from src.framework.deserializer import SceneDeserializer
+from src.framework.managers.asset_decoder import decode_assets
+from src.framework.managers.journal import DocumentJournal
+from src.framework.path_codec import PathCodec
+
+# How long the GUI thread inserts items before handing control back to the event loop
+INSERT_SLICE_MS = 12
+
+
+class DocumentLoader(QThread):
+    """Reads, replays and decodes a .mp file off the GUI thread"""
+    loaded = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, filename, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+
+        # Images and svgs decoded on the thread pool, handed to the deserializer by the file manager
+        self.assets = {}
+        self.timings = {'read': 0.0, 'decode': 0.0}
+
+    def run(self):
+        try:
+            start = time.perf_counter()
+
+            with open(self.filename, 'rb') as f:
+                items_data, offsets = DocumentJournal.read(f)
+
+            metadata, records = items_data[0], items_data[1:]
+
+            for record in records:
+                if 'elements' in record:
+                    record['elements'] = PathCodec.decode(record['elements'])
+
+            self.timings['read'] = time.perf_counter() - start
+            self.assets, self.timings['decode'] = decode_assets(metadata.get('blobs', {}), records)
+
+            self.loaded.emit([metadata] + self.order_records(records), offsets)
+
+        except Exception as e:
+            self.failed.emit(str(e))
+
+    def order_records(self, records):
+        # Canvases first, then the visible items placed on them, then everything else
+        canvases = [record for record in records if record['type'] == 'CanvasItem']
+        canvas_rects = [QRectF(canvas['x'], canvas['y'], canvas['rect'][2], canvas['rect'][3]) for canvas in canvases]
+
+        on_canvas = []
+        off_canvas = []
+
+        for record in records:
+            if record['type'] == 'CanvasItem':
+                continue
+
+            attr = SceneDeserializer.item_attributes(record['attr'])
+            x, y, visible = attr[4], attr[5], attr[9]
+
+            if record.get('bounds') is not None:
+                on_any_canvas = any(rect.intersects(QRectF(*record['bounds'])) for rect in canvas_rects)
+
+            else:
+                on_any_canvas = any(rect.contains(x, y) for rect in canvas_rects)
+
+            if visible and on_any_canvas:
+                on_canvas.append(record)
+
+            else:
+                off_canvas.append(record)
+
+        return canvases + on_canvas + off_canvas
+
+
+class ProgressiveInserter(QObject):
+    """Adds deserialized items to the scene in time slices driven by the event loop"""
+    finished = pyqtSignal()
+    cancelled = pyqtSignal()
+
+    def __init__(self, deserializer, records, parent=None):
+        super().__init__(parent)
+        self.deserializer = deserializer
+        self.records = records
+        self.index = 0
+        self.done = False
+
+        # Seconds spent building and adding items on the GUI thread
+        self.construct_time = 0.0
+
+        self.progress = QProgressDialog('Opening document...', 'Cancel', 0, len(records), parent)
+        self.progress.setWindowTitle('Open File')
+        self.progress.setWindowModality(Qt.WindowModality.NonModal)
+        self.progress.setMinimumDuration(500)
+        self.progress.canceled.connect(self.cancel)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.insert_batch)
+
+    def start(self):
+        self.timer.start(0)
+
+    def insert_batch(self):
+        start = time.perf_counter()
+        deadline = start + INSERT_SLICE_MS / 1000
+
+        while self.index < len(self.records) and time.perf_counter() < deadline:
+            self.deserializer.add_item(self.records[self.index])
+            self.index += 1
+
+        self.construct_time += time.perf_counter() - start
+
+        if self.index >= len(self.records):
+            self.done = True
+            self.timer.stop()
+            self.progress.hide()
+            self.finished.emit()
+
+        else:
+            self.progress.setValue(self.index)
+
+    def cancel(self):
+        if not self.done:
+            self.done = True
+            self.timer.stop()
+            self.cancelled.emit()
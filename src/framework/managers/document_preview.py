@@ -0,0 +1,221 @@
+"""
+Previews of .mp documents: item counts, canvases and a thumbnail, written to a small block at the
+start of the file on every save so menus and tools can show them without loading the document.
+
+Usage: python -m src.framework.managers.document_preview [--thumbnails DIR] files or folders...
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from PyQt5.QtCore import Qt, QBuffer, QIODevice, QRectF
+from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap
+from src.framework.managers.container import DocumentContainer, PREVIEW_BLOCK_SIZE
+from src.framework.managers.record_format import encode_frame, decode_frame
+from src.framework.managers.save_worker import write_file_atomic
+
+PREVIEW_CACHE_DIR = os.path.join('internal data', 'preview_cache')
+
+# Longest side of the thumbnail, in pixels
+THUMBNAIL_SIZE = 192
+
+# JPEG qualities to try until the preview fits in its block
+THUMBNAIL_QUALITIES = (75, 50, 30)
+
+
+def render_thumbnail(scene, rect, quality):
+    scale = THUMBNAIL_SIZE / max(rect.width(), rect.height())
+    image = QImage(max(1, int(rect.width() * scale)), max(1, int(rect.height() * scale)), QImage.Format_RGB32)
+    image.fill(QColor('#606060'))
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+    scene.render(painter, QRectF(image.rect()), rect, Qt.KeepAspectRatio)
+    painter.end()
+
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, 'JPG', quality)
+
+    return buffer.data().data()
+
+
+def create_preview(scene, serializer):
+    """Counts, canvases and a thumbnail of the scene, made on the GUI thread at save time"""
+    from src.framework.items import CanvasItem
+
+    counts = {}
+    canvases = []
+
+    for item in scene.items():
+        if serializer.is_serializable(item):
+            counts[type(item).__name__] = counts.get(type(item).__name__, 0) + 1
+
+            if isinstance(item, CanvasItem):
+                rect = item.sceneBoundingRect()
+                canvases.append({'name': item.name(), 'rect': [rect.x(), rect.y(), rect.width(), rect.height()]})
+
+    canvases.sort(key=lambda canvas: (canvas['rect'][1], canvas['rect'][0]))
+
+    preview = {
+        'mpversion': scene.mpversion,
+        'saved': time.time(),
+        'item_count': sum(counts.values()),
+        'counts': counts,
+        'canvases': canvases,
+        'thumbnail': None,
+    }
+
+    # The first canvas is what identifies a course, and keeps the render cheap on big documents
+    rect = QRectF(*canvases[0]['rect']) if canvases else scene.itemsBoundingRect()
+
+    if not rect.isEmpty():
+        for quality in THUMBNAIL_QUALITIES:
+            preview['thumbnail'] = render_thumbnail(scene, rect, quality)
+
+            if len(encode_frame(preview)) <= PREVIEW_BLOCK_SIZE:
+                return preview
+
+        preview['thumbnail'] = None
+
+    return preview
+
+
+def read_preview(filename):
+    """The preview stored in a document, None for documents without one (or a damaged one)"""
+    try:
+        with open(filename, 'rb') as f:
+            data = DocumentContainer.read_preview(f)
+
+        return None if data is None else decode_frame(data)
+
+    except Exception:
+        return None
+
+
+def describe_preview(preview):
+    names = {
+        'CanvasItem': 'canvases',
+        'CustomSvgItem': 'course elements',
+        'CustomPathItem': 'paths',
+        'CustomTextItem': 'text items',
+        'LeaderLineItem': 'leader lines',
+        'CustomPixmapItem': 'images',
+    }
+
+    return ', '.join(f'{count} {names.get(kind, kind)}' for kind, count in sorted(preview['counts'].items()))
+
+
+class PreviewCache:
+    """
+    Disk cache of document previews, keyed by path, modification time and size, so the recent
+    files menu doesn't have to open the documents. Thumbnails are kept as .jpg files next to the
+    entries, so they can be shown in rich text tooltips.
+    """
+
+    def __init__(self, directory=PREVIEW_CACHE_DIR, max_entries=200):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def key(self, filename):
+        stat = os.stat(filename)
+
+        return hashlib.sha1(f'{os.path.abspath(filename)}|{stat.st_mtime_ns}|{stat.st_size}'.encode('utf-8')).hexdigest()
+
+    def get(self, filename):
+        """The preview of filename with 'thumbnail_file' instead of the thumbnail data, None if it has none"""
+        try:
+            key = self.key(filename)
+
+        except OSError:
+            return None
+
+        entry = os.path.join(self.directory, f'{key}.json')
+
+        try:
+            with open(entry, 'r') as f:
+                return json.load(f)
+
+        except (OSError, ValueError):
+            # Not cached, or a damaged entry, read the document again
+            pass
+
+        preview = read_preview(filename)
+
+        if preview is None:
+            return None
+
+        thumbnail = preview.pop('thumbnail', None)
+        preview['thumbnail_file'] = None
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            if thumbnail is not None:
+                thumbnail_file = os.path.abspath(os.path.join(self.directory, f'{key}.jpg'))
+                write_file_atomic(thumbnail_file, thumbnail)
+                preview['thumbnail_file'] = thumbnail_file
+
+            write_file_atomic(entry, json.dumps(preview).encode('utf-8'))
+            self.prune()
+
+        except OSError as e:
+            # The menu still gets the preview, it's read from the document next time
+            print(f'Could not cache the preview of {filename}: {e}')
+
+        return preview
+
+    def prune(self):
+        entries = sorted((os.path.join(self.directory, file) for file in os.listdir(self.directory)
+                          if file.endswith('.json')), key=os.path.getmtime)
+
+        for entry in entries[:max(0, len(entries) - self.max_entries)]:
+            for path in (entry, entry[:-len('.json')] + '.jpg'):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def thumbnail_pixmap(preview):
+    pixmap = QPixmap()
+
+    if preview.get('thumbnail_file'):
+        pixmap.load(preview['thumbnail_file'])
+
+    elif preview.get('thumbnail'):
+        pixmap.loadFromData(preview['thumbnail'])
+
+    return pixmap
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Show the previews stored in MPRUN documents')
+    parser.add_argument('paths', nargs='+', help='.mp files or folders containing them')
+    parser.add_argument('--thumbnails', default=None, help='also write the thumbnails to this folder')
+    args = parser.parse_args(args)
+
+    from src.framework.managers.document_converter import find_documents
+
+    for filename in find_documents(args.paths):
+        preview = read_preview(filename)
+
+        if preview is None:
+            print(f'{filename}: no preview (saved by an older version)')
+            continue
+
+        canvases = ', '.join(canvas['name'] for canvas in preview['canvases'])
+        print(f'{filename}: {preview["item_count"]} items ({describe_preview(preview)}), canvases: {canvases}')
+
+        if args.thumbnails is not None and preview['thumbnail'] is not None:
+            os.makedirs(args.thumbnails, exist_ok=True)
+
+            with open(os.path.join(args.thumbnails, f'{os.path.splitext(os.path.basename(filename))[0]}.jpg'), 'wb') as f:
+                f.write(preview['thumbnail'])
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+from src.framework.managers.record_format import encode_frame
+from src.framework.serializer import SceneSerializer
+
+EXPORT_CACHE_DIR = os.path.join('internal data', 'export_cache')
+
+
+class ExportCache:
+    """
+    Disk cache of exported canvases, keyed by a fingerprint of everything that is drawn on the
+    canvas: the serialized records of the items intersecting it (reused from the last save while
+    the items are clean) and the export options. Exporting an untouched canvas again is a file copy.
+    """
+
+    def __init__(self, scene, directory=EXPORT_CACHE_DIR, max_bytes=512 * 1024 * 1024):
+        self.scene = scene
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        # Digests of the records seen by the last fingerprints, by record identity (records are never changed)
+        self.digests = {}
+
+    def record_digest(self, record):
+        entry = self.digests.get(id(record))
+
+        if entry is None or entry[0] is not record:
+            entry = (record, hashlib.sha1(encode_frame(record)).digest())
+            self.digests[id(record)] = entry
+
+        return entry[1]
+
+    def fingerprint(self, canvas, options):
+        """Hash of the canvas, the items drawn on it (in paint order) and the export options"""
+        # A serializer of its own, the file manager's tables may be in use by a save
+        serializer = SceneSerializer(self.scene)
+        rect = canvas.sceneBoundingRect()
+
+        fingerprint = hashlib.sha1(json.dumps({
+            'mpversion': self.scene.mpversion,
+            'background': self.scene.backgroundBrush().color().name(QColor.HexArgb),
+            'options': options,
+        }, sort_keys=True).encode('utf-8'))
+
+        for item in self.scene.items(rect, Qt.IntersectsItemBoundingRect):
+            if serializer.is_serializable(item):
+                fingerprint.update(self.record_digest(serializer.serialize_cached(item)))
+
+        return fingerprint.hexdigest()
+
+    def prune_digests(self):
+        # Records the change tracker dropped are not needed anymore
+        records = {id(entry[0]) for entry in self.scene.change_tracker.records.values()}
+        self.digests = {key: value for key, value in self.digests.items() if key in records}
+
+    def path(self, fingerprint, extension):
+        return os.path.join(self.directory, f'{fingerprint}{extension}')
+
+    def copy_to(self, fingerprint, filename):
+        """Write the cached export to filename, False if there is none"""
+        cached = self.path(fingerprint, os.path.splitext(filename)[1].lower())
+
+        try:
+            shutil.copyfile(cached, filename)
+            os.utime(cached)
+
+        except OSError:
+            return False
+
+        return True
+
+    def put(self, fingerprint, filename):
+        """Keep a copy of an export, can be called from worker threads"""
+        os.makedirs(self.directory, exist_ok=True)
+
+        cached = self.path(fingerprint, os.path.splitext(filename)[1].lower())
+        temporary = f'{cached}.{uuid.uuid4().hex}.tmp'
+
+        shutil.copyfile(filename, temporary)
+        os.replace(temporary, cached)
+
+        self.prune()
+
+    def prune(self):
+        """Remove the least recently used exports beyond max_bytes"""
+        entries = []
+
+        for file in os.listdir(self.directory):
+            try:
+                stat = os.stat(os.path.join(self.directory, file))
+
+            except OSError:
+                continue
+
+            if not file.endswith('.tmp'):
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, file)))
+
+        total = sum(size for mtime, size, path in entries)
+
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+
+            except OSError:
+                pass
+
+            total -= size
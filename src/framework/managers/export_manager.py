@@ -1,16 +1,449 @@
-from PyQt5.QtCore import Qt, QRectF, QUrl, QSizeF
-from PyQt5.QtGui import QBrush, QColor, QImage, QPainter, QDesktopServices
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import Qt, QPointF, QRectF, QTimer, pyqtSignal
+from PyQt5.QtGui import QBrush, QColor, QImage, QPainter, QPageSize
 from PyQt5.QtPrintSupport import QPrinter
-from PyQt5.QtSvg import QSvgGenerator
-from PyQt5.QtWidgets import QMessageBox, QFileDialog, QGraphicsScene
+from PyQt5.QtWidgets import QMessageBox, QFileDialog, QGraphicsScene, QInputDialog
+from src.framework.deserializer import SceneDeserializer
 from src.framework.items import CanvasItem
+from src.framework.serializer import SceneSerializer
+from src.framework.managers.export_cache import ExportCache
+from src.framework.managers.export_queue import ExportJob, ExportQueue
 from src.gui.app_screens import CanvasItemSelector
-from src.scripts.app_internal import supported_file_exporting, filter_extensions
+from src.framework.managers.svg_export import write_svg
+from src.framework.managers.tiled_export import TiledExport, SCENE_DPI, TILED_EXTENSIONS
+from src.scripts.app_internal import supported_file_exporting, filter_extensions, export_all_file_types
+
+# Threads encoding and writing the rendered canvases
+EXPORT_THREADS = min(4, os.cpu_count() or 1)
+
+# Rendered images waiting to be encoded, bounds the memory used by large documents
+MAX_PENDING_IMAGES = EXPORT_THREADS * 2
+
+# Largest image rendered in one piece, formats Qt has to encode whole (JPG, WEBP...) are limited to it
+MAX_IMAGE_PIXELS = 16384 * 16384
+
+# How long a job builds its snapshot on the GUI thread before handing control back to the event loop
+SNAPSHOT_SLICE_MS = 12
+
+
+def render_image(scene: QGraphicsScene, rect: QRectF, scale=1.0) -> QImage:
+    """Render the part of the scene inside rect (a canvas) to an image of the same size times scale"""
+    image = QImage((rect.size() * scale).toSize(), QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
+    scene.render(painter, target=QRectF(image.rect()), source=rect)
+    painter.end()
+
+    return image
+
+
+def write_pdf(scene: QGraphicsScene, rect: QRectF, file_path):
+    write_pdf_pages(scene, [rect], file_path)
+
+
+def write_pdf_pages(scene: QGraphicsScene, rects, file_path):
+    """Write each rect of the scene (the canvases) as a page of one PDF, see PdfPageWriter"""
+    writer = PdfPageWriter(file_path)
+
+    try:
+        for rect in rects:
+            writer.add_page(scene, rect)
+
+    except Exception:
+        writer.abort()
+        raise
+
+    writer.finish()
+
+
+class PdfPageWriter:
+    """
+    A PDF written a page at a time, each page sized to the rect of the scene on it in points.
+    Everything goes through a single printer session, and items are painted as vectors (printers
+    bypass the item caches, so svg elements stay paths).
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.printer = QPrinter(QPrinter.HighResolution)
+        self.printer.setOutputFormat(QPrinter.PdfFormat)
+        self.printer.setOutputFileName(file_path)
+        self.printer.setFullPage(True)
+        self.painter = QPainter()
+        self.pages = 0
+
+    def add_page(self, scene: QGraphicsScene, rect: QRectF):
+        # The page size can change between pages, it applies to the next page started
+        self.printer.setPageSize(QPageSize(rect.size(), QPageSize.Point, '', QPageSize.ExactMatch))
+
+        if self.pages == 0:
+            if not self.painter.begin(self.printer):
+                raise IOError(f'Could not write {self.file_path}')
+
+        else:
+            self.printer.newPage()
+
+        target = QRectF(QPointF(), self.printer.pageRect(QPrinter.DevicePixel).size())
+        scene.render(self.painter, target, rect, Qt.IgnoreAspectRatio)
+        self.pages += 1
+
+    def finish(self):
+        if self.painter.isActive():
+            self.painter.end()
+
+    def abort(self):
+        """Stop and remove the partial file"""
+        self.finish()
+
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+
+class SceneSnapshot(QGraphicsScene):
+    """
+    A private copy of the items under some rects of a scene (the canvases of an export job). The records
+    of the items (reused from the last save while they are clean, and never changed once made) are
+    taken when the job is created, and the copy is built from them in time slices before the job's
+    first render, see build. Jobs render the copy, so edits made while they wait or run, or the scene
+    being cleared, never reach the files. Transparent snapshots paint their background and canvases
+    transparent, the document itself is left as it is.
+    """
+
+    def __init__(self, scene: QGraphicsScene, rects, transparent=False):
+        super().__init__()
+        self.transparent = transparent
+        self.setBackgroundBrush(QBrush(QColor(Qt.transparent)) if transparent else scene.backgroundBrush())
+
+        serializer = SceneSerializer(scene)
+        under = set()
+
+        for rect in rects:
+            for item in scene.items(rect, Qt.IntersectsItemBoundingRect):
+                under.add(item.topLevelItem())
+
+        # Bottom to top, so items at the same z value keep their stacking order
+        items = [item for item in scene.items(Qt.AscendingOrder) if item in under and serializer.is_serializable(item)]
+
+        self.items_data = serializer.serialize_items(items)
+        self.deserializer = SceneDeserializer(self)
+        self.index = 0
+
+    def build(self):
+        """Add copied items for a time slice, True once they are all in"""
+        if self.items_data is None:
+            return True
+
+        deadline = time.perf_counter() + SNAPSHOT_SLICE_MS / 1000
+
+        if self.index == 0:
+            self.deserializer.load_tables(self.items_data)
+            self.index = 1
+
+        while self.index < len(self.items_data) and time.perf_counter() < deadline:
+            item = self.deserializer.add_item(self.items_data[self.index])
+            self.index += 1
+
+            if self.transparent and isinstance(item, CanvasItem):
+                item.setTransparentMode()
+
+        if self.index < len(self.items_data):
+            return False
+
+        self.deserializer.clear_tables()
+        self.items_data = None
+
+        return True
+
+
+def export_filenames(canvases, directory, extension):
+    """A file per canvas, named after its tooltip and numbered when several canvases share a name"""
+    counts = {}
+    filenames = []
+
+    for canvas in canvases:
+        tooltip = canvas.toolTip()
+        counts[tooltip] = counts.get(tooltip, 0) + 1
+
+        filenames.append(os.path.join(directory, f'{tooltip}_{counts[tooltip]}{extension}'))
+
+    return filenames
+
+
+def save_image(image, filename):
+    if not image.save(filename):
+        raise IOError(f'Could not write {filename}')
+
+
+class CanvasExportJob(ExportJob):
+    """
+    Exports canvases to image or svg files, one per canvas. The canvases are copied to a SceneSnapshot
+    when the job is created, then one is rendered per event loop turn while the images rendered before
+    it are encoded and written on a thread pool. With a cache, canvases whose content didn't change
+    since they were last exported are copied instead of rendered.
+    """
+    encoded = pyqtSignal(str, str)
+
+    def __init__(self, scene, canvases, filenames, title='Export Canvases', cache=None, scale=1.0, transparent=False,
+                 parent=None):
+        super().__init__(title, parent)
+        self.cache = cache
+        self.scale = scale
+        self.filenames = list(filenames)
+        self.index = 0
+        self.pending = 0
+        self.cache_hits = 0
+        self.pool = None
+
+        canvases = list(canvases)
+        self.rects = [canvas.sceneBoundingRect() for canvas in canvases]
+        self.snapshot = SceneSnapshot(scene, self.rects, transparent)
+        self.fingerprints = [None] * len(canvases)
+
+        if cache is not None:
+            # Fingerprints of the canvases as they are copied, the live ones may have changed by the time they render
+            cache.prune_digests()
+            self.fingerprints = [cache.fingerprint(canvas, {'extension': os.path.splitext(filename)[1].lower(),
+                                                            'scale': scale, 'transparent': transparent})
+                                 for canvas, filename in zip(canvases, self.filenames)]
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.render_next)
+        self.encoded.connect(self.encode_finished)
+
+    def run(self):
+        if not self.rects:
+            self.finish()
+            return
+
+        self.pool = ThreadPoolExecutor(EXPORT_THREADS)
+        self.report_progress(0, len(self.rects))
+        self.timer.start(0)
+
+    def render_next(self):
+        if self.done or self.index >= len(self.rects) or self.pending >= MAX_PENDING_IMAGES:
+            self.timer.stop()
+            return
+
+        rect, fingerprint, filename = self.rects[self.index], self.fingerprints[self.index], self.filenames[self.index]
+        start = time.perf_counter()
+
+        # Unchanged canvases are copied from the cache, the others wait for the snapshot to be built
+        copied = fingerprint is not None and self.cache.copy_to(fingerprint, filename)
+
+        if not copied and not self.snapshot.build():
+            self.render_time += time.perf_counter() - start
+            return
+
+        self.index += 1
+        self.pending += 1
+
+        if copied:
+            self.cache_hits += 1
+            self.encode_finished(filename, '')
+            return
+
+        try:
+            image = self.render(rect, fingerprint, filename)
+
+        except Exception as e:
+            self.render_time += time.perf_counter() - start
+            self.encode_finished(filename, str(e))
+            return
+
+        self.render_time += time.perf_counter() - start
+
+        if image is None:
+            # Written as it was rendered (svg)
+            self.encode_finished(filename, '')
+            return
+
+        future = self.pool.submit(self.encode, image, filename, fingerprint)
+        future.add_done_callback(lambda future: self.encoded.emit(
+            filename, '' if future.cancelled() or future.exception() is None else str(future.exception())))
+
+    def render(self, rect, fingerprint, filename):
+        """Render a canvas of the snapshot, None when there is nothing left to encode"""
+        if os.path.splitext(filename)[1].lower() == '.svg':
+            # The svg is written from the items, there is nothing left to encode
+            write_svg(self.snapshot, rect, filename)
+            self.cache_export(fingerprint, filename)
+            return None
+
+        return render_image(self.snapshot, rect, self.scale)
+
+    def encode(self, image, filename, fingerprint):
+        # Runs on the pool
+        save_image(image, filename)
+        self.cache_export(fingerprint, filename)
+
+    def cache_export(self, fingerprint, filename):
+        if fingerprint is None:
+            return
+
+        try:
+            self.cache.put(fingerprint, filename)
+
+        except OSError as e:
+            # The export itself is fine, it just won't be reused
+            print(f'Could not cache {filename}: {e}')
+
+    def encode_finished(self, filename, error):
+        # Called on the GUI thread, the signal is queued from the pool
+        if self.done:
+            return
+
+        self.pending -= 1
+
+        if error:
+            self.errors.append(f'{os.path.basename(filename)}: {error}')
+
+        else:
+            self.written.append(filename)
+
+        self.report_progress(len(self.written) + len(self.errors), len(self.rects))
+
+        if len(self.written) + len(self.errors) == len(self.rects):
+            self.pool.shutdown(wait=False)
+            self.finish()
+
+        elif not self.timer.isActive():
+            self.timer.start(0)
+
+    def stop(self):
+        # Images already being encoded are still written, the queued ones are dropped
+        self.timer.stop()
+
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self):
+        return f'{super().summary()}, {self.cache_hits} unchanged' if self.cache is not None else super().summary()
+
+
+class TiledExportJob(ExportJob):
+    """
+    Exports a canvas to a PNG or TIFF file at any resolution, a band of rows per event loop turn.
+    The bands are rendered from a SceneSnapshot taken when the job is created, so they all show
+    the same state of the document.
+    """
+
+    def __init__(self, scene, rect, filename, dpi=SCENE_DPI, title='Export Canvas', transparent=False, parent=None):
+        super().__init__(title, parent)
+        self.rect = rect
+        self.filename = filename
+        self.dpi = dpi
+        self.snapshot = SceneSnapshot(scene, [rect], transparent)
+        self.export = None
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.render_next)
+
+    def run(self):
+        try:
+            self.export = TiledExport(self.snapshot, self.rect, self.filename, self.dpi)
+
+        except Exception as e:
+            self.fail(e)
+            return
+
+        self.report_progress(0, len(self.export.bands))
+        self.timer.start(0)
+
+    def render_next(self):
+        start = time.perf_counter()
+
+        try:
+            if not self.snapshot.build():
+                self.render_time += time.perf_counter() - start
+                return
+
+            last = self.export.step()
+
+            self.render_time += time.perf_counter() - start
+            self.report_progress(self.export.index, len(self.export.bands))
+
+            if last:
+                self.timer.stop()
+                self.export.finish()
+                self.written.append(self.filename)
+                self.finish()
+
+        except Exception as e:
+            self.export.abort()
+            self.fail(e)
+
+    def fail(self, error):
+        self.timer.stop()
+        self.errors.append(f'{os.path.basename(self.filename)}: {error}')
+        self.finish()
+
+    def stop(self):
+        self.timer.stop()
+
+        if self.export is not None:
+            self.export.abort()
+
+
+class PdfExportJob(ExportJob):
+    """Exports canvases to the pages of one PDF, a page per event loop turn, from a SceneSnapshot"""
+
+    def __init__(self, scene, rects, filename, title='Export Canvas', transparent=False, parent=None):
+        super().__init__(title, parent)
+        self.rects = list(rects)
+        self.filename = filename
+        self.snapshot = SceneSnapshot(scene, self.rects, transparent)
+        self.writer = None
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.render_next)
+
+    def run(self):
+        self.writer = PdfPageWriter(self.filename)
+        self.report_progress(0, len(self.rects))
+        self.timer.start(0)
+
+    def render_next(self):
+        start = time.perf_counter()
+
+        try:
+            if not self.snapshot.build():
+                self.render_time += time.perf_counter() - start
+                return
+
+            self.writer.add_page(self.snapshot, self.rects[self.writer.pages])
+
+            self.render_time += time.perf_counter() - start
+            self.report_progress(self.writer.pages, len(self.rects))
+
+            if self.writer.pages == len(self.rects):
+                self.timer.stop()
+                self.writer.finish()
+                self.written.append(self.filename)
+                self.finish()
+
+        except Exception as e:
+            self.timer.stop()
+            self.writer.abort()
+            self.errors.append(f'{os.path.basename(self.filename)}: {e}')
+            self.finish()
+
+    def stop(self):
+        self.timer.stop()
+
+        if self.writer is not None:
+            self.writer.abort()
 
 
 class ExportManager:
     def __init__(self, canvas: QGraphicsScene):
         self.canvas = canvas
+        self.export_cache = ExportCache(canvas)
+        self.export_queue = ExportQueue(canvas)
 
     def normalExport(self):
         # Exit add canvas tool if active
@@ -32,14 +465,8 @@ class ExportManager:
             selected_item = selector.canvas_chooser_combo.itemData(index)
 
             if selected_item:
-                if selector.transparent_check_btn.isChecked():
-                    self.canvas.setBackgroundBrush(QBrush(QColor(Qt.transparent)))
-
-                    for item in self.canvas.items():
-                        if isinstance(item, CanvasItem):
-                            item.setTransparentMode()
-
-                self.filterSelectedCanvasForExport(selected_item)
+                self.filterSelectedCanvasForExport(selected_item, selector.resolution_spin.value(),
+                                                   selector.transparent_check_btn.isChecked())
 
             else:
                 QMessageBox.warning(self.canvas.parentWindow,
@@ -50,105 +477,111 @@ class ExportManager:
 
         selector.export_btn.clicked.connect(export)
 
-    def exportAsBitmap(self, filename, selected_item):
-        # Create a QImage with the size of the selected item (QGraphicsRectItem)
-        rect = selected_item.sceneBoundingRect()
-        image = QImage(rect.size().toSize(), QImage.Format_ARGB32)
+    def queueExport(self, job: ExportJob):
+        """Run an export job after the ones already queued, its progress and timings show in the exports panel"""
+        job.finished.connect(lambda written, errors: self.showJobFinished(job))
 
-        print(rect)
+        if self.export_queue.busy():
+            self.canvas.views()[0].showMessage('Export', f'{job.title} queued, see the Exports panel.')
 
-        # Render the QGraphicsRectItem onto the image
-        painter = QPainter(image)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
-        self.canvas.render(painter, target=QRectF(image.rect()), source=rect)
-        painter.end()
+        return self.export_queue.add(job)
 
-        try:
-            # Save the image to file
-            success = image.save(filename)
+    def showJobFinished(self, job: ExportJob):
+        if job.state == ExportJob.CANCELLED:
+            self.canvas.views()[0].showMessage('Export', f'{job.title} cancelled.')
 
-            if success:
-                self.show_export_finished()
+        elif job.errors:
+            QMessageBox.warning(self.canvas.parentWindow, job.title,
+                                f'{len(job.errors)} files could not be exported:\n' + '\n'.join(job.errors))
 
-                # Open the image with the default image viewer
-                QDesktopServices.openUrl(QUrl.fromLocalFile(filename))
+        else:
+            self.canvas.views()[0].showMessage('Export', f'{job.title} finished in {job.elapsed():.1f}s '
+                                                         f'({job.summary()}).')
 
-        except Exception as e:
-            # If saving failed, show an error notification
-            QMessageBox.critical(self.canvas.parentWindow, "Export Error", f"Failed to export canvas to file: {e}")
+    def sortedCanvases(self, title):
+        # Top to bottom, then left to right, warns when there are none
+        canvases = sorted((item for item in self.canvas.items() if isinstance(item, CanvasItem)),
+                          key=lambda canvas: (canvas.sceneBoundingRect().y(), canvas.sceneBoundingRect().x()))
 
-    def exportAsSVG(self, file_path, selected_item):
-        try:
-            # Get the bounding rect
-            rect = selected_item.sceneBoundingRect()
+        if not canvases:
+            QMessageBox.warning(self.canvas.parentWindow,
+                                title,
+                                'No canvas elements found within the scene. '
+                                'Please create a canvas element to export.',
+                                QMessageBox.Ok)
 
-            # Export as SVG
-            svg_generator = QSvgGenerator()
-            svg_generator.setFileName(file_path)
-            svg_generator.setSize(rect.size().toSize())
-            svg_generator.setViewBox(rect)
+        return canvases
 
-            # Clear selection
-            self.canvas.clearSelection()
+    def exportAll(self):
+        canvases = self.sortedCanvases('Export All Canvases')
 
-            # Create a QPainter to paint onto the QSvgGenerator
-            painter = QPainter()
-            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-            painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
-            painter.begin(svg_generator)
+        if not canvases:
+            return
 
-            # Render the scene onto the QPainter
-            self.canvas.render(painter, target=rect, source=rect)
+        file_type, ok = QInputDialog.getItem(self.canvas.parentWindow, 'Export All Canvases', 'File type:',
+                                             list(export_all_file_types.keys()), 1, False)
 
-            # End painting
-            painter.end()
+        if not ok:
+            return
 
-            self.show_export_finished()
+        directory = QFileDialog.getExistingDirectory(self.canvas.parentWindow, 'Export All Canvases')
 
-            # Open the image with the default image viewer
-            QDesktopServices.openUrl(QUrl.fromLocalFile(file_path))
+        if not directory:
+            return
 
-        except Exception as e:
-            # Show export error notification
-            QMessageBox.information(self.canvas.parentWindow, 'Export Failed', f'Export failed: {e}',
-                                    QMessageBox.Ok)
+        self.canvas.parentWindow.use_exit_add_canvas()
 
-    def exportAsPDF(self, file_path, selected_item):
-        try:
-            # Get the bounding rect of the selected item
-            bounding_rect = selected_item.sceneBoundingRect()
+        filenames = export_filenames(canvases, directory, export_all_file_types[file_type])
+        self.queueExport(CanvasExportJob(self.canvas, canvases, filenames, 'Export All Canvases', self.export_cache))
 
-            # Configure the printer
-            printer = QPrinter(QPrinter.HighResolution)
-            printer.setOutputFormat(QPrinter.PdfFormat)
-            printer.setOutputFileName(file_path)
+    def exportAllAsPDF(self):
+        canvases = self.sortedCanvases('Export All Canvases As PDF')
 
-            # Adjust the printer's page size to match the bounding rect
-            printer.setPageSizeMM(QSizeF(bounding_rect.width(), bounding_rect.height()))
+        if not canvases:
+            return
 
-            # Start painting
-            painter = QPainter()
-            painter.begin(printer)
+        file_path, _ = QFileDialog.getSaveFileName(self.canvas.parentWindow, 'Export All Canvases As PDF', '',
+                                                   'PDF files (*.pdf)')
 
-            # Translate painter to the bounding rect top-left
-            painter.translate(-bounding_rect.topLeft())
+        if not file_path:
+            return
 
-            # Render the selected item
-            self.canvas.render(painter, QRectF(), bounding_rect)
+        if not file_path.lower().endswith('.pdf'):
+            file_path += '.pdf'
 
-            # End painting
-            painter.end()
+        self.canvas.parentWindow.use_exit_add_canvas()
 
-        except Exception as e:
-            print(e)
+        # One page per canvas, in reading order
+        self.queueExport(PdfExportJob(self.canvas, [canvas.sceneBoundingRect() for canvas in canvases], file_path,
+                                      'Export All Canvases As PDF'))
+
+    def exportAsBitmap(self, filename, selected_item, dpi=SCENE_DPI, transparent=False):
+        rect = selected_item.sceneBoundingRect()
+        scale = dpi / SCENE_DPI
+
+        if os.path.splitext(filename)[1].lower() in TILED_EXTENSIONS:
+            # Rendered in bands and streamed to the file, so print resolutions don't need the whole image in memory
+            self.queueExport(TiledExportJob(self.canvas, rect, filename, dpi, transparent=transparent))
+            return
 
-        self.show_export_finished()
+        if rect.width() * rect.height() * scale * scale > MAX_IMAGE_PIXELS:
+            QMessageBox.warning(self.canvas.parentWindow, 'Export Error',
+                                f'The image would be too large at {dpi} DPI, '
+                                f'export it as a PNG or TIFF file or use a lower resolution.')
+            return
 
-        # Open the PDF with the default viewer
-        QDesktopServices.openUrl(QUrl.fromLocalFile(file_path))
+        self.queueExport(CanvasExportJob(self.canvas, [selected_item], [filename], 'Export Canvas', self.export_cache,
+                                         scale, transparent))
 
-    def filterSelectedCanvasForExport(self, selected_item):
+    def exportAsSVG(self, file_path, selected_item, transparent=False):
+        self.queueExport(CanvasExportJob(self.canvas, [selected_item], [file_path], 'Export Canvas', self.export_cache,
+                                         transparent=transparent))
+
+    def exportAsPDF(self, file_path, selected_item, transparent=False):
+        self.queueExport(PdfExportJob(self.canvas, [selected_item.sceneBoundingRect()], file_path,
+                                      transparent=transparent))
+
+    def filterSelectedCanvasForExport(self, selected_item, dpi=SCENE_DPI, transparent=False):
         # File dialog, filepath
         file_dialog = QFileDialog()
 
@@ -163,20 +596,12 @@ class ExportManager:
                 file_path += selected_extension
 
             if selected_extension == '.svg':
-                self.exportAsSVG(file_path, selected_item)
+                self.exportAsSVG(file_path, selected_item, transparent)
 
             elif selected_extension == '.pdf':
-                self.exportAsPDF(file_path, selected_item)
+                self.exportAsPDF(file_path, selected_item, transparent)
 
             else:
-                try:
-                    self.canvas.clearSelection()
-                    self.exportAsBitmap(file_path, selected_item)
-
-                except Exception as e:
-                    print(e)
+                self.exportAsBitmap(file_path, selected_item, dpi, transparent)
 
             self.canvas.parentWindow.use_exit_add_canvas()
-
-    def show_export_finished(self):
-        self.canvas.views()[0].showMessage('Export', 'Export completed successfully.')
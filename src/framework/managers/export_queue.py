@@ -0,0 +1,172 @@
+"""
+Export jobs and the queue running them. The scene can only be painted on the GUI thread, so jobs
+render one step (a canvas, a band of rows, a page) per event loop turn and leave encoding and
+writing to thread pools, which keeps the editor usable while exports run.
+"""
+import os
+import time
+from PyQt5.QtCore import QObject, QTimer, QUrl, pyqtSignal
+from PyQt5.QtGui import QDesktopServices
+
+# Finished jobs kept in the queue (and the jobs panel)
+JOB_HISTORY = 20
+
+
+class ExportJob(QObject):
+    """
+    Base of the export jobs. Subclasses implement run (called once the job is started) and stop
+    (called on cancel while running), report progress with report_progress and call finish when done.
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(list, list)
+
+    QUEUED = 'Queued'
+    RUNNING = 'Running'
+    FINISHED = 'Finished'
+    CANCELLED = 'Cancelled'
+    FAILED = 'Failed'
+
+    def __init__(self, title, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.state = self.QUEUED
+        self.done = False
+        self.written = []
+        self.errors = []
+        self.steps_done = 0
+        self.steps_total = 0
+
+        # Timing record: when the job was queued, started and finished, and the seconds spent rendering
+        self.queue_time = time.perf_counter()
+        self.start_time = None
+        self.finish_time = None
+        self.render_time = 0.0
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.state = self.RUNNING
+        self.run()
+
+    def run(self):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+    def report_progress(self, done, total):
+        self.steps_done = done
+        self.steps_total = total
+        self.progress.emit(done, total)
+
+    def finish(self):
+        if self.done:
+            return
+
+        self.done = True
+        self.finish_time = time.perf_counter()
+        self.state = self.FAILED if self.errors and not self.written else self.FINISHED
+        self.finished.emit(self.written, self.errors)
+
+    def cancel(self):
+        """Cancel a queued or running job, outputs already written are kept"""
+        if self.done:
+            return
+
+        if self.state == self.RUNNING:
+            self.stop()
+
+        self.done = True
+        self.finish_time = time.perf_counter()
+        self.state = self.CANCELLED
+        self.finished.emit(self.written, self.errors)
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+
+        return (self.finish_time or time.perf_counter()) - self.start_time
+
+    def wait_time(self):
+        return (self.start_time or self.finish_time or time.perf_counter()) - self.queue_time
+
+    def summary(self):
+        return f'{len(self.written)} file written' if len(self.written) == 1 else f'{len(self.written)} files written'
+
+    def timings(self):
+        return {'wait': self.wait_time(), 'render': self.render_time, 'total': self.elapsed()}
+
+    def open(self):
+        """Open the output with the default viewer, or its folder when the job wrote several files"""
+        if len(self.written) == 1:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(self.written[0]))
+
+        elif self.written:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(os.path.dirname(self.written[0])))
+
+
+class ExportQueue(QObject):
+    """Runs export jobs one at a time in the order they were added"""
+    jobAdded = pyqtSignal(object)
+    jobChanged = pyqtSignal(object)
+    jobRemoved = pyqtSignal(object)
+
+    def __init__(self, parent=None, history=JOB_HISTORY):
+        super().__init__(parent)
+        self.jobs = []
+        self.current = None
+        self.history = history
+
+    def add(self, job: ExportJob):
+        self.jobs.append(job)
+
+        job.progress.connect(lambda done, total: self.jobChanged.emit(job))
+        job.finished.connect(lambda written, errors: self.job_finished(job))
+
+        self.jobAdded.emit(job)
+        self.start_next()
+
+        return job
+
+    def start_next(self):
+        if self.current is not None:
+            return
+
+        for job in self.jobs:
+            if job.state == ExportJob.QUEUED:
+                self.current = job
+                job.start()
+                self.jobChanged.emit(job)
+                break
+
+    def job_finished(self, job):
+        self.jobChanged.emit(job)
+
+        if job is self.current:
+            self.current = None
+
+            # Started on the next event loop turn, the finished job's handlers run first
+            QTimer.singleShot(0, self.start_next)
+
+        self.trim()
+
+    def cancel(self, job):
+        job.cancel()
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            job.cancel()
+
+    def remove(self, job):
+        """Forget a finished job"""
+        if job.done and job in self.jobs:
+            self.jobs.remove(job)
+            self.jobRemoved.emit(job)
+
+    def trim(self):
+        finished = [job for job in self.jobs if job.done]
+
+        for job in finished[:max(0, len(finished) - self.history)]:
+            self.remove(job)
+
+    def busy(self):
+        return any(not job.done for job in self.jobs)
@@ -1,10 +1,17 @@
 import json
-import pickle
 import os
-from PyQt5.QtWidgets import QMessageBox, QFileDialog, QGraphicsScene
+from PyQt5.QtCore import QCoreApplication
+from PyQt5.QtWidgets import QMessageBox, QFileDialog, QGraphicsScene, QInputDialog
 from src.framework.deserializer import SceneDeserializer
 from src.framework.serializer import SceneSerializer
 from src.framework.data_repairer import FileDataRepairer
+from src.framework.managers.autosave import AutosaveService
+from src.framework.managers.document_loader import DocumentLoader, ProgressiveInserter
+from src.framework.managers.document_preview import create_preview
+from src.framework.managers.journal import DocumentJournal
+from src.framework.managers.compression import DEFAULT_CODEC
+from src.framework.managers.save_worker import SaveWorker, write_snapshot
+from src.framework.undo_commands import MultiAddItemCommand
 
 
 class SceneFileManager:
@@ -13,12 +20,21 @@ class SceneFileManager:
         self.filename = 'Untitled'
         self.parent = None
         self.repair_needed = False
+        self.save_worker = None
+        self.pending_actions = []
+        self.journal = DocumentJournal()
+        self.loader = None
+        self.inserter = None
+        self.loading = False
 
         self.serializer = SceneSerializer(self.scene)
         self.deserializer = SceneDeserializer(self.scene)
+        self.autosave = AutosaveService(self)
 
     def reset_to_default_scene(self):
         self.scene.clear()
+        self.scene.change_tracker.clear()
+        self.journal.reset()
         self.scene.setHasChanges(False)
         self.filename = 'Untitled'
         self.scene.parentWindow.setWindowTitle(f'{self.filename} - MPRUN')
@@ -51,155 +67,207 @@ class SceneFileManager:
 
     def save(self):
         if self.filename != 'Untitled':
-            with open(self.filename, 'wb') as f:
-                pickle.dump(self.serializer.serialize_items(), f)
-                self.scene.parentWindow.setWindowTitle(f'{os.path.basename(self.filename)} - MPRUN')
-                self.scene.setHasChanges(False)
+            return self.write(self.filename)
 
         else:
-            self.saveas()
+            return self.saveas()
 
     def saveas(self):
         filename, _ = QFileDialog.getSaveFileName(self.scene.parentWindow, 'Save As', '', 'MPRUN files (*.mp)')
 
         if filename:
-            with open(filename, 'wb') as f:
-                pickle.dump(self.serializer.serialize_items(), f)
-
+            def saved(filename):
                 self.filename = filename
-                self.scene.setHasChanges(False)
-                self.scene.parentWindow.setWindowTitle(f'{os.path.basename(self.filename)} - MPRUN')
                 self.scene.parentWindow.update_recent_file_data(filename)
-                self.scene.parentWindow.canvas_view.showMessage('File', f'File {self.filename} saved successfully.')
 
-                return True
+            return self.write(filename, on_saved=saved)
 
     def save_copy(self):
         filename, _ = QFileDialog.getSaveFileName(self.scene.parentWindow, 'Save Copy', f'{self.filename}', 'MPRUN files (*.mp)')
 
         if filename:
-            with open(filename, 'wb') as f:
-                pickle.dump(self.serializer.serialize_items(), f)
-                self.scene.parentWindow.canvas_view.showMessage('File', f'Copy file {filename} saved successfully.')
+            return self.write(filename, copy=True)
 
     def emergency_save(self):
-        if self.filename != 'Untitled':
-            with open(self.filename, 'wb') as f:
-                pickle.dump(self.serializer.serialize_items(), f)
+        # The app may be in a broken state, write a recovery snapshot instead of touching the document
+        self.autosave.emergency_save()
+
+    def compression_settings(self):
+        # Codec and level used for full saves, the codec is recorded in the file header
+        for data in self.scene.parentWindow.read_settings():
+            return data.get('file_compression', DEFAULT_CODEC), data.get('file_compression_level', None)
+
+        return DEFAULT_CODEC, None
+
+    def create_snapshot(self, filename, copy=False, full=False):
+        """
+        Snapshot the scene for writing to filename. When the file holds our last save and the
+        journal is still small, only the changed items are snapshot, to be appended as a journal entry.
+        full snapshots the whole scene regardless.
+        """
+        uids = self.serializer.serialized_uids()
+
+        if copy:
+            return self.serializer.serialize_items(), False, set(), uids
+
+        dirty_items = self.scene.change_tracker.take_dirty_items()
+
+        if not full and self.journal.can_append(filename) and not self.journal.needs_compaction():
+            changed = [item for item in dirty_items if item.scene() is self.scene]
+            changed.extend(item for item in self.scene.items()
+                           if item not in dirty_items and self.serializer.is_serializable(item)
+                           and self.serializer.serialize_uid(item) not in self.journal.saved_uids)
+
+            return self.journal.create_entry(self.serializer.serialize_items(changed), uids), True, dirty_items, uids
+
+        return self.serializer.serialize_items(), False, dirty_items, uids
+
+    def write(self, filename, copy=False, on_saved=None):
+        """
+        Snapshot the scene on the GUI thread, then encode and write it on a worker thread.
+        The document is only marked clean once the write succeeded, and only if it was not edited meanwhile.
+        """
+        # A half opened document must not overwrite the file
+        if self.loading:
+            self.scene.parentWindow.canvas_view.showMessage('File', 'Please wait for the document to finish opening.')
+            return False
+
+        # Only one save runs at a time so writes land in order. The scene is snapshot now (it may be
+        # cleared right after), but the journal changes when the running save lands, so a queued save is full
+        busy = self.save_worker is not None
+        snapshot, append, dirty_items, uids = self.create_snapshot(filename, copy=copy, full=busy)
+
+        save = {
+            'filename': filename,
+            'copy': copy,
+            'on_saved': on_saved,
+            'snapshot': snapshot,
+            'append': append,
+            'dirty_items': dirty_items,
+            'uids': uids,
+            'preview': create_preview(self.scene, self.serializer),
+            'generation': self.scene.changeGeneration(),
+        }
+
+        if busy:
+            self.queue_save(save)
+            self.scene.parentWindow.canvas_view.showMessage('File', 'Saving again once the current save finishes...')
 
-    def load(self, parent):
-        try:
-            self.scene.parentWindow.use_exit_add_canvas()
+        else:
+            self.start_save(save)
 
-            if self.scene.hasChanges():
-                # Display a confirmation dialog
-                confirmation_dialog = QMessageBox(self.scene.parentWindow)
-                confirmation_dialog.setWindowTitle('Close Document')
-                confirmation_dialog.setIcon(QMessageBox.Warning)
-                confirmation_dialog.setText("The document has been modified. Do you want to save your changes?")
-                confirmation_dialog.setStandardButtons(QMessageBox.Discard | QMessageBox.Save | QMessageBox.Cancel)
-                confirmation_dialog.setDefaultButton(QMessageBox.Save)
+        return True
 
-                # Get the result of the confirmation dialog
-                result = confirmation_dialog.exec_()
+    def queue_save(self, save):
+        # Saving the same file again while it waits replaces the older snapshot
+        for i, action in enumerate(self.pending_actions):
+            if (action[0] == 'write' and action[1]['filename'] == save['filename'] and
+                    action[1]['copy'] == save['copy']):
+                save['dirty_items'] = action[1]['dirty_items'] | save['dirty_items']
+                save['on_saved'] = save['on_saved'] or action[1]['on_saved']
+                self.pending_actions[i] = ('write', save)
+                return
 
-                if result == QMessageBox.Discard:
-                    filename, _ = QFileDialog.getOpenFileName(self.scene.parentWindow, 'Open File', '',
-                                                              'MPRUN files (*.mp)')
+        self.pending_actions.append(('write', save))
 
-                    if filename:
-                        self.scene.undo_stack.clear()
-                        self.scene.clear()
-                        self.scene.parentWindow.update_recent_file_data(filename)
+    def start_save(self, save):
+        filename, copy, on_saved = save['filename'], save['copy'], save['on_saved']
+        append, dirty_items, uids = save['append'], save['dirty_items'], save['uids']
 
-                        with open(filename, 'rb') as f:
-                            items_data = pickle.load(f)
-                            self.deserializer.deserialize_items(items_data)
+        def progress(percent, message):
+            self.scene.parentWindow.canvas_view.showMessage('File', f'{message} ({percent}%)')
 
-                            self.filename = filename
-                            parent.setWindowTitle(f'{os.path.basename(self.filename)} - MPRUN')
+        def saved(filename):
+            if on_saved is not None:
+                on_saved(filename)
 
-                            if self.repair_needed:
-                                # Display a confirmation dialog
-                                confirmation_dialog = QMessageBox(self.scene.parentWindow)
-                                confirmation_dialog.setWindowTitle('Open Document Error')
-                                confirmation_dialog.setIcon(QMessageBox.Warning)
-                                confirmation_dialog.setText(
-                                    f"The document has file directories that could not be found. Do you want to do a file repair?")
-                                confirmation_dialog.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                                confirmation_dialog.setDefaultButton(QMessageBox.Yes)
+            if copy:
+                self.scene.parentWindow.canvas_view.showMessage('File', f'Copy file {filename} saved successfully.')
+                return
 
-                                # Get the result of the confirmation dialog
-                                result = confirmation_dialog.exec_()
+            if append:
+                self.journal.entry_written(filename, uids)
 
-                                if result == QMessageBox.Yes:
-                                    self.repair_file()
+            else:
+                self.journal.base_written(filename, uids)
 
-                elif result == QMessageBox.Save:
-                    parent.save()
+            if self.scene.changeGeneration() == save['generation']:
+                self.scene.setHasChanges(False)
+                self.scene.parentWindow.setWindowTitle(f'{os.path.basename(self.filename)} - MPRUN')
+
+            self.scene.parentWindow.canvas_view.showMessage('File', f'File {filename} saved successfully.')
 
-                    filename, _ = QFileDialog.getOpenFileName(self.scene.parentWindow, 'Open File', '',
-                                                              'MPRUN files (*.mp)')
+        def failed(filename, error):
+            # Nothing was written, keep the changes for the next save
+            self.scene.change_tracker.restore_dirty_items(dirty_items)
 
-                    if filename:
-                        self.scene.undo_stack.clear()
-                        self.scene.clear()
-                        self.scene.parentWindow.update_recent_file_data(filename)
+            QMessageBox.critical(self.scene.parentWindow,
+                                 'Save Error',
+                                 f'The document could not be saved to {filename}: {error}')
 
-                        with open(filename, 'rb') as f:
-                            items_data = pickle.load(f)
-                            self.deserializer.deserialize_items(items_data)
+        codec, level = self.compression_settings()
 
-                            self.filename = filename
-                            parent.setWindowTitle(f'{os.path.basename(self.filename)} - MPRUN')
+        self.save_worker = SaveWorker(filename, save['snapshot'], append=append, codec=codec, level=level,
+                                      preview=save['preview'])
+        self.save_worker.progress.connect(progress)
+        self.save_worker.saved.connect(saved)
+        self.save_worker.failed.connect(failed)
+        self.save_worker.finished.connect(self.save_finished)
+        self.save_worker.start()
 
-                            if self.repair_needed:
-                                # Display a confirmation dialog
-                                confirmation_dialog = QMessageBox(self.scene.parentWindow)
-                                confirmation_dialog.setWindowTitle('Open Document Error')
-                                confirmation_dialog.setIcon(QMessageBox.Warning)
-                                confirmation_dialog.setText(
-                                    f"The document has file directories that could not be found. Do you want to do a file repair?")
-                                confirmation_dialog.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                                confirmation_dialog.setDefaultButton(QMessageBox.Yes)
+    def save_finished(self):
+        # Delivered after the worker's saved or failed handler, run what was waiting for the save
+        self.save_worker = None
 
-                                # Get the result of the confirmation dialog
-                                result = confirmation_dialog.exec_()
+        while self.pending_actions and self.save_worker is None:
+            action = self.pending_actions.pop(0)
 
-                                if result == QMessageBox.Yes:
-                                    self.repair_file()
+            if action[0] == 'write':
+                self.start_save(action[1])
 
             else:
-                filename, _ = QFileDialog.getOpenFileName(self.scene.parentWindow, 'Open File', '',
-                                                          'MPRUN files (*.mp)')
+                self.open_document(*action[1:])
+
+    def wait_for_save(self):
+        """Block until the running save and the saves queued behind it are written, when the app exits"""
+        while self.save_worker is not None:
+            worker = self.save_worker
+            worker.wait()
 
-                if filename:
-                    self.scene.undo_stack.clear()
-                    self.scene.clear()
-                    self.scene.parentWindow.update_recent_file_data(filename)
+            # Deliver the worker's signals, which start the next queued save
+            QCoreApplication.processEvents()
+
+            if self.save_worker is worker:
+                break
+
+    def load(self, parent):
+        try:
+            self.scene.parentWindow.use_exit_add_canvas()
+
+            if self.scene.hasChanges():
+                # Display a confirmation dialog
+                confirmation_dialog = QMessageBox(self.scene.parentWindow)
+                confirmation_dialog.setWindowTitle('Close Document')
+                confirmation_dialog.setIcon(QMessageBox.Warning)
+                confirmation_dialog.setText("The document has been modified. Do you want to save your changes?")
+                confirmation_dialog.setStandardButtons(QMessageBox.Discard | QMessageBox.Save | QMessageBox.Cancel)
+                confirmation_dialog.setDefaultButton(QMessageBox.Save)
 
-                    with open(filename, 'rb') as f:
-                        items_data = pickle.load(f)
-                        self.deserializer.deserialize_items(items_data)
+                # Get the result of the confirmation dialog
+                result = confirmation_dialog.exec_()
 
-                        self.filename = filename
-                        parent.setWindowTitle(f'{os.path.basename(self.filename)} - MPRUN')
+                if result == QMessageBox.Save:
+                    self.save()
 
-                        if self.repair_needed:
-                            # Display a confirmation dialog
-                            confirmation_dialog = QMessageBox(self.scene.parentWindow)
-                            confirmation_dialog.setWindowTitle('Open Document Error')
-                            confirmation_dialog.setIcon(QMessageBox.Warning)
-                            confirmation_dialog.setText(
-                                f"The document has file directories that could not be found. Do you want to do a file repair?")
-                            confirmation_dialog.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                            confirmation_dialog.setDefaultButton(QMessageBox.Yes)
+                elif result != QMessageBox.Discard:
+                    return
 
-                            # Get the result of the confirmation dialog
-                            result = confirmation_dialog.exec_()
+            filename, _ = QFileDialog.getOpenFileName(self.scene.parentWindow, 'Open File', '',
+                                                      'MPRUN files (*.mp)')
 
-                            if result == QMessageBox.Yes:
-                                self.repair_file()
+            if filename:
+                self.scene.parentWindow.update_recent_file_data(filename)
+                self.open_document(filename, parent)
 
         except Exception as e:
             QMessageBox.critical(self.scene.parentWindow,
@@ -225,121 +293,167 @@ class SceneFileManager:
                 # Get the result of the confirmation dialog
                 result = confirmation_dialog.exec_()
 
-                if result == QMessageBox.Discard:
-                    if filename.endswith('.mpt'):
-                        with open(filename, 'r') as f:
-                            data = json.load(f)
+                if result == QMessageBox.Save:
+                    if not self.save():
+                        return
 
-                            self.scene.template_manager.deserialize_items(data)
+                elif result != QMessageBox.Discard:
+                    return
 
-                    elif filename.endswith('.mp'):
-                        self.scene.undo_stack.clear()
-                        self.scene.clear()
+            if filename.endswith('.mpt'):
+                with open(filename, 'r') as f:
+                    data = json.load(f)
 
-                        with open(filename, 'rb') as f:
-                            items_data = pickle.load(f)
-                            self.deserializer.deserialize_items(items_data)
+                    self.scene.template_manager.deserialize_items(data)
 
-                            self.filename = filename
-                            parent.setWindowTitle(f'{os.path.basename(self.filename)} - MPRUN')
-                            self.scene.setHasChanges(False)
+            elif filename.endswith('.mp'):
+                self.open_document(filename, parent)
 
-                            if self.repair_needed:
-                                # Display a confirmation dialog
-                                confirmation_dialog = QMessageBox(self.scene.parentWindow)
-                                confirmation_dialog.setWindowTitle('Open Document Error')
-                                confirmation_dialog.setIcon(QMessageBox.Warning)
-                                confirmation_dialog.setText(
-                                    f"The document has file directories that could not be found. Do you want to do a file repair?")
-                                confirmation_dialog.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                                confirmation_dialog.setDefaultButton(QMessageBox.Yes)
+        except Exception as e:
+            QMessageBox.critical(self.scene.parentWindow,
+                                 'Open File Error',
+                                 'The document you are attempting to open has been corrupted. '
+                                 'Please open a different document, or repair any changes.')
 
-                                # Get the result of the confirmation dialog
-                                result = confirmation_dialog.exec_()
+            print(e)
 
-                                if result == QMessageBox.Yes:
-                                    self.repair_file()
+    def open_recovery(self, filename, document):
+        # Reopen a recovery snapshot as the (unsaved) document it was taken from
+        self.open_document(filename, self.scene.parentWindow, recovered_as=document)
+
+    def open_document(self, filename, parent, recovered_as=None):
+        """
+        Read and decode the file on a worker thread, then add the items to the scene in
+        time sliced batches (canvases first) so the window stays responsive while opening.
+        """
+        if self.loading:
+            return
+
+        if self.save_worker is not None:
+            # Opened once the save finishes, the scene is still being written
+            self.pending_actions.append(('open', filename, parent, recovered_as))
+            self.scene.parentWindow.canvas_view.showMessage('File', 'Opening once the current save finishes...')
+            return
+
+        self.scene.undo_stack.clear()
+        self.scene.clear()
+        self.scene.change_tracker.clear()
+        self.journal.reset()
+        self.loading = True
+
+        def loaded(items_data, offsets):
+            self.deserializer.deserialize_metadata(items_data[0], warn_large=False)
+            self.deserializer.decoded_assets = self.loader.assets
+
+            self.inserter = ProgressiveInserter(self.deserializer, items_data[1:], self.scene.parentWindow)
+            self.inserter.finished.connect(lambda: finished(items_data, offsets))
+            self.inserter.cancelled.connect(cancelled)
+            self.inserter.start()
+
+        def finished(items_data, offsets):
+            self.deserializer.finish()
+            self.loading = False
+
+            timings = dict(self.loader.timings, construct=self.inserter.construct_time)
+            self.scene.parentWindow.canvas_view.showMessage(
+                'File', f'Opened {len(items_data) - 1} items (read {timings["read"] * 1000:.0f}ms, '
+                        f'decode {timings["decode"] * 1000:.0f}ms, construct {timings["construct"] * 1000:.0f}ms)')
+
+            if recovered_as is not None:
+                # The document file doesn't have the recovered changes yet
+                self.filename = recovered_as
+                parent.setWindowTitle(f'{os.path.basename(self.filename)}* - MPRUN')
+                self.scene.setHasChanges(True)
+
+                return
+
+            self.journal.loaded(filename, items_data, offsets)
+            self.filename = filename
+            parent.setWindowTitle(f'{os.path.basename(self.filename)} - MPRUN')
+            self.scene.setHasChanges(False)
+
+            if self.repair_needed:
+                # Display a confirmation dialog
+                confirmation_dialog = QMessageBox(self.scene.parentWindow)
+                confirmation_dialog.setWindowTitle('Open Document Error')
+                confirmation_dialog.setIcon(QMessageBox.Warning)
+                confirmation_dialog.setText(
+                    f"The document has file directories that could not be found. Do you want to do a file repair?")
+                confirmation_dialog.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+                confirmation_dialog.setDefaultButton(QMessageBox.Yes)
 
-                elif result == QMessageBox.Save:
-                    success = self.save()
+                # Get the result of the confirmation dialog
+                result = confirmation_dialog.exec_()
 
-                    if success:
-                        if filename.endswith('.mpt'):
-                            with open(filename, 'r') as f:
-                                data = json.load(f)
+                if result == QMessageBox.Yes:
+                    self.repair_file()
 
-                                self.scene.template_manager.deserialize_items(data)
+        def cancelled():
+            self.loading = False
+            self.reset_to_default_scene()
 
-                        elif filename.endswith('.mp'):
-                            self.scene.undo_stack.clear()
-                            self.scene.clear()
+        def failed(error):
+            self.loading = False
 
-                            with open(filename, 'rb') as f:
-                                items_data = pickle.load(f)
-                                self.deserializer.deserialize_items(items_data)
+            QMessageBox.critical(self.scene.parentWindow,
+                                 'Open File Error',
+                                 'The document you are attempting to open has been corrupted. '
+                                 'Please open a different document, or repair any changes.')
 
-                                self.filename = filename
-                                parent.setWindowTitle(f'{os.path.basename(self.filename)} - MPRUN')
-                                self.scene.setHasChanges(False)
+            print(error)
 
-                                if self.repair_needed:
-                                    # Display a confirmation dialog
-                                    confirmation_dialog = QMessageBox(self.scene.parentWindow)
-                                    confirmation_dialog.setWindowTitle('Open Document Error')
-                                    confirmation_dialog.setIcon(QMessageBox.Warning)
-                                    confirmation_dialog.setText(
-                                        f"The document has file directories that could not be found. Do you want to do a file repair?")
-                                    confirmation_dialog.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                                    confirmation_dialog.setDefaultButton(QMessageBox.Yes)
+        self.loader = DocumentLoader(filename)
+        self.loader.loaded.connect(loaded)
+        self.loader.failed.connect(failed)
+        self.loader.start()
 
-                                    # Get the result of the confirmation dialog
-                                    result = confirmation_dialog.exec_()
+    def repair_file(self):
+        # The repaired file is rewritten from scratch
+        self.journal.reset()
+        self.w = FileDataRepairer(self.scene.parentWindow, filename=self.filename)
 
-                                    if result == QMessageBox.Yes:
-                                        self.repair_file()
+    def import_canvas(self):
+        """Add one canvas (and the items on it) from another .mp file to the current document"""
+        if self.loading:
+            return
 
-            else:
-                if filename.endswith('.mpt'):
-                    with open(filename, 'r') as f:
-                        data = json.load(f)
+        try:
+            filename, _ = QFileDialog.getOpenFileName(self.scene.parentWindow, 'Import Canvas', '',
+                                                      'MPRUN files (*.mp)')
+
+            if not filename:
+                return
+
+            with open(filename, 'rb') as f:
+                canvases = DocumentJournal.read_canvases(f)
 
-                        self.scene.template_manager.deserialize_items(data)
+            if not canvases:
+                QMessageBox.information(self.scene.parentWindow, 'Import Canvas', 'The document has no canvases.')
+                return
 
-                elif filename.endswith('.mp'):
-                    self.scene.undo_stack.clear()
-                    self.scene.clear()
+            names = [canvas['name'] for canvas in canvases]
+            name, ok = QInputDialog.getItem(self.scene.parentWindow, 'Import Canvas', 'Canvas:', names, 0, False)
 
-                    with open(filename, 'rb') as f:
-                        items_data = pickle.load(f)
-                        self.deserializer.deserialize_items(items_data)
+            if not ok:
+                return
 
-                        self.filename = filename
-                        parent.setWindowTitle(f'{os.path.basename(self.filename)} - MPRUN')
-                        self.scene.setHasChanges(False)
+            # Only the records inside the canvas are read, through the file index
+            with open(filename, 'rb') as f:
+                items_data, offsets = DocumentJournal.read(f, rect=canvases[names.index(name)]['rect'])
 
-                        if self.repair_needed:
-                            # Display a confirmation dialog
-                            confirmation_dialog = QMessageBox(self.scene.parentWindow)
-                            confirmation_dialog.setWindowTitle('Open Document Error')
-                            confirmation_dialog.setIcon(QMessageBox.Warning)
-                            confirmation_dialog.setText(
-                                f"The document has file directories that could not be found. Do you want to do a file repair?")
-                            confirmation_dialog.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                            confirmation_dialog.setDefaultButton(QMessageBox.Yes)
+            items = self.deserializer.deserialize_records(items_data)
 
-                            # Get the result of the confirmation dialog
-                            result = confirmation_dialog.exec_()
+            for item in items:
+                # Imported items are new to this document
+                item.mp_uid = None
 
-                            if result == QMessageBox.Yes:
-                                self.repair_file()
+            if items:
+                self.scene.addCommand(MultiAddItemCommand(self.scene, items))
+                self.scene.parentWindow.use_exit_add_canvas()
 
         except Exception as e:
             QMessageBox.critical(self.scene.parentWindow,
-                                 'Open File Error',
-                                 'The document you are attempting to open has been corrupted. '
-                                 'Please open a different document, or repair any changes.')
+                                 'Import Canvas Error',
+                                 'The canvas could not be imported from the selected document.')
 
             print(e)
-
-    def repair_file(self):
-        self.w = FileDataRepairer(self.scene.parentWindow, filename=self.filename)
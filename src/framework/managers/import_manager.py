@@ -19,8 +19,7 @@ class ImportManager:
 
         if file_path:
             if file_path.endswith('.svg'):
-                svg_item = CustomSvgItem(file_path)
-                svg_item.store_filename(file_path)
+                svg_item = CustomSvgItem.from_file(file_path)
 
                 add_command = AddItemCommand(self.canvas, svg_item)
                 self.canvas.addCommand(add_command)
@@ -38,9 +37,7 @@ class ImportManager:
                     self.create_item_attributes(item)
 
             else:
-                image1 = QPixmap(file_path)
-                image2 = CustomPixmapItem(image1)
-                image2.store_filename(file_path)
+                image2 = CustomPixmapItem.from_file(file_path)
 
                 add_command = AddItemCommand(self.canvas, image2)
                 self.canvas.addCommand(add_command)
@@ -0,0 +1,185 @@
+import os
+from src.framework.managers.container import DocumentContainer, rects_intersect
+from src.framework.managers.record_format import legacy_load, read_frame
+
+# Rewrite the base snapshot once the journal gets too long or too big compared to it
+JOURNAL_MAX_ENTRIES = 100
+JOURNAL_COMPACT_RATIO = 0.5
+
+
+class DocumentJournal:
+    """
+    Tracks what the .mp file on disk contains, so a save can append the changed items as a
+    journal entry after the base snapshot instead of rewriting the whole document.
+
+    File layout: the base snapshot (an indexed container) followed by zero or more journal entries,
+    one frame each. Documents saved before containers are a single pickled item list.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.filename = None
+        self.saved_uids = set()
+        self.base_size = 0
+        self.journal_size = 0
+        self.entries = 0
+
+    def can_append(self, filename):
+        # Only append to the exact file we wrote or loaded last, untouched since
+        return (self.filename is not None and
+                self.filename == os.path.abspath(filename) and
+                os.path.exists(filename) and
+                os.path.getsize(filename) == self.base_size + self.journal_size)
+
+    def needs_compaction(self):
+        return self.entries >= JOURNAL_MAX_ENTRIES or self.journal_size > self.base_size * JOURNAL_COMPACT_RATIO
+
+    def create_entry(self, items_data, current_uids):
+        return {
+            'journal': self.entries + 1,
+            'blobs': items_data[0]['blobs'],
+            'styles': items_data[0]['styles'],
+            'items': items_data[1:],
+            'removes': sorted(self.saved_uids - current_uids),
+        }
+
+    def base_written(self, filename, uids):
+        self.filename = os.path.abspath(filename)
+        self.saved_uids = set(uids)
+        self.base_size = os.path.getsize(filename)
+        self.journal_size = 0
+        self.entries = 0
+
+    def entry_written(self, filename, uids):
+        self.saved_uids = set(uids)
+        self.journal_size = os.path.getsize(filename) - self.base_size
+        self.entries += 1
+
+    def load(self, f, filename):
+        items_data, offsets = self.read(f)
+        self.loaded(filename, items_data, offsets)
+
+        return items_data
+
+    def loaded(self, filename, items_data, offsets):
+        uids = [record.get('uid') for record in items_data[1:]]
+
+        if offsets is None or None in uids:
+            # Pickled documents can't be appended to, the next save has to write a new base
+            self.reset()
+
+        else:
+            self.filename = os.path.abspath(filename)
+            self.saved_uids = set(uids)
+            self.base_size = offsets[0]
+            self.journal_size = offsets[-1] - offsets[0]
+            self.entries = len(offsets) - 1
+
+    @staticmethod
+    def read(f, rect=None):
+        """
+        Read the base snapshot and replay every journal entry on top of it.
+        With a rect (x, y, w, h) only the items intersecting it are read, if the file has an index.
+        Returns the items data and the file offsets of the entries, None for pickled documents.
+        """
+        if not DocumentContainer.is_container(f):
+            # Pickled documents have no index and no journal
+            return legacy_load(f), None
+
+        with DocumentContainer(f) as container:
+            items_data = container.read_items(None if rect is None else container.entries_in_rect(rect))
+            f.seek(container.base_end)
+
+        offsets = [f.tell()]
+        entries = []
+
+        while True:
+            position = f.tell()
+
+            try:
+                entries.append(read_frame(f))
+
+            except EOFError:
+                break
+
+            except Exception:
+                # A torn entry from an interrupted write, everything before it is intact
+                f.seek(position)
+                break
+
+            offsets.append(f.tell())
+
+        if entries:
+            items_data = DocumentJournal.replay(items_data, entries, rect)
+
+        return items_data, offsets
+
+    @staticmethod
+    def replay(items_data, entries, rect=None):
+        metadata = items_data[0]
+        records = {record.get('uid', index): record for index, record in enumerate(items_data[1:])}
+
+        for entry in entries:
+            metadata.setdefault('blobs', {}).update(entry['blobs'])
+
+            for kind, table in entry.get('styles', {}).items():
+                metadata.setdefault('styles', {}).setdefault(kind, {}).update(table)
+
+            for uid in entry['removes']:
+                records.pop(uid, None)
+
+            for record in entry['items']:
+                if rect is None or DocumentJournal.record_in_rect(record, rect):
+                    records[record['uid']] = record
+
+                else:
+                    # Moved out of the region
+                    records.pop(record['uid'], None)
+
+        if rect is not None:
+            records = {uid: record for uid, record in records.items() if DocumentJournal.record_in_rect(record, rect)}
+
+        return [metadata] + list(records.values())
+
+    @staticmethod
+    def read_canvases(f):
+        """List the canvases of a file, without decoding the other items when the file has an index"""
+        if not DocumentContainer.is_container(f):
+            items_data, offsets = DocumentJournal.read(f)
+
+            return [DocumentJournal.canvas_entry(record) for record in items_data[1:] if record['type'] == 'CanvasItem']
+
+        with DocumentContainer(f) as container:
+            canvases = {canvas['uid']: canvas for canvas in container.canvases()}
+            f.seek(container.base_end)
+
+        while True:
+            try:
+                entry = read_frame(f)
+
+            except Exception:
+                break
+
+            for uid in entry['removes']:
+                canvases.pop(uid, None)
+
+            for record in entry['items']:
+                if record['type'] == 'CanvasItem':
+                    canvases[record['uid']] = DocumentJournal.canvas_entry(record)
+
+        return list(canvases.values())
+
+    @staticmethod
+    def canvas_entry(record):
+        return {
+            'uid': record.get('uid'),
+            'name': record['name'],
+            'rect': [record['x'], record['y'], record['rect'][2], record['rect'][3]],
+        }
+
+    @staticmethod
+    def record_in_rect(record, rect):
+        # Files written before items stored their bounds can't be filtered
+        return record.get('bounds') is None or rects_intersect(record['bounds'], rect)
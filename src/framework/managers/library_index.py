@@ -0,0 +1,41 @@
+import os
+
+# Files the repairer can re-link svg and image items to
+ASSET_EXTENSIONS = ('.svg', '.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.webp', '.ico')
+
+
+class LibraryIndex:
+    """
+    Index of the asset files in the library folders by file name, used to find svgs and images
+    that were moved or saved on another computer. The folders are only walked on the first lookup.
+    """
+
+    def __init__(self, paths):
+        self.paths = [os.path.abspath(path) for path in paths if path and os.path.isdir(path)]
+        self.files = None
+
+    @staticmethod
+    def key(filename):
+        # Paths saved on Windows use backslashes
+        return os.path.basename(filename.replace('\\', '/')).lower()
+
+    def build(self):
+        self.files = {}
+
+        for path in self.paths:
+            for root, dirs, files in os.walk(path):
+                for file in files:
+                    if file.lower().endswith(ASSET_EXTENSIONS):
+                        self.files.setdefault(self.key(file), []).append(os.path.join(root, file))
+
+    def find(self, filename):
+        """Path of a library file with the same name as filename, None if there is no match"""
+        if not filename:
+            return None
+
+        if self.files is None:
+            self.build()
+
+        matches = self.files.get(self.key(filename))
+
+        return matches[0] if matches else None
@@ -0,0 +1,277 @@
+import contextlib
+import gc
+import json
+import orjson
+import pickle
+import struct
+import zlib
+
+# Frame: payload length, crc32 of the payload | payload
+# Payload: attachments length | attachments | json. Binary values are taken out of the json into the
+# attachments, the json lists them under '$bin' as [path in the value, offset in the payload, length].
+# A block of item records is a frame whose json is the array of its records, see RecordBlock
+FRAME_PREFIX = struct.Struct('<II')
+ATTACHMENTS_SIZE = struct.Struct('<I')
+
+BINARY_TYPES = (bytes, bytearray, memoryview)
+
+json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+json_decoder = json.JSONDecoder()
+
+
+class TornFrameError(ValueError):
+    """The stream ends in the middle of a frame, e.g. after an interrupted write"""
+
+
+class ChecksumError(ValueError):
+    """The frame payload doesn't match its checksum"""
+
+
+@contextlib.contextmanager
+def paused_gc():
+    """
+    Decoding a document makes hundreds of thousands of objects that all stay alive, collections
+    triggered while it runs only walk them and every other object of the app for nothing
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        yield
+
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def split_binary(value, path, names, attachments):
+    """Copy of value with the binary values taken out into attachments, names gets their paths"""
+    if isinstance(value, BINARY_TYPES):
+        names.append(path)
+        attachments.append(value)
+        return None
+
+    if isinstance(value, dict):
+        return {key: split_binary(v, path + [key], names, attachments) for key, v in value.items()}
+
+    if isinstance(value, list):
+        return [split_binary(v, path + [index], names, attachments) for index, v in enumerate(value)]
+
+    return value
+
+
+def encode_value(value: dict, position):
+    """The json of value and its binary values, which are stored in the payload from position on"""
+    names = []
+    attachments = []
+    fields = split_binary(value, [], names, attachments)
+
+    if names:
+        locations = []
+
+        for path, data in zip(names, attachments):
+            locations.append([path, position, len(data)])
+            position += len(data)
+
+        fields['$bin'] = locations
+
+    return json_encoder.encode(fields).encode('utf-8'), attachments
+
+
+def encode_payload(attachments, text) -> bytes:
+    return b''.join([ATTACHMENTS_SIZE.pack(sum(len(data) for data in attachments))] + attachments + [text])
+
+
+def wrap_payload(payload) -> bytes:
+    """Prefix payload with its length and checksum"""
+    return FRAME_PREFIX.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def encode_frame(value: dict) -> bytes:
+    """Encode a dict as a length prefixed, checksummed frame: typed fields as json, binary fields as attachments"""
+    text, attachments = encode_value(value, ATTACHMENTS_SIZE.size)
+
+    return wrap_payload(encode_payload(attachments, text))
+
+
+def attach_binary(value, payload):
+    for path, offset, length in value.pop('$bin'):
+        target = value
+
+        for key in path[:-1]:
+            target = target[key]
+
+        target[path[-1]] = bytes(payload[offset:offset + length])
+
+
+def decode_json(data):
+    """orjson parses several times faster, the json module reads what it rejects (NaN, integers beyond 64 bits)"""
+    try:
+        return orjson.loads(data)
+
+    except orjson.JSONDecodeError:
+        return json_decoder.decode(str(data, 'utf-8'))
+
+
+def payload_json(payload):
+    attachments_length, = ATTACHMENTS_SIZE.unpack_from(payload, 0)
+
+    return decode_json(memoryview(payload)[ATTACHMENTS_SIZE.size + attachments_length:])
+
+
+def decode_payload(payload) -> dict:
+    payload = memoryview(payload)
+    value = payload_json(payload)
+
+    if '$bin' in value:
+        attach_binary(value, payload)
+
+    return value
+
+
+def frame_payload(data, offset=0):
+    """The payload of the frame starting at offset and the offset after it, with its checksum verified"""
+    if len(data) < offset + FRAME_PREFIX.size:
+        raise TornFrameError('Frame length is truncated')
+
+    length, crc = FRAME_PREFIX.unpack_from(data, offset)
+    start = offset + FRAME_PREFIX.size
+    end = start + length
+
+    if len(data) < end:
+        raise TornFrameError('Frame is truncated')
+
+    payload = memoryview(data)[start:end]
+
+    if zlib.crc32(payload) != crc:
+        raise ChecksumError('Frame checksum mismatch')
+
+    return payload, end
+
+
+def decode_frame(data) -> dict:
+    return decode_payload(frame_payload(data)[0])
+
+
+def read_frame(f) -> dict:
+    """Read the next frame from a stream, EOFError at a clean end, TornFrameError on a partial frame"""
+    data = f.read(FRAME_PREFIX.size)
+
+    if not data:
+        raise EOFError
+
+    if len(data) < FRAME_PREFIX.size:
+        raise TornFrameError('Frame length is truncated')
+
+    length = FRAME_PREFIX.unpack(data)[0]
+    data += f.read(length)
+
+    return decode_frame(data)
+
+
+class RecordBlock:
+    """
+    Item records encoded as one frame, whose json is the array of the records, so a block is decoded
+    with a single json parse and checked with a single checksum. Every record also gets a checksum of
+    its own json and attachments, kept by the caller (the container index) for repairs.
+    """
+
+    def __init__(self):
+        self.texts = []
+        self.attachments = []
+        self.position = ATTACHMENTS_SIZE.size
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, record: dict) -> int:
+        """Encode record, returns its checksum"""
+        text, attachments = encode_value(record, self.position)
+        crc = zlib.crc32(text)
+
+        for data in attachments:
+            crc = zlib.crc32(data, crc)
+            self.position += len(data)
+
+        self.texts.append(text)
+        self.attachments.extend(attachments)
+
+        return crc
+
+    def encode(self):
+        """The block frame, and the (offset, length) of the json of every record in its payload"""
+        ranges = []
+        offset = self.position + 1
+
+        for text in self.texts:
+            ranges.append((offset, len(text)))
+            offset += len(text) + 1
+
+        return wrap_payload(encode_payload(self.attachments, b'[' + b','.join(self.texts) + b']')), ranges
+
+    @staticmethod
+    def decode(data) -> list:
+        """The records of a block frame, the checksums of the records are left to repairs"""
+        # Slices of bytes are copied straight into new bytes objects, slices of a memoryview are not
+        payload = bytes(frame_payload(data)[0])
+        records = payload_json(payload)
+
+        for record in records:
+            if '$bin' in record:
+                attach_binary(record, payload)
+
+        return records
+
+    @staticmethod
+    def salvage(data, offset, length, crc) -> dict:
+        """
+        The record at offset in the payload of a damaged block frame, if it matches its checksum.
+        The prefix of the frame isn't trusted, it may be the damaged part.
+        """
+        payload = memoryview(data)[FRAME_PREFIX.size:]
+        text = bytes(payload[offset:offset + length])
+        record = decode_json(text)
+        checksum = zlib.crc32(text)
+
+        for path, position, size in record.get('$bin', ()):
+            checksum = zlib.crc32(payload[position:position + size], checksum)
+
+        if checksum != crc:
+            raise ChecksumError('Record checksum mismatch')
+
+        if '$bin' in record:
+            attach_binary(record, payload)
+
+        return record
+
+
+class LegacyUnpickler(pickle.Unpickler):
+    """
+    Reads documents saved before the record format. Only plain data and Qt enum values are
+    allowed, so opening a crafted file can't run code.
+    """
+
+    allowed = {
+        ('copyreg', '_reconstructor'),
+        ('builtins', 'int'),
+        ('builtins', 'set'),
+        ('builtins', 'frozenset'),
+        ('builtins', 'bytearray'),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) in self.allowed:
+            return super().find_class(module, name)
+
+        if module == 'PyQt5.QtCore' and name.startswith('Qt.'):
+            value = super().find_class(module, name)
+
+            # Enum types only
+            if isinstance(value, type) and issubclass(value, int):
+                return value
+
+        raise pickle.UnpicklingError(f'{module}.{name} is not allowed in MPRUN documents')
+
+
+def legacy_load(f):
+    return LegacyUnpickler(f).load()
@@ -0,0 +1,120 @@
+import contextlib
+import os
+import tempfile
+from PyQt5.QtCore import QThread, pyqtSignal
+from src.framework.managers.container import DocumentContainer
+from src.framework.managers.record_format import encode_frame
+
+
+@contextlib.contextmanager
+def atomic_write(filename):
+    """Write to a temp file next to the target, then swap it in so a failed save never leaves a half written file"""
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_filename = tempfile.mkstemp(prefix=f'.{os.path.basename(filename)}.', suffix='.tmp', dir=directory)
+
+    try:
+        with os.fdopen(fd, 'w+b') as f:
+            yield f
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_filename, filename)
+
+    except BaseException:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+
+        raise
+
+
+def write_file_atomic(filename, data: bytes):
+    with atomic_write(filename) as f:
+        f.write(data)
+
+
+def append_file(filename, data: bytes):
+    """Append a journal entry, if the write fails the file is cut back to its previous size"""
+    with open(filename, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+
+        try:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        except BaseException:
+            f.truncate(size)
+            raise
+
+
+def encode_snapshot(snapshot, append=False, codec='none', level=None, preview=None):
+    # Journal entries are appended as they are, full snapshots get the indexed container
+    if append:
+        return encode_frame(snapshot)
+
+    return DocumentContainer.encode(snapshot, codec=codec, level=level,
+                                    preview=None if preview is None else encode_frame(preview))
+
+
+def update_preview(filename, preview):
+    """Refresh the preview of a file after appending to it, files without a preview block are left alone"""
+    with open(filename, 'r+b') as f:
+        if DocumentContainer.read_preview(f) is not None:
+            DocumentContainer.write_preview(f, encode_frame(preview))
+
+
+def write_snapshot(filename, snapshot, append=False, codec='none', level=None, preview=None):
+    data = encode_snapshot(snapshot, append=append, codec=codec, level=level, preview=preview)
+
+    if append:
+        append_file(filename, data)
+
+        if preview is not None:
+            update_preview(filename, preview)
+
+    else:
+        write_file_atomic(filename, data)
+
+
+class SaveWorker(QThread):
+    progress = pyqtSignal(int, str)
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, filename, snapshot, append=False, codec='none', level=None, preview=None, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.snapshot = snapshot
+        self.append = append
+        self.codec = codec
+        self.level = level
+        self.preview = preview
+
+    def run(self):
+        try:
+            self.progress.emit(0, 'Encoding document...')
+            data = encode_snapshot(self.snapshot, append=self.append, codec=self.codec, level=self.level,
+                                   preview=self.preview)
+
+            self.progress.emit(50, 'Writing file...')
+
+            if self.append:
+                append_file(self.filename, data)
+
+                if self.preview is not None:
+                    update_preview(self.filename, self.preview)
+
+            else:
+                write_file_atomic(self.filename, data)
+
+            self.progress.emit(100, 'Done')
+            self.saved.emit(self.filename)
+
+        except Exception as e:
+            self.failed.emit(self.filename, str(e))
+
+        finally:
+            # The snapshot is not needed anymore, free it on the worker
+            self.snapshot = None
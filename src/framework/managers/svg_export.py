@@ -0,0 +1,471 @@
+"""
+Structural SVG export. Painting the scene through QSvgGenerator repeats the full path data of a
+course element for every copy of it, so the scene items are written as SVG elements instead: each
+svg source once in <defs> with a <use> per item, and paths, shapes, images and text as native elements.
+"""
+import base64
+import hashlib
+import re
+import xml.etree.ElementTree as ET
+from PyQt5.QtCore import Qt, QBuffer, QIODevice, QRectF
+from PyQt5.QtGui import QBrush, QFontInfo, QPainterPath, QTransform
+from PyQt5.QtWidgets import (QGraphicsScene, QGraphicsPathItem, QGraphicsPixmapItem, QGraphicsRectItem,
+                             QGraphicsTextItem)
+from src.framework.items import CanvasTextItem, CustomPixmapItem, CustomSvgItem, LeaderLineItem
+
+SVG_NS = 'http://www.w3.org/2000/svg'
+XLINK_NS = 'http://www.w3.org/1999/xlink'
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+
+# Attributes of a source's root <svg> that only position it, the <g> it becomes is placed by a transform
+ROOT_ONLY_ATTRIBUTES = ('width', 'height', 'viewBox', 'preserveAspectRatio', 'x', 'y', 'id', 'version', 'baseProfile')
+
+# Editor data that doesn't change how a source looks
+SKIPPED_ELEMENTS = ('metadata', 'title', 'desc')
+
+CSS_RULE = re.compile(r'([^{}]*)\{([^{}]*)\}')
+CSS_NAME = re.compile(r'([.#])(-?[_a-zA-Z][\w-]*)')
+URL_REFERENCE = re.compile(r'url\(\s*["\']?#([^"\')\s]+)["\']?\s*\)')
+
+CAP_STYLES = {
+    Qt.PenCapStyle.FlatCap: 'butt',
+    Qt.PenCapStyle.SquareCap: 'square',
+    Qt.PenCapStyle.RoundCap: 'round',
+}
+
+JOIN_STYLES = {
+    Qt.PenJoinStyle.MiterJoin: 'miter',
+    Qt.PenJoinStyle.SvgMiterJoin: 'miter',
+    Qt.PenJoinStyle.BevelJoin: 'bevel',
+    Qt.PenJoinStyle.RoundJoin: 'round',
+}
+
+
+def number(value):
+    text = f'{value:.3f}'.rstrip('0').rstrip('.')
+
+    return '0' if text in ('', '-0') else text
+
+
+def transform_attribute(transform: QTransform):
+    if transform.isIdentity():
+        return None
+
+    if transform.type() == QTransform.TxTranslate:
+        return f'translate({number(transform.dx())} {number(transform.dy())})'
+
+    values = (transform.m11(), transform.m12(), transform.m21(), transform.m22(), transform.dx(), transform.dy())
+
+    return f'matrix({" ".join(number(value) for value in values)})'
+
+
+def path_data(path: QPainterPath):
+    commands = []
+    index = 0
+
+    while index < path.elementCount():
+        element = path.elementAt(index)
+
+        if element.isMoveTo():
+            commands.append(f'M{number(element.x)} {number(element.y)}')
+
+        elif element.isLineTo():
+            commands.append(f'L{number(element.x)} {number(element.y)}')
+
+        elif element.isCurveTo():
+            # A curve is followed by its second control point and end point
+            points = [path.elementAt(index + offset) for offset in range(3)]
+            commands.append('C' + ' '.join(f'{number(point.x)} {number(point.y)}' for point in points))
+            index += 2
+
+        index += 1
+
+    return ''.join(commands)
+
+
+def stroke_attributes(pen):
+    if pen.style() == Qt.PenStyle.NoPen or pen.color().alpha() == 0:
+        return {'stroke': 'none'}
+
+    attributes = {'stroke': pen.color().name()}
+    width = pen.widthF()
+
+    if pen.color().alpha() < 255:
+        attributes['stroke-opacity'] = number(pen.color().alphaF())
+
+    if pen.isCosmetic() or width == 0:
+        # Cosmetic pens keep their width at any zoom, 0 is a hairline
+        attributes['vector-effect'] = 'non-scaling-stroke'
+        width = width or 1
+
+    attributes['stroke-width'] = number(width)
+    attributes['stroke-linecap'] = CAP_STYLES.get(pen.capStyle(), 'square')
+    attributes['stroke-linejoin'] = JOIN_STYLES.get(pen.joinStyle(), 'bevel')
+
+    if pen.joinStyle() in (Qt.PenJoinStyle.MiterJoin, Qt.PenJoinStyle.SvgMiterJoin):
+        attributes['stroke-miterlimit'] = number(pen.miterLimit())
+
+    if pen.style() != Qt.PenStyle.SolidLine:
+        # Qt dash patterns are in pen widths
+        attributes['stroke-dasharray'] = ' '.join(number(value * width) for value in pen.dashPattern())
+
+    return attributes
+
+
+def fill_attributes(brush, fill_rule=None):
+    # Only solid brushes are used by the app, other patterns are written as their color
+    if brush.style() == Qt.BrushStyle.NoBrush or brush.color().alpha() == 0:
+        return {'fill': 'none'}
+
+    attributes = {'fill': brush.color().name()}
+
+    if brush.color().alpha() < 255:
+        attributes['fill-opacity'] = number(brush.color().alphaF())
+
+    if fill_rule == Qt.FillRule.OddEvenFill:
+        attributes['fill-rule'] = 'evenodd'
+
+    return attributes
+
+
+def prefix_urls(text, prefix):
+    return URL_REFERENCE.sub(lambda match: f'url(#{prefix}-{match.group(1)})', text)
+
+
+def prefix_css(css, prefix):
+    """Prefix the class and id selectors of a stylesheet, and the ids its rules reference"""
+    def rule(match):
+        selectors = CSS_NAME.sub(lambda name: f'{name.group(1)}{prefix}-{name.group(2)}', match.group(1))
+
+        return f'{selectors}{{{prefix_urls(match.group(2), prefix)}}}'
+
+    return CSS_RULE.sub(rule, css)
+
+
+def local_name(name):
+    """(namespace, name) of an ElementTree tag or attribute name"""
+    if name.startswith('{'):
+        namespace, name = name[1:].split('}', 1)
+
+        return namespace, name
+
+    return None, name
+
+
+class StructuralSvgWriter:
+    """Builds the SVG document of a rect of the scene (a canvas), see write_svg"""
+
+    def __init__(self, scene: QGraphicsScene, rect: QRectF):
+        self.scene = scene
+        self.rect = rect
+        self.defs = ET.Element('defs')
+
+        # Definition ids by the hash of the svg source or image they hold
+        self.sources = {}
+        self.images = {}
+
+    def build(self) -> ET.Element:
+        root = ET.Element('svg', {
+            'xmlns': SVG_NS,
+            'xmlns:xlink': XLINK_NS,
+            'version': '1.1',
+            'width': number(self.rect.width()),
+            'height': number(self.rect.height()),
+            'viewBox': ' '.join(number(value) for value in (self.rect.x(), self.rect.y(),
+                                                            self.rect.width(), self.rect.height())),
+        })
+        root.append(self.defs)
+
+        background = self.scene.backgroundBrush()
+
+        if background.style() != Qt.BrushStyle.NoBrush and background.color().alpha() > 0:
+            root.append(self.rect_element(self.rect, None, background))
+
+        # Bottom to top, children after their parents
+        for item in self.scene.items(self.rect, Qt.ItemSelectionMode.IntersectsItemBoundingRect,
+                                     Qt.SortOrder.AscendingOrder):
+            if not item.isVisible() or item.effectiveOpacity() == 0:
+                continue
+
+            element = self.item_element(item)
+
+            if element is None:
+                continue
+
+            transform = transform_attribute(item.sceneTransform())
+
+            if transform is not None:
+                element.set('transform', transform)
+
+            if item.effectiveOpacity() < 1:
+                element.set('opacity', number(item.effectiveOpacity()))
+
+            root.append(element)
+
+        if not len(self.defs):
+            root.remove(self.defs)
+
+        return root
+
+    def item_element(self, item):
+        if isinstance(item, CustomSvgItem):
+            return self.svg_element(item)
+
+        if isinstance(item, LeaderLineItem):
+            return self.leader_line_element(item)
+
+        if isinstance(item, QGraphicsPathItem):
+            return self.path_element(item.path(), item.pen(), item.brush())
+
+        if isinstance(item, QGraphicsRectItem):
+            return self.rect_element(item.rect(), item.pen(), item.brush())
+
+        if isinstance(item, QGraphicsPixmapItem):
+            return self.image_element(item)
+
+        if isinstance(item, QGraphicsTextItem) and not isinstance(item, CanvasTextItem):
+            return self.text_element(item)
+
+        # Editor overlays (canvas name tags, tool cursors) aren't part of the course
+        return None
+
+    def path_element(self, path, pen, brush):
+        attributes = {'d': path_data(path)}
+        attributes.update(fill_attributes(brush, path.fillRule()))
+        attributes.update(stroke_attributes(pen))
+
+        return ET.Element('path', attributes)
+
+    def rect_element(self, rect, pen, brush):
+        attributes = {
+            'x': number(rect.x()),
+            'y': number(rect.y()),
+            'width': number(rect.width()),
+            'height': number(rect.height()),
+        }
+        attributes.update(fill_attributes(brush))
+
+        if pen is not None:
+            attributes.update(stroke_attributes(pen))
+
+        return ET.Element('rect', attributes)
+
+    def leader_line_element(self, item: LeaderLineItem):
+        group = ET.Element('g')
+        group.append(self.path_element(item.path(), item.pen(), item.brush()))
+
+        underline = QPainterPath()
+        underline.moveTo(item.underline()[0])
+        underline.lineTo(item.underline()[1])
+        group.append(self.path_element(underline, item.pen(), QBrush()))
+
+        arrow_head = item.arrowHead()
+
+        if arrow_head is not None:
+            path = QPainterPath()
+            path.addPolygon(arrow_head)
+            path.closeSubpath()
+            group.append(self.path_element(path, item.pen(), QBrush(item.pen().color())))
+
+        return group
+
+    def svg_element(self, item: CustomSvgItem):
+        if item.svg_data is None:
+            return None
+
+        key = hashlib.sha1(item.svg_data.encode('utf-8')).hexdigest()
+
+        if key not in self.sources:
+            self.sources[key] = self.add_source(f's{len(self.sources) + 1}', item.svg_data, item.boundingRect())
+
+        if self.sources[key] is None:
+            return None
+
+        return ET.Element('use', {'xlink:href': f'#{self.sources[key]}'})
+
+    def add_source(self, prefix, svg_data, bounds):
+        """Add an svg source to the defs as a group the size of bounds, ids and classes prefixed to stay unique"""
+        try:
+            source = ET.fromstring(svg_data.encode('utf-8'))
+
+        except ET.ParseError as e:
+            print(f'Could not export svg element: {e}')
+            return None
+
+        view_box = [float(value) for value in re.split(r'[\s,]+', source.get('viewBox', '').strip()) if value]
+
+        if len(view_box) != 4 or not view_box[2] or not view_box[3]:
+            view_box = [0, 0, bounds.width(), bounds.height()]
+
+        # The renderer stretches the view box over the item's bounds
+        transform = QTransform()
+        transform.scale(bounds.width() / view_box[2], bounds.height() / view_box[3])
+        transform.translate(-view_box[0], -view_box[1])
+
+        group = self.copy_element(source, prefix, 'g')
+
+        for name in ROOT_ONLY_ATTRIBUTES:
+            group.attrib.pop(name, None)
+
+        group.set('id', prefix)
+
+        if transform_attribute(transform) is not None:
+            group.set('transform', transform_attribute(transform))
+
+        self.defs.append(group)
+
+        return prefix
+
+    def copy_element(self, element, prefix, tag=None):
+        """Copy an element of a source without foreign namespaces, or None when it isn't drawn"""
+        namespace, name = local_name(element.tag)
+
+        if namespace not in (None, SVG_NS) or name in SKIPPED_ELEMENTS:
+            return None
+
+        attributes = {}
+
+        for attribute, value in element.attrib.items():
+            namespace, attribute = local_name(attribute)
+
+            if namespace == XLINK_NS:
+                attribute = f'xlink:{attribute}'
+
+            elif namespace == XML_NS:
+                attribute = f'xml:{attribute}'
+
+            elif namespace is not None or attribute.startswith('data-'):
+                continue
+
+            if attribute == 'id':
+                value = f'{prefix}-{value}'
+
+            elif attribute == 'class':
+                value = ' '.join(f'{prefix}-{name}' for name in value.split())
+
+            elif attribute in ('href', 'xlink:href') and value.startswith('#'):
+                value = f'#{prefix}-{value[1:]}'
+
+            else:
+                value = prefix_urls(value, prefix)
+
+            attributes[attribute] = value
+
+        copy = ET.Element(tag or name, attributes)
+        copy.text = prefix_css(element.text, prefix) if name == 'style' and element.text else element.text
+        copy.tail = element.tail
+
+        for child in element:
+            child = self.copy_element(child, prefix)
+
+            if child is not None:
+                copy.append(child)
+
+        return copy
+
+    def image_element(self, item: QGraphicsPixmapItem):
+        if isinstance(item, CustomPixmapItem):
+            data, key = item.encoded_data()
+
+        else:
+            data, key = None, None
+
+        if data is None or not (data.startswith(b'\x89PNG') or data.startswith(b'\xff\xd8\xff')):
+            # Formats browsers and print software may not read are embedded as PNG
+            buffer = QBuffer()
+            buffer.open(QIODevice.WriteOnly)
+            item.pixmap().save(buffer, 'PNG')
+
+            data = buffer.data().data()
+            key = hashlib.sha256(data).hexdigest()
+
+        if key not in self.images:
+            self.images[key] = f'i{len(self.images) + 1}'
+            mime = 'image/png' if data.startswith(b'\x89PNG') else 'image/jpeg'
+            size = item.pixmap().size() / item.pixmap().devicePixelRatio()
+
+            ET.SubElement(self.defs, 'image', {
+                'id': self.images[key],
+                'width': number(size.width()),
+                'height': number(size.height()),
+                'xlink:href': f'data:{mime};base64,{base64.b64encode(data).decode("ascii")}',
+            })
+
+        attributes = {'xlink:href': f'#{self.images[key]}'}
+
+        if not item.offset().isNull():
+            attributes.update({'x': number(item.offset().x()), 'y': number(item.offset().y())})
+
+        return ET.Element('use', attributes)
+
+    def text_element(self, item: QGraphicsTextItem):
+        """A <text> per laid out line, with a <tspan> per run of formatting, at the positions Qt laid them out"""
+        group = ET.Element('g')
+        block = item.document().begin()
+
+        while block.isValid():
+            layout = block.layout()
+            origin = layout.position()
+            fragments = []
+            iterator = block.begin()
+
+            while not iterator.atEnd():
+                fragments.append(iterator.fragment())
+                iterator += 1
+
+            for index in range(layout.lineCount()):
+                line = layout.lineAt(index)
+                start, end = line.textStart(), line.textStart() + line.textLength()
+
+                text = ET.SubElement(group, 'text', {
+                    'x': number(origin.x() + line.cursorToX(start)[0]),
+                    'y': number(origin.y() + line.y() + line.ascent()),
+                    'xml:space': 'preserve',
+                })
+
+                for fragment in fragments:
+                    fragment_start = fragment.position() - block.position()
+                    run = block.text()[max(start, fragment_start):min(end, fragment_start + fragment.length())]
+
+                    if run.strip('\u2028'):
+                        # Line separators (shift + enter) end the line they are on
+                        span = ET.SubElement(text, 'tspan', self.font_attributes(fragment.charFormat(), item))
+                        span.text = run.replace('\u2028', '')
+
+            block = block.next()
+
+        return group
+
+    def font_attributes(self, char_format, item):
+        font = char_format.font()
+        foreground = char_format.foreground()
+        color = foreground.color() if foreground.style() != Qt.BrushStyle.NoBrush else item.defaultTextColor()
+
+        attributes = {
+            'font-family': font.family(),
+            'font-size': number(font.pixelSize() if font.pixelSize() > 0 else QFontInfo(font).pixelSize()),
+        }
+        attributes.update(fill_attributes(QBrush(color)))
+
+        if font.bold():
+            attributes['font-weight'] = 'bold'
+
+        if font.italic():
+            attributes['font-style'] = 'italic'
+
+        decorations = [name for name, enabled in (('underline', font.underline()),
+                                                   ('line-through', font.strikeOut())) if enabled]
+
+        if decorations:
+            attributes['text-decoration'] = ' '.join(decorations)
+
+        if font.letterSpacing() and font.letterSpacingType() == font.AbsoluteSpacing:
+            attributes['letter-spacing'] = number(font.letterSpacing())
+
+        return attributes
+
+
+def write_svg(scene: QGraphicsScene, rect: QRectF, file_path):
+    """Write rect of the scene (a canvas) to an svg file, see StructuralSvgWriter"""
+    root = StructuralSvgWriter(scene, rect).build()
+    ET.ElementTree(root).write(file_path, encoding='utf-8', xml_declaration=True)
@@ -0,0 +1,299 @@
+"""
+High resolution bitmap export that never holds the whole image in memory. The canvas is rendered in
+bands of rows, and each band is filtered and compressed on a thread pool and streamed to a PNG or
+TIFF file, so peak memory stays at a few bands whatever the output size.
+"""
+import collections
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QImage, QPainter
+
+# Upper bound for the pixels of one band (4 bytes each)
+BAND_BYTES = 8 * 1024 * 1024
+
+# Threads filtering and compressing bands while the next one is rendered
+TILE_THREADS = min(4, os.cpu_count() or 1)
+
+# Scene units are points, 72 per inch
+SCENE_DPI = 72
+
+TILED_EXTENSIONS = ('.png', '.tif', '.tiff')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def band_height(width, tiff=False):
+    rows = max(1, BAND_BYTES // (width * 4))
+
+    # Strips of a few rows bloat the TIFF strip tables, and zlib compresses better on larger runs
+    return min(rows, 512 if not tiff else 256)
+
+
+def render_band(scene, rect, scale, width, top, rows):
+    """Render output rows [top, top + rows) of rect at scale"""
+    image = QImage(width, rows, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+
+    # The scene rows covered by the band, painting only the items inside them
+    source = QRectF(rect.x(), rect.y() + top / scale, width / scale, rows / scale)
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
+    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+    scene.render(painter, QRectF(image.rect()), source, Qt.IgnoreAspectRatio)
+    painter.end()
+
+    return image
+
+
+def band_pixels(image):
+    # RGBA8888 is the byte order PNG and TIFF store
+    image = image.convertToFormat(QImage.Format_RGBA8888)
+    pointer = image.constBits()
+    pointer.setsize(image.sizeInBytes())
+
+    pixels = np.frombuffer(pointer, np.uint8).reshape(image.height(), image.bytesPerLine())
+
+    return pixels[:, :image.width() * 4].copy()
+
+
+def adler32_combine(adler1, adler2, length2):
+    """Checksum of two concatenated buffers from the checksums of each (zlib's adler32_combine)"""
+    base = 65521
+    remainder = length2 % base
+    sum1 = adler1 & 0xffff
+    sum2 = (remainder * sum1) % base
+    sum1 += (adler2 & 0xffff) + base - 1
+    sum2 += ((adler1 >> 16) & 0xffff) + ((adler2 >> 16) & 0xffff) + base - remainder
+
+    return (sum1 % base) | ((sum2 % base) << 16)
+
+
+class PngStreamWriter:
+    """
+    Writes a PNG band by band. Each band is deflated on its own and ended with a sync flush, so the
+    bands can be compressed in parallel and still join into the single zlib stream PNG wants.
+    """
+
+    def __init__(self, f, width, height, dpi, level=6):
+        self.f = f
+        self.level = level
+        self.adler = 1
+
+        f.write(PNG_SIGNATURE)
+        self.write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+        pixels_per_meter = round(dpi / 0.0254)
+        self.write_chunk(b'pHYs', struct.pack('>IIB', pixels_per_meter, pixels_per_meter, 1))
+
+        # zlib header of the image data stream
+        self.write_chunk(b'IDAT', b'\x78\x9c')
+
+    def write_chunk(self, kind, data):
+        self.f.write(struct.pack('>I', len(data)))
+        self.f.write(kind + data)
+        self.f.write(struct.pack('>I', zlib.crc32(kind + data)))
+
+    def encode(self, image, last):
+        """Runs on the pool, returns the deflated band with the checksum of its raw rows"""
+        pixels = band_pixels(image)
+
+        # Sub filter, each byte minus the same channel of the pixel to its left
+        rows = np.empty((pixels.shape[0], pixels.shape[1] + 1), np.uint8)
+        rows[:, 0] = 1
+        rows[:, 1:5] = pixels[:, :4]
+        rows[:, 5:] = pixels[:, 4:] - pixels[:, :-4]
+
+        raw = rows.tobytes()
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        data = compressor.compress(raw) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+        return data, zlib.adler32(raw), len(raw)
+
+    def write(self, encoded):
+        data, adler, length = encoded
+        self.adler = adler32_combine(self.adler, adler, length)
+        self.write_chunk(b'IDAT', data)
+
+    def finish(self):
+        self.write_chunk(b'IDAT', struct.pack('>I', self.adler))
+        self.write_chunk(b'IEND', b'')
+
+
+class TiffStreamWriter:
+    """
+    Writes a deflate compressed RGBA TIFF, one strip per band. Strips are compressed independently,
+    the strip tables and the directory are written once the last strip is in.
+    """
+
+    def __init__(self, f, width, height, dpi, rows_per_strip, level=6):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.rows_per_strip = rows_per_strip
+        self.level = level
+        self.offsets = []
+        self.counts = []
+
+        # Byte order, magic number, directory offset (filled in by finish)
+        f.write(b'II*\x00' + bytes(4))
+
+    def encode(self, image, last):
+        return zlib.compress(band_pixels(image).tobytes(), self.level)
+
+    def write(self, encoded):
+        self.offsets.append(self.f.tell())
+        self.counts.append(len(encoded))
+        self.f.write(encoded)
+
+    def write_array(self, fmt, values):
+        if self.f.tell() % 2:
+            self.f.write(b'\x00')
+
+        offset = self.f.tell()
+        self.f.write(struct.pack(f'<{len(values)}{fmt}', *values))
+
+        return offset
+
+    def finish(self):
+        if self.f.tell() > 0xffffffff:
+            raise ValueError('The image is too large for a TIFF file, export it as a PNG instead')
+
+        bits = self.write_array('H', [8, 8, 8, 8])
+        offsets = self.write_array('I', self.offsets)
+        counts = self.write_array('I', self.counts)
+        resolution = self.write_array('I', [round(self.dpi), 1])
+
+        # tag, type (3 short, 4 long, 5 rational), count, value or offset
+        tags = [
+            (256, 4, 1, self.width),
+            (257, 4, 1, self.height),
+            (258, 3, 4, bits),
+            (259, 3, 1, 8),
+            (262, 3, 1, 2),
+            (273, 4, len(self.offsets), offsets if len(self.offsets) > 1 else self.offsets[0]),
+            (277, 3, 1, 4),
+            (278, 4, 1, self.rows_per_strip),
+            (279, 4, len(self.counts), counts if len(self.counts) > 1 else self.counts[0]),
+            (282, 5, 1, resolution),
+            (283, 5, 1, resolution),
+            (284, 3, 1, 1),
+            (296, 3, 1, 2),
+            (338, 3, 1, 2),
+        ]
+
+        if self.f.tell() % 2:
+            self.f.write(b'\x00')
+
+        directory = self.f.tell()
+        self.f.write(struct.pack('<H', len(tags)))
+
+        for tag, kind, count, value in tags:
+            packed = struct.pack('<H', value) + bytes(2) if kind == 3 and count == 1 else struct.pack('<I', value)
+            self.f.write(struct.pack('<HHI', tag, kind, count) + packed)
+
+        self.f.write(bytes(4))
+        self.f.seek(4)
+        self.f.write(struct.pack('<I', directory))
+
+
+class TiledExport:
+    """
+    A tiled export in progress: each step renders the next band and hands it to the pool, finish
+    writes what's left and closes the file. Jobs run a step per event loop turn, so they pass a
+    scene nothing else changes in the meantime (a snapshot, see TiledExportJob), export_tiled
+    runs every step in one call.
+    """
+
+    def __init__(self, scene, rect, filename, dpi=SCENE_DPI):
+        self.scene = scene
+        self.rect = rect
+        self.filename = filename
+
+        scale = dpi / SCENE_DPI
+        self.width = max(1, round(rect.width() * scale))
+        self.height = max(1, round(rect.height() * scale))
+        tiff = os.path.splitext(filename)[1].lower() in ('.tif', '.tiff')
+        rows = band_height(self.width, tiff)
+        self.bands = [(top, min(rows, self.height - top)) for top in range(0, self.height, rows)]
+        self.index = 0
+
+        # Keep the exact scale the rounded size gives
+        self.scale = self.width / rect.width()
+        self.pending = collections.deque()
+
+        self.f = open(filename, 'wb')
+        self.pool = ThreadPoolExecutor(TILE_THREADS)
+
+        try:
+            self.writer = (TiffStreamWriter(self.f, self.width, self.height, dpi, rows) if tiff else
+                           PngStreamWriter(self.f, self.width, self.height, dpi))
+
+        except Exception:
+            self.abort()
+            raise
+
+    def step(self):
+        """Render the next band, True once every band is rendered"""
+        top, rows = self.bands[self.index]
+        image = render_band(self.scene, self.rect, self.scale, self.width, top, rows)
+        self.index += 1
+        self.pending.append(self.pool.submit(self.writer.encode, image, self.index == len(self.bands)))
+
+        # Write in order, with a few bands in flight at most
+        while len(self.pending) > TILE_THREADS or (self.pending and self.pending[0].done()):
+            self.writer.write(self.pending.popleft().result())
+
+        return self.index == len(self.bands)
+
+    def finish(self):
+        """Write the remaining bands and close the file, returns the pixel size of the image"""
+        while self.pending:
+            self.writer.write(self.pending.popleft().result())
+
+        self.writer.finish()
+        self.f.close()
+        self.pool.shutdown()
+
+        return self.width, self.height
+
+    def abort(self):
+        """Stop and remove the partial file"""
+        for future in self.pending:
+            future.cancel()
+
+        self.pool.shutdown(cancel_futures=True)
+        self.f.close()
+
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+def export_tiled(scene, rect, filename, dpi=SCENE_DPI, progress=None):
+    """
+    Render rect of the scene to a PNG or TIFF file at dpi (scene units are 1/72 inch). The scene is
+    only painted on the calling (GUI) thread. progress(done, total) is called after every band and
+    can return False to cancel, the partial file is removed. Returns the pixel size of the image.
+    """
+    export = TiledExport(scene, rect, filename, dpi)
+
+    try:
+        while not export.step():
+            if progress is not None and progress(export.index, len(export.bands)) is False:
+                export.abort()
+                return None
+
+        if progress is not None:
+            progress(export.index, len(export.bands))
+
+        return export.finish()
+
+    except Exception:
+        export.abort()
+        raise
@@ -0,0 +1,131 @@
+import struct
+import numpy as np
+from PyQt5.QtCore import Qt, QByteArray, QDataStream, QIODevice
+from PyQt5.QtGui import QPainterPath
+
+# Layout of a single element in Qt's QDataStream serialization of QPainterPath
+QT_ELEMENT_DTYPE = np.dtype([('type', '>i4'), ('x', '>f8'), ('y', '>f8')])
+
+
+class PathCodec:
+    """
+    Packs a QPainterPath into an element type byte array plus a flat coordinate buffer,
+    so large freehand paths are stored and rebuilt in bulk instead of one dict per element.
+    """
+
+    @staticmethod
+    def encode(path: QPainterPath):
+        raw = PathCodec.write_stream(path)
+        count = struct.unpack_from('>i', raw, 0)[0]
+
+        if count == 0 and path.elementCount() > 0:
+            # Qt streams a path that is only a moveTo as empty, keep its point
+            raw = PathCodec.pack_elements(path)
+            count = path.elementCount()
+
+        if count == 0:
+            return {
+                'codec': 'packed',
+                'types': b'',
+                'coords': b'',
+                'dtype': '<f4',
+                'cstart': 0,
+                'fillrule': int(path.fillRule()),
+            }
+
+        elements = np.frombuffer(raw, dtype=QT_ELEMENT_DTYPE, count=count, offset=4)
+        cstart, fillrule = struct.unpack_from('>ii', raw, 4 + count * QT_ELEMENT_DTYPE.itemsize)
+
+        coords = np.empty((count, 2), dtype='<f8')
+        coords[:, 0] = elements['x']
+        coords[:, 1] = elements['y']
+
+        # Use single precision whenever it does not lose anything
+        packed = coords.astype('<f4')
+        dtype = '<f4' if np.array_equal(packed, coords) else '<f8'
+
+        return {
+            'codec': 'packed',
+            'types': elements['type'].astype(np.uint8).tobytes(),
+            'coords': (packed if dtype == '<f4' else coords).tobytes(),
+            'dtype': dtype,
+            'cstart': cstart,
+            'fillrule': fillrule,
+        }
+
+    @staticmethod
+    def decode(data) -> QPainterPath:
+        if isinstance(data, list):
+            return PathCodec.decode_elements(data)
+
+        types = np.frombuffer(data['types'], dtype=np.uint8)
+        count = len(types)
+
+        if count == 0:
+            path = QPainterPath()
+
+            # Setting the fill rule gives the path a moveTo(0, 0), only do it when it matters
+            if data['fillrule'] != Qt.OddEvenFill:
+                path.setFillRule(Qt.FillRule(data['fillrule']))
+
+            return path
+
+        coords = np.frombuffer(data['coords'], dtype=data['dtype']).reshape(count, 2)
+
+        elements = np.empty(count, dtype=QT_ELEMENT_DTYPE)
+        elements['type'] = types
+        elements['x'] = coords[:, 0]
+        elements['y'] = coords[:, 1]
+
+        raw = (struct.pack('>i', count) +
+               elements.tobytes() +
+               struct.pack('>ii', data['cstart'], data['fillrule']))
+
+        return PathCodec.read_stream(raw)
+
+    @staticmethod
+    def decode_elements(elements) -> QPainterPath:
+        """Rebuild a path from the old per-element dict form"""
+        path = QPainterPath()
+        for element in elements:
+            if element['type'] == 'moveTo':
+                path.moveTo(element['x'], element['y'])
+            elif element['type'] == 'lineTo':
+                path.lineTo(element['x'], element['y'])
+            elif element['type'] == 'curveTo':
+                path.cubicTo(element['x'],
+                             element['y'],
+                             element['x'],
+                             element['y'],
+                             element['x'],
+                             element['y'])
+        return path
+
+    @staticmethod
+    def pack_elements(path: QPainterPath) -> bytes:
+        """The QDataStream layout of a path, built from its elements"""
+        elements = np.empty(path.elementCount(), dtype=QT_ELEMENT_DTYPE)
+
+        for i in range(path.elementCount()):
+            element = path.elementAt(i)
+            elements[i] = (element.type, element.x, element.y)
+
+        return (struct.pack('>i', len(elements)) +
+                elements.tobytes() +
+                struct.pack('>ii', 0, int(path.fillRule())))
+
+    @staticmethod
+    def write_stream(path: QPainterPath) -> bytes:
+        buffer = QByteArray()
+        stream = QDataStream(buffer, QIODevice.WriteOnly)
+        stream << path
+
+        return buffer.data()
+
+    @staticmethod
+    def read_stream(raw: bytes) -> QPainterPath:
+        path = QPainterPath()
+        stream = QDataStream(QByteArray(raw))
+        stream >> path
+
+        return path
@@ -0,0 +1,44 @@
+import collections
+
+# Events kept for inspection
+REPAINT_HISTORY = 100
+
+
+class RepaintCounter:
+    """
+    Counts, per scene event (a command, an undo, a key press...), the items invalidated by it and
+    the items the views painted afterwards, so a change that repaints the whole scene again shows up.
+    """
+
+    def __init__(self, history=REPAINT_HISTORY):
+        self.events = collections.deque(maxlen=history)
+
+        # Paints are only counted when enabled (see benchmarks/repaint.py), counting them queries the view
+        self.enabled = False
+
+    def invalidated(self, event, count):
+        self.events.append({'event': event, 'invalidated': count, 'painted': 0})
+
+    def painted(self, count):
+        # Paints are put on the event that caused them, the last one before them
+        if self.events:
+            self.events[-1]['painted'] += count
+
+    def last(self):
+        return self.events[-1] if self.events else None
+
+    def summary(self):
+        """Average invalidated and painted items by event"""
+        totals = {}
+
+        for entry in self.events:
+            total = totals.setdefault(entry['event'], [0, 0, 0])
+            total[0] += 1
+            total[1] += entry['invalidated']
+            total[2] += entry['painted']
+
+        return {event: {'count': count, 'invalidated': invalidated / count, 'painted': painted / count}
+                for event, (count, invalidated, painted) in totals.items()}
+
+    def clear(self):
+        self.events.clear()
@@ -1,130 +1,180 @@
+import hashlib
+import uuid
 from src.framework.items import *
+from src.framework.path_codec import PathCodec
+from src.framework.svg_cache import svg_sources
 from src.scripts.app_internal import copyright_message
 
+MP_FORMAT_VERSION = 7
+
 
 class SceneSerializer:
     def __init__(self, scene):
         self.scene = scene
 
-    def serialize_items(self):
+        # Blob table, content hash -> encoded bytes
+        self.blobs = {}
+
+        # Style tables, each distinct pen/brush/font is stored once and referenced by key
+        self.styles = {'pen': {}, 'brush': {}, 'font': {}}
+
+        # Styles and blobs used by the item being serialized, (table, key) pairs
+        self.references = set()
+
+    def serialize_items(self, items=None):
         items_data = []
 
+        self.blobs = {}
+        self.styles = {'pen': {}, 'brush': {}, 'font': {}}
+
         items_data.append({
             'mpversion': self.scene.mpversion,
+            'format': MP_FORMAT_VERSION,
             'copyright': copyright_message,
             'item_count': len(self.scene.items()),
-            'system_type': sys.platform
+            'system_type': sys.platform,
+            'blobs': self.blobs,
+            'styles': self.styles,
         })
 
-        for item in self.scene.items():
-            if isinstance(item, CanvasItem):
-                items_data.append(self.serialize_canvas(item))
-
-            elif isinstance(item, CustomTextItem):
-                if item.parentItem():
-                    pass
-
-                else:
-                    items_data.append({
-                        'type': 'CustomTextItem',
-                        'text': item.toPlainText(),
-                        'width': item.textWidth(),
-                        'alignment': self.serialize_alignment(item.textAlignment()),
-                        'font': self.serialize_font(item.font()),
-                        'color': self.serialize_color(item.defaultTextColor()),
-                        'attr': self.serialize_item_attributes(item),
-                        'locked': item.locked,
-                    })
-
-            elif isinstance(item, CustomPathItem):
-                if item.parentItem():
-                    pass
-
-                else:
-                    path_data = {
-                        'type': 'CustomPathItem',
-                        'pen': self.serialize_pen(item.pen()),
-                        'brush': self.serialize_brush(item.brush()),
-                        'attr': self.serialize_item_attributes(item),
-                        'elements': self.serialize_path(item.path()),
-                        'smooth': True if item.smooth else False,
-                    }
-
-                    items_data.append(path_data)
-
-            elif isinstance(item, LeaderLineItem):
-                if item.parentItem():
-                    pass
-
-                else:
-                    data = {
-                        'type': 'LeaderLineItem',
-                        'pen': self.serialize_pen(item.pen()),
-                        'brush': self.serialize_brush(item.brush()),
-                        'attr': self.serialize_item_attributes(item),
-                        'elements': self.serialize_path(item.path()),
-                        'text': item.text_element.toPlainText(),
-                        'textwidth': item.text_element.textWidth(),
-                        'textalignment': self.serialize_alignment(item.text_element.textAlignment()),
-                        'textcolor': self.serialize_color(item.text_element.defaultTextColor()),
-                        'textfont': self.serialize_font(item.text_element.font()),
-                        'textattr': self.serialize_item_attributes(item.text_element)
-                    }
-
-                    items_data.append(data)
-
-            elif isinstance(item, CustomSvgItem):
-                if item.parentItem():
-                    pass
-
-                else:
-                    data = {
-                        'type': 'CustomSvgItem',
-                        'attr': self.serialize_item_attributes(item),
-                        'filename': item.source() if
-                        os.path.exists(item.source() if item.source() is not None else '') else None,
-                        'raw_svg_data': self.serialize_file(item.source()) if
-                        os.path.exists(item.source() if item.source() is not None else '') else item.svgData(),
-                    }
-
-                    items_data.append(data)
-
-            elif isinstance(item, CustomPixmapItem):
-                if item.parentItem():
-                    pass
-
-                else:
-                    pixmap = item.pixmap()
-                    buffer = QBuffer()
-                    buffer.open(QIODevice.WriteOnly)
-                    pixmap.save(buffer, "PNG")
-                    pixmap_data = buffer.data().data()
-
-                    data = {
-                        'type': 'CustomPixmapItem',
-                        'attr': self.serialize_item_attributes(item),
-                        'filename': item.return_filename() if
-                        os.path.exists(item.return_filename() if item.return_filename() is not None else '') else None,
-                        'data': pixmap_data,
-                    }
-
-                    items_data.append(data)
+        for item in (self.scene.items() if items is None else items):
+            data = self.serialize_cached(item)
+
+            if data is not None:
+                items_data.append(data)
 
         return items_data
 
+    def serialize_cached(self, item):
+        """
+        The record of a top level item, reused from the last save while the item is clean. Undo commands
+        and itemChange drop the cached record of the items they touch, so a save of a large document only
+        pays for the edited items. Records are never changed once made, the save worker reads them too.
+        """
+        if not self.is_serializable(item):
+            return None
+
+        entry = self.scene.change_tracker.cached_record(item)
+
+        if entry is None:
+            self.references = set()
+
+            data = self.serialize_item(item)
+            data['uid'] = self.serialize_uid(item)
+            data['bounds'] = self.serialize_bounds(item)
+
+            entry = (data, {(kind, key): self.table(kind)[key] for kind, key in self.references})
+            self.scene.change_tracker.store_record(item, entry)
+
+        data, references = entry
+
+        for (kind, key), value in references.items():
+            self.table(kind).setdefault(key, value)
+
+        return data
+
+    def table(self, kind):
+        return self.blobs if kind == 'blob' else self.styles[kind]
+
+    def serialize_item(self, item):
+        if isinstance(item, CanvasItem):
+            return self.serialize_canvas(item)
+
+        elif item.parentItem():
+            return None
+
+        elif isinstance(item, CustomTextItem):
+            return {
+                'type': 'CustomTextItem',
+                'text': item.toPlainText(),
+                'width': item.textWidth(),
+                'alignment': self.serialize_alignment(item.textAlignment()),
+                'font': self.intern_style('font', self.serialize_font(item.font())),
+                'color': self.serialize_color(item.defaultTextColor()),
+                'attr': self.serialize_item_attributes(item),
+                'locked': item.locked,
+            }
+
+        elif isinstance(item, CustomPathItem):
+            return {
+                'type': 'CustomPathItem',
+                'pen': self.intern_style('pen', self.serialize_pen(item.pen())),
+                'brush': self.intern_style('brush', self.serialize_brush(item.brush())),
+                'attr': self.serialize_item_attributes(item),
+                'elements': self.serialize_path(item.path()),
+                'smooth': True if item.smooth else False,
+            }
+
+        elif isinstance(item, LeaderLineItem):
+            return {
+                'type': 'LeaderLineItem',
+                'pen': self.intern_style('pen', self.serialize_pen(item.pen())),
+                'brush': self.intern_style('brush', self.serialize_brush(item.brush())),
+                'attr': self.serialize_item_attributes(item),
+                'elements': self.serialize_path(item.path()),
+                'text': item.text_element.toPlainText(),
+                'textwidth': item.text_element.textWidth(),
+                'textalignment': self.serialize_alignment(item.text_element.textAlignment()),
+                'textcolor': self.serialize_color(item.text_element.defaultTextColor()),
+                'textfont': self.intern_style('font', self.serialize_font(item.text_element.font())),
+                'textattr': self.serialize_item_attributes(item.text_element)
+            }
+
+        elif isinstance(item, CustomSvgItem):
+            return {
+                'type': 'CustomSvgItem',
+                'attr': self.serialize_item_attributes(item),
+                'filename': item.source() if
+                os.path.exists(item.source() if item.source() is not None else '') else None,
+                'blob': self.serialize_svg_blob(item),
+            }
+
+        elif isinstance(item, CustomPixmapItem):
+            return {
+                'type': 'CustomPixmapItem',
+                'attr': self.serialize_item_attributes(item),
+                'filename': item.return_filename() if
+                os.path.exists(item.return_filename() if item.return_filename() is not None else '') else None,
+                'blob': self.serialize_pixmap_blob(item),
+            }
+
+        return None
+
+    def serialize_bounds(self, item):
+        # Scene bounding box, indexed by the container for region reads
+        rect = item.sceneBoundingRect()
+
+        return [rect.x(), rect.y(), rect.width(), rect.height()]
+
+    def serialize_uid(self, item):
+        # Stable id used to match items between the base snapshot and journal entries
+        if getattr(item, 'mp_uid', None) is None:
+            item.mp_uid = uuid.uuid4().hex
+
+        return item.mp_uid
+
+    def serialized_uids(self):
+        return {self.serialize_uid(item) for item in self.scene.items() if self.is_serializable(item)}
+
+    def is_serializable(self, item):
+        return (isinstance(item, CanvasItem) or
+                (isinstance(item, (CustomTextItem, CustomPathItem, LeaderLineItem, CustomSvgItem, CustomPixmapItem))
+                 and not item.parentItem()))
+
     def serialize_item_attributes(self, item):
-        return [{
-            'rotation': item.rotation(),
-            'transform': self.serialize_transform(item.transform()),
-            'scale': item.scale(),
-            'transformorigin': self.serialize_point(item.transformOriginPoint()),
-            'x': item.pos().x(),
-            'y': item.pos().y(),
-            'name': item.toolTip(),
-            'zval': item.zValue(),
-            'opacity': item.opacity(),
-            'visible': item.isVisible(),
-        }]
+        # Stored as a flat list, in the order SceneDeserializer.item_attributes unpacks them
+        return [
+            item.rotation(),
+            self.serialize_transform(item.transform()),
+            item.scale(),
+            self.serialize_point(item.transformOriginPoint()),
+            item.pos().x(),
+            item.pos().y(),
+            item.toolTip(),
+            item.zValue(),
+            item.opacity(),
+            item.isVisible(),
+        ]
 
     def serialize_color(self, color: QColor):
         return {
@@ -179,21 +229,27 @@ class SceneSerializer:
             'underline': font.underline(),
         }
 
+    def intern_style(self, kind, data):
+        # Keyed by content so journal entries and the base snapshot agree on the keys
+        key = hashlib.sha1(repr(data).encode()).hexdigest()[:16]
+        self.styles[kind].setdefault(key, data)
+        self.references.add((kind, key))
+
+        return key
+
     def serialize_transform(self, transform: QTransform):
-        return {
-            'm11': transform.m11(),
-            'm12': transform.m12(),
-            'm13': transform.m13(),
-            'm21': transform.m21(),
-            'm22': transform.m22(),
-            'm23': transform.m23(),
-            'm31': transform.m31(),
-            'm32': transform.m32(),
-            'm33': transform.m33()
-        }
+        # Most items are never skewed, an identity transform is stored as None
+        if transform.isIdentity():
+            return None
+
+        return [
+            transform.m11(), transform.m12(), transform.m13(),
+            transform.m21(), transform.m22(), transform.m23(),
+            transform.m31(), transform.m32(), transform.m33(),
+        ]
 
     def serialize_point(self, point: QPointF):
-        return {'x': point.x(), 'y': point.y()}
+        return [point.x(), point.y()]
 
     def serialize_canvas(self, canvas: CanvasItem):
         return {
@@ -211,17 +267,31 @@ class SceneSerializer:
                 alignment == Qt.AlignmentFlag.AlignRight) else 'left'
 
     def serialize_path(self, path: QPainterPath):
-        elements = []
-        for i in range(path.elementCount()):
-            element = path.elementAt(i)
-            if element.isMoveTo():
-                elements.append({'type': 'moveTo', 'x': element.x, 'y': element.y})
-            elif element.isLineTo():
-                elements.append({'type': 'lineTo', 'x': element.x, 'y': element.y})
-            elif element.isCurveTo():
-                elements.append({'type': 'curveTo', 'x': element.x, 'y': element.y})
-        return elements
-
-    def serialize_file(self, file):
-        with open(file, 'r', encoding='utf-8') as f:
-            return f.read()
\ No newline at end of file
+        return PathCodec.encode(path)
+
+    def serialize_svg_blob(self, item: CustomSvgItem):
+        source = item.source()
+
+        if os.path.exists(source if source is not None else ''):
+            # Library elements are placed many times, the source cache reads and hashes each file once
+            svg_source = svg_sources.get(source)
+
+            return self.add_blob(svg_source.data, svg_source.key)
+
+        return self.add_blob(item.svgData().encode('utf-8'))
+
+    def serialize_pixmap_blob(self, item: CustomPixmapItem):
+        # The original encoded image is stored as is, keyed by its hash
+        data, key = item.encoded_data()
+
+        return self.add_blob(data, key)
+
+    def add_blob(self, data: bytes, key=None):
+        key = key or hashlib.sha256(data).hexdigest()
+
+        if key not in self.blobs:
+            self.blobs[key] = data
+
+        self.references.add(('blob', key))
+
+        return key
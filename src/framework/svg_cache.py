@@ -0,0 +1,62 @@
+import hashlib
+import os
+from PyQt5.QtCore import QByteArray
+from PyQt5.QtSvg import QSvgRenderer
+
+
+class SvgSource:
+    """The contents of an svg file, its blob key and a renderer shared by every item placed from it"""
+
+    def __init__(self, data: bytes, stamp):
+        self.data = data
+        self.stamp = stamp
+        self.key = hashlib.sha256(data).hexdigest()
+        self._text = None
+        self._renderer = None
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.data.decode('utf-8')
+
+        return self._text
+
+    @property
+    def renderer(self):
+        # Parsed on first use, saving only needs the data
+        if self._renderer is None:
+            self._renderer = QSvgRenderer(QByteArray(self.data))
+
+        return self._renderer
+
+
+class SvgSourceCache:
+    """
+    Process wide cache of svg source files by absolute path. An entry is reused while the file's
+    modification time and size are unchanged, so library elements are read and parsed once no
+    matter how many times they are placed, copied or saved.
+    """
+
+    def __init__(self):
+        self.sources = {}
+
+    def get(self, filename) -> SvgSource:
+        """The source of filename, read again if the file changed, OSError if it can't be read"""
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        source = self.sources.get(path)
+
+        if source is None or source.stamp != stamp:
+            with open(path, 'rb') as f:
+                source = SvgSource(f.read(), stamp)
+
+            self.sources[path] = source
+
+        return source
+
+    def clear(self):
+        self.sources.clear()
+
+
+svg_sources = SvgSourceCache()
@@ -61,6 +61,15 @@ class CanvasItemSelector(mprun.gui.base_dialog):
         self.watermark_check_btn.setToolTip('Help support us by adding an MPRUN watermark')
         self.watermark_check_btn.clicked.connect(self.add_watermark)
 
+        # Resolution option
+        resolution_label = QLabel('Resolution:')
+        self.resolution_spin = QSpinBox()
+        self.resolution_spin.setRange(72, 2400)
+        self.resolution_spin.setValue(72)
+        self.resolution_spin.setSingleStep(72)
+        self.resolution_spin.setSuffix(' DPI')
+        self.resolution_spin.setToolTip('Resolution of image exports, 72 DPI is one pixel per point')
+
         # Export button
         self.export_btn = QPushButton("Export")
         self.export_btn.setToolTip('Export the selected canvas')
@@ -73,6 +82,8 @@ class CanvasItemSelector(mprun.gui.base_dialog):
         self.layout.addWidget(export_options_label)
         self.layout.addWidget(self.transparent_check_btn)
         self.layout.addWidget(self.watermark_check_btn)
+        self.layout.addWidget(resolution_label)
+        self.layout.addWidget(self.resolution_spin)
         self.layout.addItem(QSpacerItem(20, 20, QSizePolicy.Minimum, QSizePolicy.Expanding))
         self.layout.addWidget(self.export_btn)
         self.hlayout.addLayout(self.layout)
@@ -573,8 +584,45 @@ class SettingsWin(mprun.gui.base_dialog):
             gpu_gb.layout().addWidget(gpu_hlayout)
             self.performance_tab.layout().addWidget(gpu_gb)
 
+        def createFilesGB():
+            files_gb = QGroupBox('Files')
+            files_gb.setLayout(QVBoxLayout())
+
+            compression_label = QLabel('File Compression:')
+            self.file_compression_combo = QComboBox()
+            self.file_compression_combo.addItem('None', 'none')
+            self.file_compression_combo.addItem('Zlib (Fast)', 'zlib')
+            self.file_compression_combo.addItem('LZMA (Smallest)', 'lzma')
+            self.file_compression_combo.addItem('BZ2', 'bz2')
+            compression_level_label = QLabel('Level:')
+            self.file_compression_level_spin = QSpinBox()
+            self.file_compression_level_spin.setRange(1, 9)
+            self.file_compression_level_spin.setFixedWidth(100)
+            compression_hlayout = mprun.gui.horizontal_layout()
+            compression_hlayout.layout().addWidget(compression_label)
+            compression_hlayout.layout().addWidget(self.file_compression_combo)
+            compression_hlayout.layout().addWidget(compression_level_label)
+            compression_hlayout.layout().addWidget(self.file_compression_level_spin)
+            compression_hlayout.layout().addStretch()
+
+            autosave_label = QLabel('Autosave Recovery Snapshot Every:')
+            self.autosave_interval_spin = QSpinBox()
+            self.autosave_interval_spin.setRange(0, 3600)
+            self.autosave_interval_spin.setSuffix(' s')
+            self.autosave_interval_spin.setSpecialValueText('Off')
+            self.autosave_interval_spin.setFixedWidth(100)
+            autosave_hlayout = mprun.gui.horizontal_layout()
+            autosave_hlayout.layout().addWidget(autosave_label)
+            autosave_hlayout.layout().addWidget(self.autosave_interval_spin)
+            autosave_hlayout.layout().addStretch()
+
+            files_gb.layout().addWidget(compression_hlayout)
+            files_gb.layout().addWidget(autosave_hlayout)
+            self.performance_tab.layout().addWidget(files_gb)
+
         createMemoryGB()
         createGPUGB()
+        createFilesGB()
 
         self.performance_tab.layout().addStretch()
 
@@ -624,6 +672,10 @@ class SettingsWin(mprun.gui.base_dialog):
             self.use_gpu_checkbtn.setChecked(data['use_gpu'])
             self.gpu_samples_spin.setValue(data['gpu_samples'])
             self.recent_file_limit_spin.setValue(data['recent_file_display_limit'])
+            self.file_compression_combo.setCurrentIndex(
+                max(0, self.file_compression_combo.findData(data.get('file_compression', 'zlib'))))
+            self.file_compression_level_spin.setValue(data.get('file_compression_level', 6))
+            self.autosave_interval_spin.setValue(data.get('autosave_interval', 120))
             for k, v in self.colors.items():
                 if v == data['default_stroke']:
                     self.default_stroke_combo.setCurrentText(k)
@@ -647,8 +699,12 @@ class SettingsWin(mprun.gui.base_dialog):
             data['default_fill'] = self.default_fill_combo.itemData(self.default_fill_combo.currentIndex())
             data['default_font'] = self.default_font_combo.itemData(self.default_font_combo.currentIndex())
             data['recent_file_display_limit'] = self.recent_file_limit_spin.value()
+            data['file_compression'] = self.file_compression_combo.currentData()
+            data['file_compression_level'] = self.file_compression_level_spin.value()
+            data['autosave_interval'] = self.autosave_interval_spin.value()
 
         self.p.write_settings(_data)
+        self.p.canvas.manager.autosave.start()
 
         with open('internal data/_tricks.txt', 'w') as f:
             f.write(self.suggestions_box_edit.toPlainText())
@@ -675,6 +731,9 @@ class SettingsWin(mprun.gui.base_dialog):
         self.use_gpu_checkbtn.setChecked(False)
         self.recent_file_limit_spin.setValue(5)
         self.gpu_samples_spin.setValue(4)
+        self.file_compression_combo.setCurrentIndex(self.file_compression_combo.findData('zlib'))
+        self.file_compression_level_spin.setValue(6)
+        self.autosave_interval_spin.setValue(120)
         for k, v in self.colors.items():
             if v == 'red':
                 self.default_stroke_combo.setCurrentText(k)
@@ -793,15 +793,11 @@ class CustomListWidget(QListWidget):
 
         if os.path.exists(file):
             if file.endswith('.svg'):
-                item = CustomSvgItem(file)
-                item.store_filename(file)
-                item.store_filename(os.path.abspath(file))
+                item = CustomSvgItem.from_file(os.path.abspath(file))
                 item.setToolTip('Imported SVG')
 
             else:
-                pixmap = QPixmap(file)
-                item = CustomPixmapItem(pixmap)
-                item.store_filename(os.path.abspath(file))
+                item = CustomPixmapItem.from_file(os.path.abspath(file))
                 item.setToolTip('Imported Bitmap')
 
             # Set default attributes
@@ -1,6 +1,9 @@
 import mprun.gui
 from mprun.constants import WINDOW_MODAL
 from src.framework.items import *
+from src.framework.managers.export_manager import CanvasExportJob, export_filenames
+from src.framework.managers.export_queue import ExportJob
+from src.framework.managers.cloud_upload import ICloudDriveBackend, UploadJob, UploadManifest, UploadPipeline
 from pyicloud import PyiCloudService
 from pyicloud.exceptions import PyiCloudFailedLoginException
 from pathlib import Path
@@ -79,91 +82,68 @@ class iCloudIntegratorWin(mprun.gui.base_dialog):
             if api.requires_2fa:
                 code, ok = QInputDialog.getInt(self.parent, '2FA Code', 'Enter the 2FA code sent to your Apple device:')
 
-                if ok:
-                    if api.validate_2fa_code(str(code)):
-                        for photo in self.export():
-                            with open(photo, 'rb') as f:
-                                api.drive.params["clientId"] = api.client_id
-                                api.drive['Downloads'].mkdir('MPRUN')
-                                api.drive['Downloads']['MPRUN'].upload(f)
-                    else:
-                        QMessageBox.warning(self.parent, 'Incorrect Code', 'Failed to verify security code.')
-                        return
+                if not ok:
+                    return
 
-            else:
-                for photo in self.export():
-                    with open(photo, 'rb') as f:
-                        api.drive.params["clientId"] = api.client_id
-                        api.drive['Downloads'].mkdir('MPRUN')
-                        api.drive['Downloads']['MPRUN'].upload(f)
+                if not api.validate_2fa_code(str(code)):
+                    QMessageBox.warning(self.parent, 'Incorrect Code', 'Failed to verify security code.')
+                    return
 
-            QMessageBox.information(self.parent, 'File Shared', 'The file has successfully been '
-                                                                'transferred to iCloud. It has been saved '
-                                                                'to the "Downloads" folder.')
-
-            if self.save_for_later_check_btn.isChecked():
-                _data = self.parent.read_settings()
-
-                for data in _data:
-                    data['icloud_username'] = self.apple_id_input.text()
-                    data['icloud_password'] = self.password_input.text()
-
-                self.parent.write_settings(_data)
-
-            self.close()
+            self.upload(ICloudDriveBackend(api, 'Downloads', 'MPRUN'))
 
         except Exception as e:
             QMessageBox.critical(self.parent, 'Error', f'An unexpected error occurred: {e}')
 
-    def export(self) -> list[str]:
-        try:
-            # Get the user's Downloads folder
-            downloads_folder = downloads_path
+    def upload(self, backend):
+        # Export the canvases to a subdirectory of the user's Downloads folder
+        subdirectory = os.path.join(downloads_path, 'Canvas Assets')
+        os.makedirs(subdirectory, exist_ok=True)
 
-            # Create a subdirectory in Downloads
-            subdirectory = os.path.join(downloads_folder,
-                                        'Canvas Assets')
-            os.makedirs(subdirectory, exist_ok=True)
+        canvases = [item for item in self.canvas.items() if isinstance(item, CanvasItem)]
+        export_manager = self.canvas.exportManager
 
-            file_extension = '.png'  # Set file extension to PNG
-            tooltip_count = {}
-            exported_filenames = []
+        # Shares of canvases that didn't change since they were last exported are just copied
+        export_job = export_manager.queueExport(CanvasExportJob(self.canvas, canvases,
+                                                                export_filenames(canvases, subdirectory, '.png'),
+                                                                'Share To iCloud', export_manager.export_cache))
 
-            for item in self.canvas.items():
-                if isinstance(item, CanvasItem):
-                    tooltip = item.toolTip()
-                    if tooltip in tooltip_count:
-                        tooltip_count[tooltip] += 1
-                    else:
-                        tooltip_count[tooltip] = 1
+        def exported(written, errors):
+            if export_job.state != ExportJob.FINISHED or errors:
+                self.button_group.setEnabled(True)
+                return
 
-                    unique_filename = f"{tooltip}_{tooltip_count[tooltip]}{file_extension}"
-                    filename = os.path.join(subdirectory, unique_filename)
-                    exported_filenames.append(filename)
+            # Uploaded in the background, canvases the folder already has unchanged are skipped
+            job = UploadJob(UploadPipeline(backend, UploadManifest()), written, 'Upload To iCloud')
+            job.finished.connect(lambda written, errors: self.upload_finished(job))
+            export_manager.export_queue.add(job)
 
-                    # Export the item as a PNG
-                    self.export_as_png(filename, item)
+        export_job.finished.connect(exported)
+        self.button_group.setEnabled(False)
 
-            return exported_filenames
+    def upload_finished(self, job):
+        self.button_group.setEnabled(True)
+        result = job.result
 
-        except Exception as e:
-            print(e)
+        if result is None or result.cancelled:
+            return
 
-    def export_as_png(self, filename, selected_item):
-        # Create a QImage with the size of the selected item (QGraphicsRectItem)
-        rect = selected_item.sceneBoundingRect()
-        image = QImage(rect.size().toSize(), QImage.Format.Format_ARGB32)
+        if result.failed:
+            QMessageBox.warning(self.parent, 'Share To iCloud',
+                                f'{len(result.failed)} canvases could not be uploaded, share again to retry them:\n' +
+                                '\n'.join(f'{os.path.basename(path)}: {error}' for path, error in result.failed.items()))
+            return
 
-        # Render the QGraphicsRectItem onto the image
-        painter = QPainter(image)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
-        self.canvas.render(painter, target=QRectF(image.rect()), source=rect)
-        painter.end()
+        QMessageBox.information(self.parent, 'File Shared', f'{len(result.uploaded)} canvases have been transferred to '
+                                                            f'iCloud ({len(result.skipped)} unchanged). They have been '
+                                                            f'saved to the "Downloads" folder.')
 
-        try:
-            image.save(filename)
+        if self.save_for_later_check_btn.isChecked():
+            _data = self.parent.read_settings()
 
-        except Exception as e:
-            # If saving failed, show an error notification
-            QMessageBox.critical(self, "Export Error", f"Failed to export canvas to file: {e}")
+            for data in _data:
+                data['icloud_username'] = self.apple_id_input.text()
+                data['icloud_password'] = self.password_input.text()
+
+            self.parent.write_settings(_data)
+
+        self.close()
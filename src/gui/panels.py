@@ -4,6 +4,7 @@ import re
 from src.scripts.imports import *
 from src.framework.items import *
 from src.gui.custom_widgets import StrokeLabel
+from src.framework.managers.export_queue import ExportJob
 
 if getattr(sys, 'frozen', False):
     os.chdir(sys._MEIPASS)
@@ -216,8 +217,6 @@ class PropertiesPanel(mprun.gui.base_widget):
                 except Exception as e:
                     print(f'Exception: {e}')
 
-        self.parent.canvas_view.update()
-
     def updateItemFill(self):
         brush = self.getBrush()
 
@@ -238,8 +237,6 @@ class PropertiesPanel(mprun.gui.base_widget):
                     # Handle the exception (e.g., logging)
                     print(f'Exception: {e}')
 
-        self.parent.canvas_view.update()
-
     def getPen(self) -> QPen:
         index1 = self.stroke_style_combo.currentIndex()
         data1 = self.stroke_style_combo.itemData(index1)
@@ -879,3 +876,128 @@ class ScenePanel(mprun.gui.base_widget):
         self.zoom_widget.spinBox().setValue(100)
         self.rotate_widget.spinBox().setValue(0)
         self.reset_btn.setHidden(True)
+
+
+class ExportJobsPanel(mprun.gui.base_widget):
+    def __init__(self, canvas, parent):
+        super().__init__(parent)
+        self.setMinimumHeight(200)
+
+        self.canvas = canvas
+        self.parent = parent
+        self.queue = canvas.exportManager.export_queue
+        self.job_items = {}
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        self.createUI()
+
+        self.queue.jobAdded.connect(self.addJob)
+        self.queue.jobChanged.connect(self.updateJob)
+        self.queue.jobRemoved.connect(self.removeJob)
+
+    def createUI(self):
+        self.jobs_tree = QTreeWidget(self)
+        self.jobs_tree.setHeaderLabels(['Export', 'Status'])
+        self.jobs_tree.setRootIsDecorated(False)
+        self.jobs_tree.setColumnWidth(0, 150)
+        self.jobs_tree.setToolTip('Exports run one at a time in the order they were started')
+        self.jobs_tree.itemSelectionChanged.connect(self.updateDetails)
+        self.jobs_tree.itemDoubleClicked.connect(lambda item: self.openJob())
+
+        self.details_label = QLabel('No export selected')
+        self.details_label.setWordWrap(True)
+
+        self.open_btn = QPushButton('Open')
+        self.open_btn.setToolTip('Open the exported file, or its folder')
+        self.open_btn.clicked.connect(self.openJob)
+        self.cancel_btn = QPushButton('Cancel')
+        self.cancel_btn.setToolTip('Cancel the selected export')
+        self.cancel_btn.clicked.connect(self.cancelJob)
+        self.clear_btn = QPushButton('Clear')
+        self.clear_btn.setToolTip('Remove the finished exports from the list')
+        self.clear_btn.clicked.connect(self.clearFinished)
+
+        buttons_hlayout = mprun.gui.horizontal_layout()
+        buttons_hlayout.layout().addWidget(self.open_btn)
+        buttons_hlayout.layout().addWidget(self.cancel_btn)
+        buttons_hlayout.layout().addWidget(self.clear_btn)
+
+        self.layout.addWidget(self.jobs_tree)
+        self.layout.addWidget(self.details_label)
+        self.layout.addWidget(buttons_hlayout)
+
+        self.updateDetails()
+
+    def selectedJob(self):
+        items = self.jobs_tree.selectedItems()
+
+        return items[0].data(0, Qt.UserRole) if items else None
+
+    def addJob(self, job):
+        item = QTreeWidgetItem([job.title, ''])
+        item.setData(0, Qt.UserRole, job)
+        self.job_items[job] = item
+        self.jobs_tree.addTopLevelItem(item)
+        self.updateJob(job)
+
+    def updateJob(self, job):
+        item = self.job_items.get(job)
+
+        if item is None:
+            return
+
+        if job.state == ExportJob.RUNNING and job.steps_total:
+            item.setText(1, f'{job.steps_done} / {job.steps_total}')
+
+        else:
+            item.setText(1, job.state)
+
+        if job is self.selectedJob():
+            self.updateDetails()
+
+    def removeJob(self, job):
+        item = self.job_items.pop(job, None)
+
+        if item is not None:
+            self.jobs_tree.takeTopLevelItem(self.jobs_tree.indexOfTopLevelItem(item))
+
+    def updateDetails(self):
+        job = self.selectedJob()
+
+        self.open_btn.setEnabled(job is not None and bool(job.written))
+        self.cancel_btn.setEnabled(job is not None and not job.done)
+
+        if job is None:
+            self.details_label.setText('No export selected')
+            return
+
+        timings = job.timings()
+        details = [f'<b>{job.title}</b>: {job.state}',
+                   f'Waited: {timings["wait"]:.2f}s',
+                   f'Rendering: {timings["render"]:.2f}s',
+                   f'Total: {timings["total"]:.2f}s']
+
+        if job.done:
+            details.append(job.summary())
+
+        if job.errors:
+            details.append(f'{len(job.errors)} failed')
+
+        self.details_label.setText('<br>'.join(details))
+
+    def openJob(self):
+        job = self.selectedJob()
+
+        if job is not None:
+            job.open()
+
+    def cancelJob(self):
+        job = self.selectedJob()
+
+        if job is not None:
+            self.queue.cancel(job)
+
+    def clearFinished(self):
+        for job in [job for job in self.queue.jobs if job.done]:
+            self.queue.remove(job)
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import unittest
+from src.framework.managers.cloud_upload import LocalDirectoryBackend, UploadManifest, UploadPipeline
+
+
+class FailingBackend(LocalDirectoryBackend):
+    """Fails the first attempt of every file, after writing part of it when partial is set"""
+
+    def __init__(self, directory, partial=False):
+        super().__init__(directory)
+        self.partial = partial
+        self.attempts = {}
+
+    def upload(self, path, name, digest):
+        self.attempts[name] = self.attempts.get(name, 0) + 1
+
+        if self.attempts[name] == 1:
+            if self.partial:
+                with open(path, 'rb') as source, open(self.partial_path(name, digest), 'wb') as target:
+                    target.write(source.read(100))
+
+            raise OSError('connection reset')
+
+        super().upload(path, name, digest)
+
+    def partial_path(self, name, digest):
+        return os.path.join(self.directory, f'.{name}.{digest[:16]}.part')
+
+
+class UploadPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.temporary.name, 'exports')
+        self.target = os.path.join(self.temporary.name, 'shared')
+        self.manifest_path = os.path.join(self.temporary.name, 'upload_manifest.json')
+        os.makedirs(self.source)
+
+        self.paths = [self.write(f'Canvas {number}.png', bytes([number]) * 1000) for number in range(5)]
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.source, name)
+
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        return path
+
+    def read(self, name):
+        with open(os.path.join(self.target, name), 'rb') as f:
+            return f.read()
+
+    def pipeline(self, backend=None, **kwargs):
+        kwargs.setdefault('retry_delay', 0)
+
+        return UploadPipeline(backend or LocalDirectoryBackend(self.target), UploadManifest(self.manifest_path),
+                              **kwargs)
+
+    def test_uploads_every_file(self):
+        result = self.pipeline().run(self.paths)
+
+        self.assertEqual(sorted(result.uploaded), sorted(self.paths))
+        self.assertEqual(result.failed, {})
+        self.assertEqual(sorted(os.listdir(self.target)), sorted(os.path.basename(path) for path in self.paths))
+        self.assertEqual(self.read('Canvas 3.png'), bytes([3]) * 1000)
+
+    def test_manifest_skips_unchanged_files(self):
+        self.pipeline().run(self.paths)
+        self.write('Canvas 1.png', b'changed')
+
+        # A new manifest object reads the entries saved by the first batch
+        result = self.pipeline().run(self.paths)
+
+        self.assertEqual(result.uploaded, [self.paths[1]])
+        self.assertEqual(len(result.skipped), 4)
+        self.assertEqual(self.read('Canvas 1.png'), b'changed')
+
+    def test_files_missing_from_the_destination_are_uploaded_again(self):
+        self.pipeline().run(self.paths)
+        os.remove(os.path.join(self.target, 'Canvas 2.png'))
+
+        result = self.pipeline().run(self.paths)
+
+        self.assertEqual(result.uploaded, [self.paths[2]])
+        self.assertEqual(self.read('Canvas 2.png'), bytes([2]) * 1000)
+
+    def test_failed_transfers_are_retried(self):
+        backend = FailingBackend(self.target)
+        result = self.pipeline(backend).run(self.paths)
+
+        self.assertEqual(sorted(result.uploaded), sorted(self.paths))
+        self.assertEqual(set(backend.attempts.values()), {2})
+
+    def test_transfers_failing_every_time_are_reported(self):
+        backend = FailingBackend(self.target)
+        result = self.pipeline(backend, retries=0).run(self.paths)
+
+        self.assertEqual(result.uploaded, [])
+        self.assertEqual(sorted(result.failed), sorted(self.paths))
+        self.assertIn('connection reset', result.failed[self.paths[0]])
+
+        # Nothing was recorded, the next batch uploads them all
+        self.assertEqual(sorted(self.pipeline().run(self.paths).uploaded), sorted(self.paths))
+
+    def test_partial_file_is_resumed(self):
+        backend = FailingBackend(self.target, partial=True)
+        result = self.pipeline(backend, workers=1).run(self.paths[:1])
+
+        self.assertEqual(result.uploaded, self.paths[:1])
+        self.assertEqual(self.read('Canvas 0.png'), bytes([0]) * 1000)
+        self.assertEqual(os.listdir(self.target), ['Canvas 0.png'])
+
+    def test_cancel_stops_starting_transfers(self):
+        pipeline = self.pipeline(workers=1)
+
+        def progress(done, total):
+            pipeline.cancel()
+
+        result = pipeline.run(self.paths, progress)
+
+        self.assertTrue(result.cancelled)
+        self.assertEqual(result.uploaded, self.paths[:1])
+        self.assertEqual(os.listdir(self.target), ['Canvas 0.png'])
+
+        # The cancelled batch is resumed by running it again
+        result = self.pipeline().run(self.paths)
+
+        self.assertEqual(result.skipped, self.paths[:1])
+        self.assertEqual(sorted(result.uploaded), sorted(self.paths[1:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import tempfile
+import unittest
+from src.framework.managers.container import BLOCK_RECORDS, DocumentContainer
+from src.framework.managers.compression import get_codec
+from src.framework.managers.record_format import FRAME_PREFIX
+
+
+def canvas_record(number):
+    return {
+        'type': 'CanvasItem',
+        'uid': f'uid-{number}',
+        'name': f'Canvas {number}',
+        'rect': [0, 0, 1000, 700],
+        'x': number * 1200.0,
+        'y': 0.0,
+        'bounds': [number * 1200.0, 0.0, 1000.0, 700.0],
+    }
+
+
+def temporary_document(data):
+    # Containers are read through a memory map, so they need a real file
+    f = tempfile.TemporaryFile()
+    f.write(data)
+    f.flush()
+    f.seek(0)
+
+    return f
+
+
+class ContainerSalvageTest(unittest.TestCase):
+    def encode(self, codec, count=304):
+        records = [canvas_record(number) for number in range(count)]
+        data = DocumentContainer.encode([{'mpversion': 'test'}] + records, codec)
+
+        return records, bytearray(data)
+
+    def salvage(self, data):
+        with temporary_document(bytes(data)) as f, DocumentContainer(f) as container:
+            records = []
+            errors = []
+
+            for number in range(len(container.index['blocks'])):
+                block, error = container.salvage_block(number)
+                records.extend(block)
+                errors.append(error)
+
+            return records, errors
+
+    def block_location(self, data, number):
+        with temporary_document(bytes(data)) as f, DocumentContainer(f) as container:
+            return container.index['blocks'][number]
+
+    def test_intact_document_round_trips(self):
+        for codec in ('none', 'zlib', 'lzma', 'bz2'):
+            records, data = self.encode(codec)
+            salvaged, errors = self.salvage(data)
+
+            self.assertEqual(salvaged, records, codec)
+            self.assertEqual(set(errors), {None}, codec)
+
+    def test_damaged_byte_loses_one_block_at_most(self):
+        for codec in ('none', 'zlib', 'lzma', 'bz2'):
+            records, data = self.encode(codec)
+            offset, length = self.block_location(data, 2)
+            data[offset + length // 2] ^= 0xff
+
+            salvaged, errors = self.salvage(data)
+            kept = [record for record in salvaged if record is not None]
+
+            # Every record outside the damaged block is kept, and nothing damaged is returned
+            self.assertGreaterEqual(len(kept), len(records) - BLOCK_RECORDS, codec)
+            self.assertTrue(all(record in records for record in kept), codec)
+            self.assertEqual(salvaged[:2 * BLOCK_RECORDS], records[:2 * BLOCK_RECORDS], codec)
+            self.assertEqual(salvaged[3 * BLOCK_RECORDS:], records[3 * BLOCK_RECORDS:], codec)
+
+    def record_location(self, data, row):
+        with temporary_document(bytes(data)) as f, DocumentContainer(f) as container:
+            return container.items.location(row)
+
+    def test_damaged_record_loses_one_record(self):
+        records, data = self.encode('none')
+        offset, length = self.block_location(data, 1)
+        block, slot, start, size, crc = self.record_location(data, BLOCK_RECORDS + 1)
+
+        # A byte in the json of the second record of the block
+        data[offset + FRAME_PREFIX.size + start + size // 2] ^= 0x01
+
+        salvaged, errors = self.salvage(data)
+
+        self.assertIsNone(salvaged[BLOCK_RECORDS + 1])
+        self.assertIsNotNone(errors[1])
+        self.assertEqual(salvaged[:BLOCK_RECORDS + 1] + salvaged[BLOCK_RECORDS + 2:],
+                         records[:BLOCK_RECORDS + 1] + records[BLOCK_RECORDS + 2:])
+
+    def test_damaged_block_length_loses_nothing(self):
+        records, data = self.encode('none')
+        offset, length = self.block_location(data, 1)
+        data[offset + 2] ^= 0xff
+
+        salvaged, errors = self.salvage(data)
+
+        # The block fails its checksum, its records are found by the index and pass their own
+        self.assertIsNotNone(errors[1])
+        self.assertEqual(salvaged, records)
+
+    def test_records_before_the_damage_are_kept(self):
+        # zlib and lzma decompress as a stream, the records before the damaged byte come out intact
+        for codec in ('zlib', 'lzma'):
+            records, data = self.encode(codec)
+            offset, length = self.block_location(data, 0)
+            data[offset + length - 8] ^= 0xff
+
+            salvaged, errors = self.salvage(data)
+
+            self.assertIsNotNone(errors[0], codec)
+            self.assertIsNotNone(salvaged[0], codec)
+            self.assertEqual(salvaged[BLOCK_RECORDS:], records[BLOCK_RECORDS:], codec)
+
+    def test_decompress_prefix(self):
+        data = bytes(range(256)) * 64
+
+        for name in ('zlib', 'lzma'):
+            codec = get_codec(name)
+            compressed = bytearray(codec.compress(data))
+            compressed[len(compressed) - 8] ^= 0xff
+
+            prefix = codec.decompress_prefix(bytes(compressed))
+            self.assertTrue(data.startswith(prefix[:len(prefix) // 2]), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from src.framework.graphics_framework import *
+from src.framework.serializer import SceneSerializer
+
+
+def line(length):
+    path = QPainterPath()
+    path.moveTo(0, 0)
+    path.lineTo(length, 0)
+
+    return path
+
+
+class CachedRecordTest(unittest.TestCase):
+    """Setters called outside undo commands must not leave a stale record for the next save"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.scene = CustomGraphicsScene(QUndoStack())
+        self.serializer = SceneSerializer(self.scene)
+
+    def record(self, item):
+        # Serialize twice, the second record comes from the cache
+        self.serializer.serialize_items([item])
+        return self.serializer.serialize_items([item])[1]
+
+    def test_path_setters_drop_the_record(self):
+        item = CustomPathItem(line(10))
+        self.scene.addItem(item)
+        self.record(item)
+
+        item.setPath(line(50))
+        self.assertEqual(self.record(item)['elements'], self.serializer.serialize_path(line(50)))
+
+        item.setPen(QPen(QColor('red'), 7))
+        pen = self.record(item)['pen']
+        self.assertEqual(self.serializer.styles['pen'][pen]['width'], 7)
+
+        item.setBrush(QBrush(QColor('blue')))
+        self.assertIsNone(self.scene.change_tracker.cached_record(item))
+
+    def test_leader_line_text_setters_drop_the_record(self):
+        item = LeaderLineItem(line(10), 'Jump')
+        self.scene.addItem(item)
+        self.record(item)
+
+        item.text_element.setTextWidth(120)
+        self.assertEqual(self.record(item)['textwidth'], 120)
+
+        item.text_element.setDefaultTextColor(QColor('red'))
+        self.assertIsNone(self.scene.change_tracker.cached_record(item))
+
+        self.record(item)
+        item.text_element.setFont(QFont('Arial', 31))
+        self.assertIsNone(self.scene.change_tracker.cached_record(item))
+
+    def test_setters_outside_a_scene(self):
+        item = CustomPathItem(line(10))
+        item.setPath(line(20))
+
+        self.assertEqual(item.path().elementCount(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()